@@ -1,58 +1,75 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import mysql.connector
-import joblib
-import plotly.express as px
+import os
+import sys
 from datetime import timedelta
 
+# The feature store and other data helpers are shared with the API's Python scripts.
+# pandas, plotly, joblib and the modules built on pandas are imported by the pages that use
+# them, so starting the app (and rerunning a page) does not pay for what it does not draw.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'student-prediction-api', 'scripts', 'python'))
+from model_registry import HotModel, open_registry_if_present
+from db import Database
+from enrollment_index import use_enrollment_index
+from prediction_cache import PredictionCache, snapshot_version
+from instrumentation import count, span, traced
+
 # Page Config
 st.set_page_config(page_title="Attendance Prediction System", page_icon="🟢", layout="wide")
 
-# DB Config
-db_config = { 'host': 'localhost', 'user': 'root', 'password': '', 'database': 'predict_app' }
+# Connections shared by all Streamlit sessions; more concurrent page runs wait for a free one.
+DB_POOL_SIZE = 5
+
+# Meeting predictions kept in memory, and for how long (seconds).
+PREDICTION_CACHE_ENTRIES = 256
+PREDICTION_CACHE_TTL = 900
+
+# Set to True once `python enrollment_index.py build` has created the enrollment side tables.
+USE_ENROLLMENT_INDEX = False
+
+def enrollment_query(query):
+    return use_enrollment_index(query) if USE_ENROLLMENT_INDEX else query
 
 # Caching Functions
 @st.cache_resource
-def get_db_connection(): return mysql.connector.connect(**db_config)
+def get_database():
+    # One bounded pool for all sessions; each page run borrows a connection (see db.py).
+    return Database.mysql(size=DB_POOL_SIZE)
+
+@st.cache_resource
+def get_hot_model():
+    # Follows the model registry's current version; retraining swaps it in without a restart.
+    registry = open_registry_if_present()
+    return HotModel(registry) if registry else None
 
 @st.cache_data
-def load_model():
+def load_local_model():
+    import joblib
+    from forest_engine import PackedForest
     try:
         # --- FIX 1: Load the new, simpler v8 model ---
-        return joblib.load("attendance_model_v8_simple.joblib")
+        # Packed once at load time; predictions then walk the trees with NumPy only.
+        return PackedForest.from_model(joblib.load("attendance_model_v8_simple.joblib"))
     except FileNotFoundError:
         return None
 
-# Attendance Prediction Page
-def render_prediction_page(cnx, model):
-    st.header("🔮 Real-Time Attendance Prediction")
-
-    @st.cache_data(ttl=600)
-    def get_meetings(_cnx):
-        query = """
-        WITH NumberedMeetings AS (
-            SELECT m.id, m.titre_fr, m.id_classe,
-                   ROW_NUMBER() OVER(PARTITION BY m.titre_fr ORDER BY m.id ASC) as rn
-            FROM meetings m
-            INNER JOIN classes c ON m.id_classe = c.id
-            INNER JOIN parcours_classes pc ON FIND_IN_SET(c.id, pc.classes)
-            INNER JOIN parcour_group_pivot pgp ON pc.id = pgp.id_parcour_classes
-            GROUP BY m.id
-        )
-        SELECT id, titre_fr, id_classe FROM NumberedMeetings
-        WHERE rn = 1 AND titre_fr IS NOT NULL AND titre_fr != '' ORDER BY titre_fr;
-        """
-        return pd.read_sql(query, _cnx)
-
-    meetings = get_meetings(cnx)
-    if meetings.empty:
-        st.error("Could not find any meetings with enrolled users in the database.")
-        st.stop()
+@st.cache_resource
+def get_prediction_cache():
+    # Shared by all sessions; keyed by meeting, model version and data version (see prediction_cache.py).
+    return PredictionCache(max_entries=PREDICTION_CACHE_ENTRIES, ttl=PREDICTION_CACHE_TTL)
 
-    selected_meeting_title = st.selectbox("Select a Meeting to Predict Attendance:", meetings["titre_fr"])
-    selected_row = meetings[meetings['titre_fr'] == selected_meeting_title].iloc[0]
-    meeting_id, class_id = int(selected_row['id']), int(selected_row['id_classe'])
+def load_model():
+    # (model, version); the version is part of the prediction cache key.
+    hot_model = get_hot_model()
+    return hot_model.get() if hot_model else (load_local_model(), 'local')
+
+# Enrollment, history and schedule queries and the forest for one meeting
+@traced('app.predict_meeting')
+def predict_meeting(cnx, model, meeting_id, class_id):
+    import pandas as pd
+    from feature_store import open_store_if_present
+    from features import DEFAULT_ATTENDANCE_RATE, build_feature_matrix
+    from forest_engine import predict_with_proba
 
     # --- FIX 2: Simplified the query to remove unnecessary features ---
     enrolled_query = """
@@ -67,14 +84,22 @@ def render_prediction_page(cnx, model):
     JOIN cours co ON c.id_cours = co.id
     WHERE c.id = %s;
     """
-    enrolled_df = pd.read_sql(enrolled_query, cnx, params=(class_id,))
+    with span('app.enrollment_query'):
+        enrolled_df = cnx.query_df(enrollment_query(enrolled_query), (class_id,))
     if enrolled_df.empty:
-        st.warning(f"No users are enrolled for meeting: '{selected_meeting_title}'.")
-        return
+        return enrolled_df
 
-    # Load attendance history (this logic is unchanged)
+    # Load attendance history, from the materialized feature store when one has been built
     user_ids = tuple(enrolled_df['user_id'].unique())
-    if user_ids:
+    history_df = pd.DataFrame(columns=['user_id', 'user_attendance_rate', 'user_total_meetings'])
+    store = open_store_if_present()
+    if store is not None and user_ids:
+        try:
+            with span('app.history', source='feature_store'):
+                history_df = store.get_features(user_ids)
+        finally:
+            store.close()
+    elif user_ids:
         history_query = f"""
         SELECT p.user_id, COUNT(m.id) as user_total_meetings, COUNT(pm.id) as attended_meetings
         FROM parcour_group_pivot p
@@ -85,13 +110,11 @@ def render_prediction_page(cnx, model):
         WHERE p.user_id IN {user_ids}
         GROUP BY p.user_id;
         """
-        history_df = pd.read_sql(history_query, cnx)
+        with span('app.history', source='query'):
+            history_df = cnx.query_df(enrollment_query(history_query))
         if not history_df.empty:
             history_df['user_attendance_rate'] = history_df['attended_meetings'] / history_df['user_total_meetings']
-            enrolled_df = pd.merge(enrolled_df, history_df[['user_id', 'user_attendance_rate', 'user_total_meetings']], on='user_id', how='left')
-
-    enrolled_df['user_attendance_rate'].fillna(0.5, inplace=True)
-    enrolled_df['user_total_meetings'].fillna(0, inplace=True)
+    history = (history_df['user_id'], history_df['user_attendance_rate'], history_df['user_total_meetings'])
 
     # Load meeting schedule (this robust logic is unchanged)
     schedule_query = """
@@ -101,46 +124,76 @@ def render_prediction_page(cnx, model):
     JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
     WHERE pm.id_meeting = %s LIMIT 1;
     """
-    schedule_df = pd.read_sql(schedule_query, cnx, params=(meeting_id,))
-    meeting_weekday = 0
-    meeting_hour = 0
-
+    with span('app.schedule_query'):
+        schedule_df = cnx.query_df(schedule_query, (meeting_id,))
+    schedule = None
     if not schedule_df.empty:
-        scheduled_day_val = schedule_df['scheduled_day'].iloc[0]
-        scheduled_hour_val = schedule_df['scheduled_hour'].iloc[0]
-
-        if pd.notna(scheduled_day_val):
-            meeting_weekday = pd.to_datetime(scheduled_day_val).weekday()
+        schedule = (schedule_df['scheduled_day'].iloc[0], schedule_df['scheduled_hour'].iloc[0])
 
-        try:
-            # This robust try/except block handles Timedelta, tuple, None, etc.
-            meeting_hour = pd.to_timedelta(str(scheduled_hour_val)).components.hours
-        except:
-            meeting_hour = 0
-    
-    enrolled_df["meeting_weekday"] = meeting_weekday
-    enrolled_df["meeting_hour"] = meeting_hour
+    # Same feature construction as training; users without history get the default rate
     enrolled_df["class_id"] = class_id
+    with span('app.features'):
+        X = build_feature_matrix(enrolled_df, history, schedule=schedule, default_rate=DEFAULT_ATTENDANCE_RATE)
 
-    # --- FIX 3: Updated the feature list to match the v8 model ---
-    features_for_prediction = [
-        "user_id", "class_id", "course_id", "id_matiere", "id_professeur",
-        "meeting_weekday", "meeting_hour", "user_attendance_rate", "user_total_meetings"
-    ]
-    X = enrolled_df[features_for_prediction]
-
-    predictions = model.predict(X)
-    probas = model.predict_proba(X)[:, 1]
+    count('app.predicted_rows', len(X))
+    with span('app.forest', rows=len(X)):
+        predictions, probas = predict_with_proba(model, X)
+    probas = probas[:, 1]
 
     results_df = enrolled_df.copy()
     results_df["probability_of_presence"] = probas
     results_df["prediction"] = np.where(predictions == 1, "✅ PRESENT", "❌ ABSENT")
+    return results_df
+
+# Attendance Prediction Page
+def render_prediction_page(cnx, model):
+    st.header("🔮 Real-Time Attendance Prediction")
+
+    @st.cache_data(ttl=600)
+    def get_meetings(_cnx):
+        query = """
+        WITH NumberedMeetings AS (
+            SELECT m.id, m.titre_fr, m.id_classe,
+                   ROW_NUMBER() OVER(PARTITION BY m.titre_fr ORDER BY m.id ASC) as rn
+            FROM meetings m
+            INNER JOIN classes c ON m.id_classe = c.id
+            INNER JOIN parcours_classes pc ON FIND_IN_SET(c.id, pc.classes)
+            INNER JOIN parcour_group_pivot pgp ON pc.id = pgp.id_parcour_classes
+            GROUP BY m.id
+        )
+        SELECT id, titre_fr, id_classe FROM NumberedMeetings
+        WHERE rn = 1 AND titre_fr IS NOT NULL AND titre_fr != '' ORDER BY titre_fr;
+        """
+        return _cnx.query_df(query)
+
+    meetings = get_meetings(cnx)
+    if meetings.empty:
+        st.error("Could not find any meetings with enrolled users in the database.")
+        st.stop()
+
+    selected_meeting_title = st.selectbox("Select a Meeting to Predict Attendance:", meetings["titre_fr"])
+    selected_row = meetings[meetings['titre_fr'] == selected_meeting_title].iloc[0]
+    meeting_id, class_id = int(selected_row['id']), int(selected_row['id_classe'])
+
+    # Served from the cache unless the model version or the class's participation changed
+    model, model_version = model
+    with span('app.snapshot_version'):
+        key = (meeting_id, model_version, snapshot_version(cnx, class_id))
+    cache = get_prediction_cache()
+    results_df = cache.get_or_compute(key, lambda: predict_meeting(cnx, model, meeting_id, class_id))
+    stats = cache.stats()
+    st.sidebar.caption(f"Prediction cache: {stats['hits']} hits, {stats['misses']} misses, "
+                       f"{stats['saved_seconds']:.1f} s saved, {stats['entries']} entries")
+    if results_df.empty:
+        st.warning(f"No users are enrolled for meeting: '{selected_meeting_title}'.")
+        return
 
     st.subheader(f"Predictions for: {selected_meeting_title}")
     st.dataframe(results_df[["user_id", "probability_of_presence", "prediction"]])
 
     st.subheader("Probability Distribution (Scrollable)")
     if not results_df.empty:
+        import plotly.express as px
         fig = px.bar(
             results_df,
             x=results_df["user_id"].astype(str),
@@ -154,16 +207,21 @@ def render_prediction_page(cnx, model):
         fig.update_xaxes(type='category')
         st.plotly_chart(fig, use_container_width=True)
 
-# Analytics Page (Unchanged)
+# Analytics Page
+# Reads through user_analytics.py: indexed lookups in the feature store and the meeting
+# statistics store (meeting_stats.py) once built, the live aggregate queries otherwise.
 def render_user_analytics_page(cnx):
+    import pandas as pd
+    from user_analytics import UserAnalytics
+
     st.header("📊 User Attendance Analytics")
+    analytics = UserAnalytics(cnx)
 
     @st.cache_data(ttl=600)
-    def get_all_users(_cnx):
-        query = "SELECT DISTINCT user_id as id, CAST(user_id AS CHAR) as display_name FROM parcour_group_pivot ORDER BY user_id"
-        return pd.read_sql(query, _cnx)
+    def get_all_users(_analytics):
+        return _analytics.users()
 
-    users_df = get_all_users(cnx)
+    users_df = get_all_users(analytics)
     if users_df.empty:
         st.warning("No users found.")
         return
@@ -171,18 +229,8 @@ def render_user_analytics_page(cnx):
     selected_user_id = st.selectbox("Select a User:", users_df['id'])
 
     if selected_user_id:
-        personal_query = """
-        SELECT COUNT(m.id) AS total, COUNT(pm.id) AS attended
-        FROM parcour_group_pivot p
-        JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
-        JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
-        JOIN meetings m ON m.id_classe = c.id
-        LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
-        WHERE p.user_id = %s;
-        """
-        analytics_df = pd.read_sql(personal_query, cnx, params=(selected_user_id,))
-        total = int(analytics_df['total'].iloc[0])
-        attended = int(analytics_df['attended'].iloc[0])
+        with span('app.user_record'):
+            total, attended = analytics.user_record(selected_user_id)
 
         st.subheader(f"Overall Record for User {selected_user_id}")
         if total > 0:
@@ -197,32 +245,8 @@ def render_user_analytics_page(cnx):
 
         st.subheader("Performance for Each of User's Meetings")
         with st.spinner('Loading meeting analytics...'):
-            user_meetings_query = """
-            WITH MeetingScheduleLink AS (
-                SELECT
-                    pm.id_meeting,
-                    MAX(pcj.day) AS scheduled_day,
-                    MAX(pcj.heure_from) AS scheduled_hour
-                FROM participation_meetings pm
-                JOIN meetings m ON pm.id_meeting = m.id
-                JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
-                GROUP BY pm.id_meeting
-            )
-            SELECT
-                m.titre_fr,
-                msl.scheduled_day,
-                msl.scheduled_hour,
-                (SELECT COUNT(DISTINCT id_user) FROM participation_meetings WHERE id_meeting = m.id) AS total_attended,
-                (SELECT COUNT(DISTINCT p_inner.user_id) FROM parcour_group_pivot p_inner JOIN parcours_classes pc_inner ON p_inner.id_parcour_classes = pc_inner.id WHERE FIND_IN_SET(c.id, pc_inner.classes)) AS total_enrolled
-            FROM parcour_group_pivot p
-            JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
-            JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
-            JOIN meetings m ON m.id_classe = c.id
-            LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
-            WHERE p.user_id = %s
-            ORDER BY m.id DESC;
-            """
-            results_df = pd.read_sql(user_meetings_query, cnx, params=(selected_user_id,))
+            with span('app.user_meetings'):
+                results_df = analytics.user_meetings(selected_user_id)
 
         if not results_df.empty:
             results_df.rename(columns={'titre_fr': 'Meeting Title', 'scheduled_day': 'Scheduled Day', 'scheduled_hour': 'Scheduled Time'}, inplace=True)
@@ -241,16 +265,19 @@ def main():
     page = st.sidebar.radio("Go to", ["Attendance Prediction", "User Analytics"])
     st.title("🟢 Student Attendance System")
 
-    cnx = get_db_connection()
     model = load_model()
-    if model is None:
+    if model[0] is None:
         st.error("Model 'attendance_model_v8_simple.joblib' not found. Run the latest training script first.")
         st.stop()
 
-    if page == "Attendance Prediction":
-        render_prediction_page(cnx, model)
-    elif page == "User Analytics":
-        render_user_analytics_page(cnx)
+    # Borrowed for this run only, so concurrent sessions use separate connections.
+    with get_database().connection() as cnx:
+        if page == "Attendance Prediction":
+            with span('app.prediction_page'):
+                render_prediction_page(cnx, model)
+        elif page == "User Analytics":
+            with span('app.analytics_page'):
+                render_user_analytics_page(cnx)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
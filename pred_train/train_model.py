@@ -1,3 +1,6 @@
+import argparse
+import os
+import sys
 import pandas as pd
 import numpy as np
 import mysql.connector
@@ -6,12 +9,22 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import pickle # <--- IMPORT PICKLE INSTEAD OF JOBLIB
 
-# --- CONFIG ---
-db_config = { 'host': 'localhost', 'user': 'root', 'password': '', 'database': 'predict_app' }
+# The extraction helpers are shared with the API's Python scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'student-prediction-api', 'scripts', 'python'))
+from db import connect
+from extract import DEFAULT_CHUNK_SIZE, stream_to_parquet, read_extract, sort_extract
+from features import FEATURES, build_feature_matrix
+from rolling_history import rolling_history
+
+parser = argparse.ArgumentParser(description="Train the attendance prediction model.")
+parser.add_argument('--stream', action='store_true', help="Extract in bounded chunks to an on-disk Parquet file.")
+parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+parser.add_argument('--extract-path', default="training_extract.parquet")
+args = parser.parse_args()
 
 print("Connecting to the database...")
 try:
-    cnx = mysql.connector.connect(**db_config, connect_timeout=300)
+    cnx = connect(connect_timeout=300)
     print("✅ Connection successful.")
 except mysql.connector.Error as err:
     print(f"❌ Database Connection Error: {err}"); exit()
@@ -43,40 +56,34 @@ LEFT JOIN participation_meetings pm_check ON pm_check.id_user = pgp.user_id AND
 LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
 WHERE c.active = 'Y';
 """
-df = pd.read_sql(unified_query, cnx)
+# The query has no ORDER BY; both paths are sorted the same way (extract.EXTRACT_ORDER).
+if args.stream:
+    # Only the extraction is bounded by the chunk size: the file is then loaded and sorted in full.
+    stats = stream_to_parquet(cnx, args.extract_path, unified_query, args.chunk_size)
+    # An empty result writes no file.
+    df = sort_extract(read_extract(args.extract_path)) if stats['rows'] else pd.DataFrame()
+else:
+    df = sort_extract(pd.read_sql(unified_query, cnx))
 
 if df.empty:
     print("❌ Query returned 0 rows."); cnx.close(); exit()
 print(f"✅ Successfully pulled {len(df)} records.")
 
-# --- Feature Engineering (Unchanged logic) ---
+# --- Feature Engineering (shared with serving, see features.py) ---
 print("Performing feature engineering...")
-df['meeting_weekday'] = pd.to_datetime(df['scheduled_day']).dt.weekday
-df['meeting_hour'] = pd.to_timedelta(df['scheduled_hour'].astype(str), errors='coerce').dt.components['hours']
-df.fillna({'meeting_weekday': 0, 'meeting_hour': 0}, inplace=True)
-df['meeting_weekday'] = df['meeting_weekday'].astype(int)
-df['meeting_hour'] = df['meeting_hour'].astype(int)
-
-user_history = df.groupby('user_id')['presence'].agg(['mean', 'count']).rename(columns={'mean': 'user_attendance_rate', 'count': 'user_total_meetings'})
-df = pd.merge(df, user_history, on='user_id', how='left')
-global_attendance_rate = df['presence'].mean()
-df['user_attendance_rate'].fillna(global_attendance_rate, inplace=True)
-df['user_total_meetings'].fillna(0, inplace=True)
-
-# --- FINALIZE FEATURES ---
-features = [
-    "user_id", "class_id", "course_id", "id_matiere", "id_professeur",
-    "meeting_weekday", "meeting_hour", "user_attendance_rate", "user_total_meetings"
-]
+features = FEATURES
 target = "presence"
 
-df.dropna(subset=features, inplace=True)
-print(f"✅ Training with {len(df)} records after cleaning.")
+df.dropna(subset=features[:5], inplace=True)
+y = df[target].to_numpy(dtype=np.int64)
+# Each row only sees the user's meetings before it, never its own label (see rolling_history.py).
+history = rolling_history(df['user_id'], df['scheduled_day'], df['meeting_id'], y, default_rate=y.mean())
+df['user_attendance_rate'] = history['user_attendance_rate']
+df['user_total_meetings'] = history['user_total_meetings']
+X = build_feature_matrix(df)
+print(f"✅ Training with {len(X)} records after cleaning.")
 print(f"✅ Training with SIMPLIFIED features: {features}")
 
-X = df[features]
-y = df[target]
-
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
 print("Training RandomForestClassifier...")
 model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', n_jobs=-1, min_samples_leaf=5)
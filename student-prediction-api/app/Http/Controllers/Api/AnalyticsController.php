@@ -3,6 +3,7 @@
 namespace App\Http\Controllers\Api;
 
 use App\Http\Controllers\Controller;
+use Illuminate\Database\QueryException;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\DB;
 
@@ -10,6 +11,14 @@ class AnalyticsController extends Controller
 {
     /**
      * Finds students whose overall attendance rate is below a given threshold.
+     *
+     * Reads the ranked table written by scripts/python/at_risk.py once a score run has been recorded:
+     * an indexed read in rank order (highest risk first, the predicted presence of each
+     * student's upcoming meetings included), which can also be filtered on the projected
+     * rate with `projectedThreshold`. Without it, the whole history is aggregated.
+     *
+     * Pass `perPage` (and `page`, from 1) to get one page of the results; the number of
+     * matching students is returned in the X-Total-Count header.
      */
     // In app/Http/Controllers/Api/AnalyticsController.php
 
@@ -21,6 +30,25 @@ public function getAtRiskStudents(Request $request)
     // Get the minimum meetings from the request, with a default of 5
     $minMeetings = (int) $request->input('minMeetings', 5);
 
+    $perPage = $request->filled('perPage') ? max(1, min(1000, (int) $request->input('perPage'))) : null;
+    $offset = $perPage ? (max(1, (int) $request->input('page', 1)) - 1) * $perPage : 0;
+
+    if ($this->atRiskStoreIsBuilt()) {
+        $query = DB::connection('at_risk')->table('at_risk_students')
+            ->where('overall_rate', '<', $threshold)
+            ->where('enrolled_meetings', '>=', $minMeetings);
+        if ($request->filled('projectedThreshold')) {
+            $query->where('projected_rate', '<', (float) $request->input('projectedThreshold'));
+        }
+        $total = (clone $query)->count();
+        if ($perPage) {
+            $query->offset($offset)->limit($perPage);
+        }
+        $atRiskStudents = $query->orderBy('rank')->get();
+
+        return response()->json($atRiskStudents)->header('X-Total-Count', $total);
+    }
+
     // This query now uses both dynamic parameters to filter the results.
     $atRiskStudents = DB::select("
         SELECT
@@ -43,6 +71,30 @@ public function getAtRiskStudents(Request $request)
             overall_rate ASC;
     ", [$threshold, $minMeetings]); // <-- Pass both values to the query
 
-    return response()->json($atRiskStudents);
+    $total = count($atRiskStudents);
+    if ($perPage) {
+        $atRiskStudents = array_slice($atRiskStudents, $offset, $perPage);
+    }
+
+    return response()->json($atRiskStudents)->header('X-Total-Count', $total);
+}
+
+    /**
+     * Whether at_risk.py has scored into the at-risk store: the file alone is not enough,
+     * since an empty or half-created one must fall back to the live query.
+     *
+     * @return bool
+     */
+    private function atRiskStoreIsBuilt()
+    {
+        if (!is_file(config('database.connections.at_risk.database'))) {
+            return false;
+        }
+        try {
+            return DB::connection('at_risk')->table('store_state')->where('key', 'scored_at')->exists();
+        } catch (QueryException $e) {
+            // The file exists but has no schema.
+            return false;
+        }
+    }
 }
-}
\ No newline at end of file
@@ -10,52 +10,105 @@
 class ModelController extends Controller
 {
     /**
-     * Triggers the Python model training script as a background process.
+     * Submits a background training job and returns its id right away.
+     * Poll GET /model/jobs/{job} for per-stage progress, timings and memory.
      *
      * @return \Illuminate\Http\JsonResponse
      */
     public function retrain()
     {
         try {
-            $pythonPath = env('PYTHON_PATH', 'python');
-            $scriptPath = base_path('scripts/python/train_model.py');
-            $scriptDir = dirname($scriptPath);
-
-            // Check if the script exists before trying to run it
-            if (!file_exists($scriptPath)) {
-                Log::error('Model training script not found at: ' . $scriptPath);
-                return response()->json(['message' => 'Training script not found on the server.'], 404);
+            $result = $this->runJobCommand(['submit']);
+            if ($result === null) {
+                return response()->json(['message' => 'Could not start the training job. Check server logs for details.'], 500);
             }
 
-            // Create a process that will run the Python script.
-            // We set the working directory to the script's location so that it saves
-            // the .pkl file in the correct place.
-            $process = new Process([$pythonPath, $scriptPath], $scriptDir);
-            
-            // Set a long timeout to prevent the process from being killed prematurely.
-            // E.g., 10 minutes (600 seconds). Adjust as needed.
-            $process->setTimeout(600);
-
-            // Run the process. We are NOT running this in the background for simplicity now,
-            // but we will return a response immediately after it's done.
-            // For a true background task, you would use Laravel Queues.
-            $process->run();
-
-            if ($process->isSuccessful()) {
-                Log::info('Model retraining process completed successfully.');
-                Log::info('Python Script Output: ' . $process->getOutput());
-                return response()->json(['message' => 'Model retraining completed successfully!']);
-            } else {
-                // Log the error output from the script for debugging
-                $errorOutput = $process->getErrorOutput();
-                Log::error('Model retraining process failed.');
-                Log::error('Python Script Error Output: ' . $errorOutput);
-                return response()->json(['message' => 'Model retraining failed. Check server logs for details.', 'error' => $errorOutput], 500);
-            }
+            Log::info('Model retraining job submitted: ' . json_encode($result));
+            return response()->json(['message' => 'Model retraining started.', 'job_id' => $result['job_id']], 202);
 
         } catch (\Exception $e) {
             Log::error('Exception caught while trying to retrain model: ' . $e->getMessage());
             return response()->json(['message' => 'An unexpected server error occurred.'], 500);
         }
     }
-}
\ No newline at end of file
+
+    /**
+     * Status of a training job: overall state, current stage and, per stage,
+     * status, wall time, peak memory and details (rows, accuracy, model version).
+     *
+     * @param  int  $job
+     * @return \Illuminate\Http\JsonResponse
+     */
+    public function jobStatus($job)
+    {
+        $result = $this->runJobCommand(['status', (string) $job, '--json']);
+        if ($result === null) {
+            return response()->json(['message' => 'Training job not found.'], 404);
+        }
+        return response()->json($result);
+    }
+
+    /**
+     * Asks a running training job to stop.
+     *
+     * @param  int  $job
+     * @return \Illuminate\Http\JsonResponse
+     */
+    public function cancelJob($job)
+    {
+        $result = $this->runJobCommand(['cancel', (string) $job]);
+        if ($result === null) {
+            return response()->json(['message' => 'Training job not found.'], 404);
+        }
+        return response()->json($result);
+    }
+
+    /**
+     * Runs a training_jobs.py command and decodes its JSON output, or returns null on failure.
+     * The commands only touch the job table, so they return in well under a second.
+     */
+    private function runJobCommand(array $arguments): ?array
+    {
+        $pythonPath = env('PYTHON_PATH', 'python');
+        $scriptPath = base_path('scripts/python/training_jobs.py');
+
+        if (!file_exists($scriptPath)) {
+            Log::error('Training job script not found at: ' . $scriptPath);
+            return null;
+        }
+
+        $process = new Process(array_merge([$pythonPath, $scriptPath], $arguments), dirname($scriptPath));
+        $process->setTimeout(30);
+        $process->run();
+
+        if (!$process->isSuccessful()) {
+            Log::error('Training job command failed: ' . $process->getErrorOutput());
+            return null;
+        }
+
+        return json_decode($process->getOutput(), true);
+    }
+
+    /**
+     * Lists the versions of the model registry with their metadata
+     * (features, training date, accuracy, training rows and duration).
+     *
+     * @return \Illuminate\Http\JsonResponse
+     */
+    public function versions()
+    {
+        $pythonPath = env('PYTHON_PATH', 'python');
+        $scriptPath = base_path('scripts/python/model_registry.py');
+
+        $process = new Process([$pythonPath, $scriptPath, 'list', '--json'], dirname($scriptPath));
+        $process->setTimeout(30);
+        $process->run();
+
+        if (!$process->isSuccessful()) {
+            Log::error('Could not list model versions: ' . $process->getErrorOutput());
+            return response()->json(['message' => 'Could not read the model registry.'], 500);
+        }
+
+        return response()->json(json_decode($process->getOutput(), true));
+    }
+}
@@ -3,17 +3,49 @@
 namespace App\Http\Controllers\Api;
 
 use App\Http\Controllers\Controller;
+use Illuminate\Database\QueryException;
+use Illuminate\Http\Client\ConnectionException;
+use Illuminate\Support\Facades\Cache;
 use Illuminate\Support\Facades\DB;
+use Illuminate\Support\Facades\Http;
 use Illuminate\Support\Facades\Log;
 use Symfony\Component\Process\Process;
 use Symfony\Component\Process\Exception\ProcessFailedException;
 
 class PredictionController extends Controller
 {
+    private const CACHE_PREFIX = 'prediction:';
+    private const CACHE_INDEX = 'prediction:index';
+    private const CACHE_COUNTERS = ['hits', 'misses', 'saved_ms', 'evictions'];
+
+    // Binary wire format of the Python bridge (scripts/python/wire_format.py).
+    private const FEATURES_MAGIC = 'ATF1';
+    private const PREDICTIONS_MAGIC = 'ATP1';
+    private const FEATURES_CONTENT_TYPE = 'application/vnd.attendance.features';
+    private const PREDICTIONS_CONTENT_TYPE = 'application/vnd.attendance.predictions';
+    // Little-endian column types => [pack()/unpack() code, bytes per value].
+    private const WIRE_TYPES = ['|u1' => ['C', 1], '<u4' => ['V', 4], '<u8' => ['P', 8], '<f4' => ['g', 4], '<f8' => ['e', 8]];
+    // Column types of the features payload (wire_format.FEATURE_TYPES); nullable columns are floats.
+    private const FEATURE_WIRE_TYPES = [
+        'user_id' => '<u8',
+        'class_id' => '<u4',
+        'course_id' => '<u4',
+        'id_matiere' => '<f4',
+        'id_professeur' => '<f4',
+        'meeting_weekday' => '|u1',
+        'meeting_hour' => '|u1',
+        'user_attendance_rate' => '<f4',
+        'user_total_meetings' => '<u4',
+    ];
+
     /**
      * Gathers all necessary features from the database, passes them via stdin to a Python
      * script for prediction, and returns the results.
      *
+     * Results are cached per (meeting, model version, data version): a retrain or new
+     * participation rows for the meeting's class change the key, so a stale result is
+     * never served (see predictionCacheKey()).
+     *
      * @param int $meetingId
      * @return \Illuminate\Http\JsonResponse
      */
@@ -27,6 +59,17 @@ public function predictForMeeting($meetingId)
             }
             $classId = $meeting->id_classe;
 
+            $cacheKey = $this->predictionCacheKey($meetingId, $classId);
+            $cached = Cache::get($cacheKey);
+            if ($cached !== null) {
+                $this->touchCacheEntry($cacheKey, $cached['bytes']);
+                $this->bumpCounter('hits');
+                $this->bumpCounter('saved_ms', $cached['compute_ms']);
+                return response()->json($cached['predictions']);
+            }
+            $this->bumpCounter('misses');
+            $computeStart = microtime(true);
+
             // --- Step 2: Get All Users Enrolled in the Class ---
             $enrolledUsers = DB::select("
                 SELECT p.user_id, c.id_cours AS course_id, c.id_professeur, co.id_matiere
@@ -43,17 +86,7 @@ public function predictForMeeting($meetingId)
 
             // --- Step 3: Get User Attendance History for all enrolled users ---
             $userIds = array_map(fn($user) => $user->user_id, $enrolledUsers);
-            $placeholders = implode(',', array_fill(0, count($userIds), '?'));
-            $history = DB::select("
-                SELECT p.user_id, COUNT(m.id) as user_total_meetings, COUNT(pm.id) as attended_meetings
-                FROM parcour_group_pivot p
-                JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
-                JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
-                JOIN meetings m ON m.id_classe = c.id
-                LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
-                WHERE p.user_id IN ($placeholders)
-                GROUP BY p.user_id
-            ", $userIds);
+            $history = $this->loadUserHistory($userIds);
 
             $historyMap = [];
             foreach ($history as $h) {
@@ -75,7 +108,8 @@ public function predictForMeeting($meetingId)
                 $totalMeetings = $userHistory ? (int)$userHistory->user_total_meetings : 0;
                 $attendedMeetings = $userHistory ? (int)$userHistory->attended_meetings : 0;
                 $attendanceRate = $totalMeetings > 0 ? $attendedMeetings / $totalMeetings : 0.5;
-                $meeting_weekday = $schedule && $schedule->scheduled_day ? (new \DateTime($schedule->scheduled_day))->format('w') : 0;
+                // Monday=0 ... Sunday=6, the pandas weekday convention the model was trained with.
+                $meeting_weekday = $schedule && $schedule->scheduled_day ? (int)(new \DateTime($schedule->scheduled_day))->format('N') - 1 : 0;
                 $meeting_hour = $schedule && $schedule->scheduled_hour ? (int)explode(':', $schedule->scheduled_hour)[0] : 0;
 
                 $featureSet[] = [
@@ -91,30 +125,19 @@ public function predictForMeeting($meetingId)
                 ];
             }
             
-            // --- Step 6: Execute the "Pure" Python Script using stdin ---
-            $pythonPath = config('app.python_path');
-            $scriptPath = str_replace('\\', '/', base_path('scripts/python/predict_from_json.py'));
-            $jsonData = json_encode($featureSet);
-            
-            // Create the process with NO command-line arguments for the data.
-            $process = new Process([$pythonPath, $scriptPath]);
-            
-            // Provide the JSON data to the script via its standard input.
-            $process->setInput($jsonData);
-            
-            $process->run();
-
-            if (!$process->isSuccessful()) {
-                throw new ProcessFailedException($process);
-            }
-            
-            $output = $process->getOutput();
-            $decodedOutput = json_decode($output, true);
+            // --- Step 6: Score the features, preferring the long-lived prediction worker ---
+            // The binary format packs each feature as one array instead of repeating the
+            // nine keys per user; PREDICTION_WIRE_FORMAT=json sends the records as before.
+            $payload = config('app.prediction_wire_format') === 'json'
+                ? json_encode($featureSet)
+                : $this->encodeFeatures($featureSet);
+            $decodedOutput = $this->predictWithServer($payload) ?? $this->predictWithProcess($payload);
 
             if (isset($decodedOutput['error']) && $decodedOutput['error']) {
                 throw new \Exception('Python script returned an error: ' . $decodedOutput['message']);
             }
-            
+
+            $this->storePrediction($cacheKey, $decodedOutput, (int) round((microtime(true) - $computeStart) * 1000));
             return response()->json($decodedOutput);
 
         } catch (\Exception $e) {
@@ -126,4 +149,294 @@ public function predictForMeeting($meetingId)
             return response()->json(['message' => 'The prediction engine encountered a critical error. Please check system logs.'], 500);
         }
     }
-}
\ No newline at end of file
+
+    /**
+     * Hit/miss counters of the prediction cache, the prediction time hits saved, and its size.
+     *
+     * @return \Illuminate\Http\JsonResponse
+     */
+    public function cacheStats()
+    {
+        $stats = [];
+        foreach (self::CACHE_COUNTERS as $counter) {
+            $stats[$counter] = (int) Cache::get(self::CACHE_PREFIX . $counter, 0);
+        }
+        $lookups = $stats['hits'] + $stats['misses'];
+        $stats['hit_rate'] = $lookups > 0 ? round($stats['hits'] / $lookups, 4) : null;
+        $index = Cache::get(self::CACHE_INDEX, []);
+        $stats['entries'] = count($index);
+        $stats['bytes'] = array_sum(array_column($index, 'bytes'));
+        return response()->json($stats);
+    }
+
+    /**
+     * Cache key of a meeting's predictions: the meeting, the model version being served
+     * (the registry's CURRENT pointer, or the bundled pickle's mtime) and the version of
+     * the data the features come from: count and highest id of the class's participation
+     * rows, plus the feature store's high-water marks when the store is used.
+     *
+     * @param int $meetingId
+     * @param int $classId
+     * @return string
+     */
+    private function predictionCacheKey($meetingId, $classId)
+    {
+        $currentFile = base_path('scripts/python/models/CURRENT');
+        $modelVersion = is_file($currentFile)
+            ? trim(file_get_contents($currentFile))
+            : 'local-' . @filemtime(base_path('scripts/python/attendance_model.pkl'));
+
+        $participation = DB::selectOne("
+            SELECT COUNT(pm.id) AS n, MAX(pm.id) AS last_id
+            FROM participation_meetings pm
+            JOIN meetings m ON pm.id_meeting = m.id
+            WHERE m.id_classe = ?
+        ", [$classId]);
+        $snapshot = [(int) $participation->n, (int) $participation->last_id];
+        $marks = $this->featureStoreMarks();
+        if ($marks !== null) {
+            $snapshot[] = (int) $marks['last_meeting_id'];
+            $snapshot[] = (int) ($marks['last_participation_id'] ?? 0);
+        }
+
+        return self::CACHE_PREFIX . $meetingId . ':' . $modelVersion . ':' . implode('.', $snapshot);
+    }
+
+    /**
+     * Caches a prediction result for the configured TTL and evicts the least recently
+     * used entries beyond the configured entry count and byte size.
+     *
+     * @param string $cacheKey
+     * @param array $predictions
+     * @param int $computeMs
+     * @return void
+     */
+    private function storePrediction($cacheKey, $predictions, $computeMs)
+    {
+        $config = config('app.prediction_cache');
+        $bytes = strlen(json_encode($predictions));
+        if ($bytes > $config['max_bytes']) {
+            return;
+        }
+        Cache::put($cacheKey, ['predictions' => $predictions, 'compute_ms' => $computeMs, 'bytes' => $bytes], $config['ttl']);
+
+        // The index (key => last use, size) is rewritten without a lock: concurrent
+        // requests can lose an update, which only makes the bounds approximate.
+        $index = $this->touchCacheEntry($cacheKey, $bytes);
+        $totalBytes = array_sum(array_column($index, 'bytes'));
+        uasort($index, fn($a, $b) => $a['used'] <=> $b['used']);
+        $evicted = 0;
+        while ($index && (count($index) > $config['max_entries'] || $totalBytes > $config['max_bytes'])) {
+            $oldest = array_key_first($index);
+            $totalBytes -= $index[$oldest]['bytes'];
+            unset($index[$oldest]);
+            Cache::forget($oldest);
+            $evicted++;
+        }
+        if ($evicted > 0) {
+            Cache::put(self::CACHE_INDEX, $index, $config['ttl']);
+            $this->bumpCounter('evictions', $evicted);
+        }
+    }
+
+    /**
+     * Adds to one of the cache counters (CACHE_COUNTERS), creating it on first use
+     * since not every cache store increments a missing key.
+     *
+     * @param string $counter
+     * @param int $amount
+     * @return void
+     */
+    private function bumpCounter($counter, $amount = 1)
+    {
+        Cache::add(self::CACHE_PREFIX . $counter, 0);
+        Cache::increment(self::CACHE_PREFIX . $counter, $amount);
+    }
+
+    /**
+     * Marks a cache entry as just used in the LRU index and returns the index.
+     * Entries whose TTL has run out are dropped from it on the way.
+     *
+     * @param string $cacheKey
+     * @param int $bytes
+     * @return array
+     */
+    private function touchCacheEntry($cacheKey, $bytes)
+    {
+        $ttl = config('app.prediction_cache.ttl');
+        $now = microtime(true);
+        $index = array_filter(Cache::get(self::CACHE_INDEX, []), fn($entry) => $entry['used'] > $now - $ttl);
+        $index[$cacheKey] = ['used' => $now, 'bytes' => $bytes];
+        Cache::put(self::CACHE_INDEX, $index, $ttl);
+        return $index;
+    }
+
+    /**
+     * Returns the feature store's high-water marks (key => value), or null when the store
+     * has not been built: a missing file, or one no refresh has recorded its marks in,
+     * means the live queries are used instead.
+     *
+     * @return \Illuminate\Support\Collection|null
+     */
+    private function featureStoreMarks()
+    {
+        if (!is_file(config('database.connections.feature_store.database'))) {
+            return null;
+        }
+        try {
+            $marks = DB::connection('feature_store')->table('store_state')->pluck('value', 'key');
+        } catch (QueryException $e) {
+            // The file exists but has no schema.
+            return null;
+        }
+        return isset($marks['last_meeting_id']) ? $marks : null;
+    }
+
+    /**
+     * Returns total/attended meeting counts per user, read from the materialized feature
+     * store when it has been built, otherwise aggregated from the full meeting history.
+     *
+     * @param array $userIds
+     * @return array
+     */
+    private function loadUserHistory(array $userIds)
+    {
+        if ($this->featureStoreMarks() !== null) {
+            return DB::connection('feature_store')->table('user_features')
+                ->whereIn('user_id', $userIds)
+                ->select('user_id', 'total_meetings as user_total_meetings', 'attended_meetings')
+                ->get()
+                ->all();
+        }
+
+        $placeholders = implode(',', array_fill(0, count($userIds), '?'));
+        return DB::select("
+            SELECT p.user_id, COUNT(m.id) as user_total_meetings, COUNT(pm.id) as attended_meetings
+            FROM parcour_group_pivot p
+            JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+            JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+            JOIN meetings m ON m.id_classe = c.id
+            LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+            WHERE p.user_id IN ($placeholders)
+            GROUP BY p.user_id
+        ", $userIds);
+    }
+
+    /**
+     * Packs the feature set into a binary features payload: a JSON header naming each
+     * column and its type, then one little-endian array per column (NULL is sent as NaN).
+     *
+     * @param array $featureSet
+     * @return string
+     */
+    private function encodeFeatures(array $featureSet)
+    {
+        $columns = [];
+        $body = '';
+        foreach (self::FEATURE_WIRE_TYPES as $name => $type) {
+            $values = array_column($featureSet, $name);
+            $values = $type[1] === 'f'
+                ? array_map(fn($value) => $value === null ? NAN : (float) $value, $values)
+                : array_map('intval', $values);
+            $body .= pack(self::WIRE_TYPES[$type][0] . '*', ...$values);
+            $columns[] = [$name, $type];
+        }
+        $header = json_encode(['rows' => count($featureSet), 'columns' => $columns]);
+        return self::FEATURES_MAGIC . pack('V', strlen($header)) . $header . $body;
+    }
+
+    /**
+     * Decodes the worker's or script's output: a binary predictions payload, or JSON
+     * (the predictions of a JSON request, or an error report).
+     *
+     * @param string $output
+     * @return array|null
+     */
+    private function decodePredictions($output)
+    {
+        if (strncmp($output, self::PREDICTIONS_MAGIC, 4) !== 0) {
+            return json_decode($output, true);
+        }
+        $headerLength = unpack('V', $output, 4)[1];
+        $header = json_decode(substr($output, 8, $headerLength), true);
+        $offset = 8 + $headerLength;
+        $columns = [];
+        foreach ($header['columns'] as [$name, $type]) {
+            [$code, $size] = self::WIRE_TYPES[$type];
+            $columns[$name] = $header['rows'] > 0
+                ? array_values(unpack($code . $header['rows'], $output, $offset))
+                : [];
+            $offset += $header['rows'] * $size;
+        }
+
+        $predictions = [];
+        foreach ($columns['user_id'] as $i => $userId) {
+            $predictions[] = [
+                'user_id' => $userId,
+                // Same precision as the JSON contract.
+                'probability_of_presence' => round($columns['probability_of_presence'][$i], 10),
+                'prediction' => $columns['prediction'][$i],
+            ];
+        }
+        return $predictions;
+    }
+
+    /**
+     * Sends the feature set to the prediction worker, if one is configured.
+     * Returns null when no worker is configured or it cannot be reached.
+     *
+     * @param string $payload JSON records or a binary features payload
+     * @return array|null
+     */
+    private function predictWithServer($payload)
+    {
+        $serverUrl = config('app.prediction_server_url');
+        if (!$serverUrl) {
+            return null;
+        }
+
+        try {
+            $binary = strncmp($payload, self::FEATURES_MAGIC, 4) === 0;
+            $response = Http::timeout(30)
+                ->accept($binary ? self::PREDICTIONS_CONTENT_TYPE : 'application/json')
+                ->withBody($payload, $binary ? self::FEATURES_CONTENT_TYPE : 'application/json')
+                ->post(rtrim($serverUrl, '/') . '/predict');
+            return $this->decodePredictions($response->body());
+        } catch (ConnectionException $e) {
+            Log::warning('Prediction server unreachable, falling back to a Python process: ' . $e->getMessage());
+            return null;
+        }
+    }
+
+    /**
+     * Executes the "Pure" Python script, passing the feature set via stdin.
+     * The script answers in the format of the request.
+     *
+     * @param string $payload JSON records or a binary features payload
+     * @return array|null
+     */
+    private function predictWithProcess($payload)
+    {
+        $pythonPath = config('app.python_path');
+        $scriptPath = str_replace('\\', '/', base_path('scripts/python/predict_from_json.py'));
+
+        // Create the process with NO command-line arguments for the data.
+        // PREDICT_TRACE (see instrumentation.py) is passed on explicitly: values from .env
+        // are not in the environment the child process inherits.
+        $process = new Process([$pythonPath, $scriptPath], null, array_filter([
+            'PREDICT_TRACE' => config('app.predict_trace'),
+            'PREDICT_PROFILE' => config('app.predict_profile'),
+        ]));
+
+        // Provide the features to the script via its standard input.
+        $process->setInput($payload);
+
+        $process->run();
+
+        if (!$process->isSuccessful()) {
+            throw new ProcessFailedException($process);
+        }
+
+        return $this->decodePredictions($process->getOutput());
+    }
+}
@@ -86,6 +86,29 @@
 
     'python_path' => env('PYTHON_PATH', 'python3'),
 
+    // Optional long-lived prediction worker (scripts/python/prediction_server.py).
+    // When set, predictions are POSTed here and the per-request Python process is
+    // only used as a fallback if the worker is unreachable.
+    'prediction_server_url' => env('PREDICTION_SERVER_URL'),
+
+    // How features are sent to the prediction worker or script: 'binary' packs each feature
+    // as one little-endian array (scripts/python/wire_format.py), 'json' sends the records.
+    'prediction_wire_format' => env('PREDICTION_WIRE_FORMAT', 'binary'),
+
+    // Per-stage timing of the Python prediction script as JSON lines (scripts/python/instrumentation.py):
+    // 'stderr' or a file path, and optionally a profile mode ('cprofile' or 'tracemalloc').
+    'predict_trace' => env('PREDICT_TRACE'),
+    'predict_profile' => env('PREDICT_PROFILE'),
+
+    // Cache of per-meeting prediction results (see PredictionController::predictionCacheKey()).
+    // Entries expire after `ttl` seconds; the least recently used ones are evicted beyond
+    // `max_entries` results or `max_bytes` of JSON.
+    'prediction_cache' => [
+        'ttl' => (int) env('PREDICTION_CACHE_TTL', 900),
+        'max_entries' => (int) env('PREDICTION_CACHE_MAX_ENTRIES', 256),
+        'max_bytes' => (int) env('PREDICTION_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+    ],
+
     /*
     |--------------------------------------------------------------------------
     | Encryption Key
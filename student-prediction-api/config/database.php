@@ -42,6 +42,22 @@
             'synchronous' => null,
         ],
 
+        // Per-user attendance features maintained by scripts/python/feature_store.py.
+        'feature_store' => [
+            'driver' => 'sqlite',
+            'database' => env('FEATURE_STORE_PATH', base_path('scripts/python/feature_store.sqlite')),
+            'prefix' => '',
+            'foreign_key_constraints' => false,
+        ],
+
+        // Ranked at-risk students written by scripts/python/at_risk.py.
+        'at_risk' => [
+            'driver' => 'sqlite',
+            'database' => env('AT_RISK_STORE_PATH', base_path('scripts/python/at_risk.sqlite')),
+            'prefix' => '',
+            'foreign_key_constraints' => false,
+        ],
+
         'mysql' => [
             'driver' => 'mysql',
             'url' => env('DB_URL'),
@@ -12,9 +12,13 @@
 
 
 Route::post('/model/retrain', [ModelController::class, 'retrain']);
+Route::get('/model/versions', [ModelController::class, 'versions']);
+Route::get('/model/jobs/{job}', [ModelController::class, 'jobStatus'])->where('job', '[0-9]+');
+Route::post('/model/jobs/{job}/cancel', [ModelController::class, 'cancelJob'])->where('job', '[0-9]+');
 
 // --- Existing Core Routes ---
 Route::get('/predict/meeting/{meeting}', [PredictionController::class, 'predictForMeeting'])->where('meeting', '[0-9]+');
+Route::get('/predict/cache-stats', [PredictionController::class, 'cacheStats']);
 Route::get('/meetings', [MeetingController::class, 'index']);
 Route::get('/users', [UserAnalyticsController::class, 'index']);
 Route::get('/users/{user}/stats', [UserAnalyticsController::class, 'getOverallStats'])->where('user', '[0-9]+');
@@ -0,0 +1,251 @@
+"""
+Ranked at-risk students, precomputed for the API.
+
+AnalyticsController::getAtRiskStudents used to flag students by their historical rate alone,
+with a full COUNT(...) GROUP BY user_id over the enrollment x meeting history on every
+request. This job scores every enrolled student once and writes a ranked SQLite table:
+
+    overall_rate        attended / enrolled meetings, as the endpoint computed it (from the
+                        feature store when it has been built, else the same aggregate query)
+    upcoming_meetings   meetings of the student's classes planned in the horizon that have
+                        no participation yet, scored with the current model (batch_predict.py)
+    expected_upcoming   the sum of their predicted presence probabilities
+    projected_rate      (attended + expected_upcoming) / enrolled: the upcoming meetings, which
+                        overall_rate counts as absences, at their predicted presence instead
+    risk_score          1 - projected_rate; rank 1 is the student most at risk
+
+The history and the scored (meeting, user) rows are combined for all students at once with
+NumPy (a bincount per student), and the table is replaced in one transaction, so readers
+see either the previous ranking or the new one. The API pages through it in rank order,
+filtering on the indexed rate columns, once a `score` run has recorded its scored_at time;
+`show` opens the ranking read-only and never creates it.
+
+    python at_risk.py score                                  # upcoming = the next 14 days
+    python at_risk.py score --from 2025-03-03 --days 7 --sqlite synthetic.sqlite
+    python at_risk.py show --threshold 0.6 --min-meetings 5 --limit 20
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_predict import build_batch, load_batch_model, score, select_meetings
+from db import Database
+from enrollment_index import use_enrollment_index
+from feature_store import FULL_RECOMPUTE_QUERY, open_store_if_present
+from model_registry import open_registry_if_present
+from sqlite_store import SqliteStore
+
+DEFAULT_AT_RISK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'at_risk.sqlite')
+DEFAULT_HORIZON_DAYS = 14
+
+COLUMNS = ['user_id', 'rank', 'enrolled_meetings', 'attended_meetings', 'overall_rate', 'upcoming_meetings',
+           'expected_upcoming', 'projected_rate', 'risk_score']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS at_risk_students (
+    user_id INTEGER PRIMARY KEY,
+    rank INTEGER NOT NULL,
+    enrolled_meetings INTEGER NOT NULL,
+    attended_meetings INTEGER NOT NULL,
+    overall_rate REAL NOT NULL,
+    upcoming_meetings INTEGER NOT NULL,
+    expected_upcoming REAL NOT NULL,
+    projected_rate REAL NOT NULL,
+    risk_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS at_risk_rank ON at_risk_students (rank);
+CREATE INDEX IF NOT EXISTS at_risk_overall_rate ON at_risk_students (overall_rate, rank);
+CREATE INDEX IF NOT EXISTS at_risk_projected_rate ON at_risk_students (projected_rate, rank);
+CREATE TABLE IF NOT EXISTS store_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def load_history_counts(cnx, enrollment_index=False):
+    """(user_ids, enrolled, attended) of every student with at least one enrolled meeting, sorted by user_id."""
+    store = open_store_if_present()
+    if store is not None:
+        try:
+            counts = store.all_counts()
+        finally:
+            store.close()
+    else:
+        counts = cnx.query_df(use_enrollment_index(FULL_RECOMPUTE_QUERY) if enrollment_index else FULL_RECOMPUTE_QUERY)
+    counts = counts[counts['total_meetings'] > 0].sort_values('user_id', kind='stable')
+    return (counts['user_id'].to_numpy(dtype=np.int64), counts['total_meetings'].to_numpy(dtype=np.int64),
+            counts['attended_meetings'].to_numpy(dtype=np.int64))
+
+
+def combine(user_ids, enrolled, attended, upcoming_users, upcoming_probas):
+    """
+    The at_risk_students columns (COLUMNS -> array, one entry per student of `user_ids`,
+    which must be sorted) from the history counts and the predicted presence probability
+    of each upcoming (meeting, user) row. Rows of users without history are ignored.
+    """
+    upcoming_users = np.asarray(upcoming_users, dtype=np.int64)
+    positions = np.searchsorted(user_ids, upcoming_users)
+    known = positions < len(user_ids)
+    known[known] = user_ids[positions[known]] == upcoming_users[known]
+    positions = positions[known]
+
+    upcoming = np.bincount(positions, minlength=len(user_ids))
+    expected = np.bincount(positions, weights=np.asarray(upcoming_probas, dtype=np.float64)[known],
+                           minlength=len(user_ids))
+    overall_rate = attended / enrolled
+    # The upcoming meetings are already among the enrolled ones; max() guards against a stale store.
+    projected_rate = np.minimum((attended + expected) / np.maximum(enrolled, upcoming), 1.0)
+    risk_score = 1.0 - projected_rate
+
+    # Highest risk first, then the lower historical rate, then user_id for a stable order.
+    order = np.lexsort((user_ids, overall_rate, -risk_score))
+    rank = np.empty(len(user_ids), dtype=np.int64)
+    rank[order] = np.arange(1, len(user_ids) + 1)
+    return {
+        'user_id': user_ids, 'rank': rank, 'enrolled_meetings': enrolled, 'attended_meetings': attended,
+        'overall_rate': overall_rate, 'upcoming_meetings': upcoming, 'expected_upcoming': expected,
+        'projected_rate': projected_rate, 'risk_score': risk_score,
+    }
+
+
+class AtRiskStore(SqliteStore):
+    """SQLite-backed ranking of students by attendance risk."""
+
+    SCHEMA = SCHEMA
+    BUILT_KEY = 'scored_at'
+
+    def __init__(self, path=DEFAULT_AT_RISK_PATH, read_only=False):
+        super().__init__(path, read_only)
+
+    def replace(self, columns, state):
+        """Replaces the ranking with `columns` (see combine()) and records `state`, in one transaction."""
+        rows = zip(*(columns[name].tolist() for name in COLUMNS))
+        with self.conn:
+            self.conn.execute("DELETE FROM at_risk_students")
+            self.conn.executemany(
+                f"INSERT INTO at_risk_students ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            self.conn.execute("DELETE FROM store_state")
+            self.conn.executemany("INSERT INTO store_state (key, value) VALUES (?, ?)",
+                                  [(key, str(value)) for key, value in state.items()])
+
+    def page(self, threshold=None, min_meetings=0, projected_threshold=None, limit=None, offset=0):
+        """Students matching the filters in rank order, as a DataFrame."""
+        query = f"SELECT {', '.join(COLUMNS)} FROM at_risk_students WHERE enrolled_meetings >= ?"
+        params = [int(min_meetings)]
+        if threshold is not None:
+            query += " AND overall_rate < ?"
+            params.append(float(threshold))
+        if projected_threshold is not None:
+            query += " AND projected_rate < ?"
+            params.append(float(projected_threshold))
+        query += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else int(limit), int(offset)]
+        return pd.read_sql(query, self.conn, params=params)
+
+
+def model_version(model_path=None):
+    if model_path:
+        return os.path.abspath(model_path)
+    registry = open_registry_if_present()
+    version = registry.current_version() if registry else None
+    return version or 'attendance_model.pkl'
+
+
+def run(cnx, model, day_from, day_to, n_workers=1, enrollment_index=False):
+    """
+    Scores every student from `cnx` (a db.PooledConnection on the source database);
+    returns (columns for AtRiskStore.replace, stats dict).
+    """
+    start = time.perf_counter()
+    user_ids, enrolled, attended = load_history_counts(cnx, enrollment_index)
+    history_done = time.perf_counter()
+
+    meetings = select_meetings(cnx, day_from=day_from, day_to=day_to)
+    upcoming_users, probas = np.empty(0, dtype=np.int64), np.empty(0)
+    if not meetings.empty:
+        # The model's history features come from the counts already loaded.
+        history = (user_ids, attended / enrolled, enrolled)
+        rows, X = build_batch(cnx, meetings, day_from, day_to, enrollment_index, history)
+        if len(rows):
+            probas, _ = score(model, X, n_workers)
+            upcoming_users = rows['user_id'].to_numpy(dtype=np.int64)
+    scored = time.perf_counter()
+
+    columns = combine(user_ids, enrolled, attended, upcoming_users, probas)
+    combined = time.perf_counter()
+    stats = {
+        'students': len(user_ids),
+        'upcoming_meetings': len(meetings),
+        'scored_rows': len(upcoming_users),
+        'history_seconds': round(history_done - start, 3),
+        'predict_seconds': round(scored - history_done, 3),
+        'combine_seconds': round(combined - scored, 4),
+    }
+    return columns, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_AT_RISK_PATH, help="Path of the SQLite at-risk ranking.")
+    parser.add_argument('--use-enrollment-index', action='store_true',
+                        help="Read enrollment through the enrollment side tables (see enrollment_index.py).")
+    parser.add_argument('--sqlite', help="Use a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    score_parser = sub.add_parser('score', help="Score every student and replace the ranking.")
+    score_parser.add_argument('--from', dest='day_from', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                              help="First day of the upcoming meetings (default: today).")
+    score_parser.add_argument('--days', type=int, default=DEFAULT_HORIZON_DAYS, help="Days of upcoming meetings to score.")
+    score_parser.add_argument('--model', help="Model to use (default: the registry's current version, else attendance_model.pkl).")
+    score_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Scoring threads (default: all cores).")
+    show_parser = sub.add_parser('show', help="Print a page of the ranking.")
+    show_parser.add_argument('--threshold', type=float, help="Only students with overall_rate below this.")
+    show_parser.add_argument('--projected-threshold', type=float, help="Only students with projected_rate below this.")
+    show_parser.add_argument('--min-meetings', type=int, default=0)
+    show_parser.add_argument('--limit', type=int, default=20)
+    show_parser.add_argument('--offset', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'score':
+        store = AtRiskStore(args.store)
+    else:
+        store = AtRiskStore.open_if_built(args.store)
+        if store is None:
+            print(f"ERROR: No at-risk ranking has been built at {args.store}; run 'score' first.")
+            sys.exit(1)
+    try:
+        if args.command == 'show':
+            print(store.page(args.threshold, args.min_meetings, args.projected_threshold, args.limit, args.offset)
+                  .to_string(index=False))
+            print(f"-> Scored at {store.get_state('scored_at')} with model {store.get_state('model_version')}, "
+                  f"upcoming meetings {store.get_state('day_from')} to {store.get_state('day_to')}.")
+            return
+
+        database = Database.open(args.sqlite, size=1)
+        try:
+            day_to = args.day_from + datetime.timedelta(days=args.days - 1)
+            model = load_batch_model(args.model)
+            with database.connection() as cnx:
+                columns, stats = run(cnx, model, args.day_from, day_to, args.workers, args.use_enrollment_index)
+            start = time.perf_counter()
+            store.replace(columns, {
+                'scored_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'model_version': model_version(args.model),
+                'day_from': args.day_from.isoformat(),
+                'day_to': day_to.isoformat(),
+            })
+            stats['write_seconds'] = round(time.perf_counter() - start, 3)
+            print(f"-> At-risk ranking written to {args.store}: {stats}")
+        finally:
+            database.close()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Batch attendance prediction for many meetings in one pass.
+
+Enrollments, attendance history and schedules for every selected meeting are pulled with
+set-based queries, the combined feature matrix is scored in a single pass (split into
+chunks across threads), and the results are written to a Parquet file and/or a table.
+
+    python batch_predict.py --meetings 101 102 103 --output predictions.parquet
+    python batch_predict.py --from 2025-03-03 --to 2025-03-09 --table meeting_predictions
+
+The schema records no date on meetings, so a date range selects the meetings of classes
+planned in that range that have no participation recorded yet (pass --include-held to
+keep the others); each meeting takes the latest planning slot of its class in the range.
+"""
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from db import Database, is_sqlite
+from enrollment_index import use_enrollment_index
+from feature_store import open_store_if_present
+from features import DEFAULT_ATTENDANCE_RATE, build_feature_matrix
+from model_artifact import is_artifact
+from model_registry import PICKLE_FILENAME
+from predict_from_json import default_model_path, load_model
+
+# --- CONFIG ---
+DEFAULT_CHUNK_SIZE = 50_000
+
+ENROLLMENTS_QUERY = """
+SELECT c.id AS class_id, p.user_id, c.id_cours AS course_id, c.id_professeur, co.id_matiere
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN cours co ON c.id_cours = co.id
+WHERE c.id IN ({class_ids})
+"""
+
+HISTORY_QUERY = """
+SELECT p.user_id, COUNT(m.id) AS user_total_meetings, COUNT(pm.id) AS attended_meetings
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+WHERE p.user_id IN ({user_ids})
+GROUP BY p.user_id
+"""
+
+MEETINGS_BY_ID_QUERY = """
+SELECT m.id AS meeting_id, m.id_classe AS class_id
+FROM meetings m
+WHERE m.id IN ({meeting_ids})
+"""
+
+MEETINGS_IN_RANGE_QUERY = """
+SELECT DISTINCT m.id AS meeting_id, m.id_classe AS class_id
+FROM meetings m
+JOIN planning_cours_journaliers pcj ON pcj.id_classe = m.id_classe
+WHERE pcj.day BETWEEN '{day_from}' AND '{day_to}'
+{held_filter}
+"""
+
+NOT_HELD_FILTER = "AND NOT EXISTS (SELECT 1 FROM participation_meetings pm WHERE pm.id_meeting = m.id)"
+
+PLANNING_QUERY = """
+SELECT pcj.id_classe AS class_id, pcj.day AS scheduled_day, pcj.heure_from AS scheduled_hour
+FROM planning_cours_journaliers pcj
+WHERE pcj.id_classe IN ({class_ids}) {day_filter}
+"""
+
+PREDICTIONS_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    meeting_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    probability_of_presence DOUBLE NOT NULL,
+    prediction INTEGER NOT NULL,
+    predicted_at VARCHAR(32) NOT NULL,
+    PRIMARY KEY (meeting_id, user_id)
+)
+"""
+
+
+def _id_list(ids):
+    # Ids are inlined as integers, so the queries work with any DB-API driver's paramstyle.
+    return ','.join(str(int(i)) for i in ids)
+
+
+def _batched(values, size=5000):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def select_meetings(cnx, meeting_ids=None, day_from=None, day_to=None, include_held=False):
+    """
+    Returns a DataFrame of (meeting_id, class_id) for the requested meetings. Here and below
+    `cnx` is a db.PooledConnection on the source database.
+    """
+    if meeting_ids:
+        return cnx.query_df(MEETINGS_BY_ID_QUERY.format(meeting_ids=_id_list(meeting_ids)))
+    return cnx.query_df(MEETINGS_IN_RANGE_QUERY.format(
+        day_from=day_from.isoformat(), day_to=day_to.isoformat(),
+        held_filter='' if include_held else NOT_HELD_FILTER,
+    ))
+
+
+def load_schedules(cnx, class_ids, day_from=None, day_to=None):
+    """Latest planning slot per class (within the range, if one is given)."""
+    day_filter = ''
+    if day_from is not None:
+        day_filter = f"AND pcj.day BETWEEN '{day_from.isoformat()}' AND '{day_to.isoformat()}'"
+    planning = cnx.query_df(PLANNING_QUERY.format(class_ids=_id_list(class_ids), day_filter=day_filter))
+    if planning.empty:
+        return pd.DataFrame(columns=['class_id', 'scheduled_day', 'scheduled_hour'])
+    planning['scheduled_day'] = pd.to_datetime(planning['scheduled_day'])
+    planning = planning.sort_values(['class_id', 'scheduled_day'], kind='stable')
+    return planning.drop_duplicates('class_id', keep='last')
+
+
+def load_enrollments(cnx, class_ids, enrollment_index=False):
+    query = ENROLLMENTS_QUERY
+    if enrollment_index:
+        query = use_enrollment_index(query)
+    frames = [cnx.query_df(query.format(class_ids=_id_list(batch))) for batch in _batched(class_ids)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def load_history(cnx, user_ids, enrollment_index=False):
+    """(user_ids, rates, counts) from the feature store if built, else one aggregate query."""
+    store = open_store_if_present()
+    if store is not None:
+        try:
+            history_df = store.get_features(user_ids)
+        finally:
+            store.close()
+    else:
+        query = HISTORY_QUERY
+        if enrollment_index:
+            query = use_enrollment_index(query)
+        frames = [cnx.query_df(query.format(user_ids=_id_list(batch))) for batch in _batched(user_ids)]
+        history_df = pd.concat(frames, ignore_index=True)
+        history_df['user_attendance_rate'] = history_df['attended_meetings'] / history_df['user_total_meetings']
+    return (history_df['user_id'].to_numpy(), history_df['user_attendance_rate'].to_numpy(),
+            history_df['user_total_meetings'].to_numpy())
+
+
+def build_batch(cnx, meetings, day_from=None, day_to=None, enrollment_index=False, history=None):
+    """
+    Returns (rows, X): one row per (meeting, enrolled user) with its float32 feature vector.
+    `history` is (user_ids, rates, counts) when the caller already has it, else it is loaded.
+    """
+    class_ids = sorted(meetings['class_id'].astype(int).unique())
+    enrollments = load_enrollments(cnx, class_ids, enrollment_index)
+    if enrollments.empty:
+        return enrollments, np.empty((0, 9), dtype=np.float32)
+    schedules = load_schedules(cnx, class_ids, day_from, day_to)
+
+    rows = meetings.merge(enrollments, on='class_id', how='inner')
+    rows = rows.merge(schedules, on='class_id', how='left')
+    rows = rows.sort_values(['meeting_id', 'user_id'], kind='stable').reset_index(drop=True)
+
+    if history is None:
+        history = load_history(cnx, rows['user_id'].unique(), enrollment_index)
+    X = build_feature_matrix(rows, history, default_rate=DEFAULT_ATTENDANCE_RATE)
+    return rows, X
+
+
+def load_batch_model(model_path=None):
+    """
+    The model to score whole batches with: `model_path`, else the registry's current version,
+    else attendance_model.pkl. Whole batches score faster through scikit-learn's compiled
+    trees, and registry versions keep the pickle next to the packed arrays.
+    """
+    model_path = model_path or default_model_path()
+    if is_artifact(model_path) and os.path.exists(os.path.join(model_path, PICKLE_FILENAME)):
+        model_path = os.path.join(model_path, PICKLE_FILENAME)
+    return load_model(model_path)
+
+
+def score(model, X, n_workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Presence probabilities and labels for the whole matrix. predict_proba runs once per chunk;
+    chunks are spread over n_workers threads (tree traversal releases the GIL), with the
+    forest's own n_jobs set to 1 so the two levels of parallelism do not oversubscribe.
+    Labels are derived from the probabilities, exactly as RandomForestClassifier.predict does.
+    """
+    if len(X) == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+
+    if n_workers <= 1 or len(X) <= chunk_size:
+        proba = model.predict_proba(X)
+    else:
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+        chunks = [X[i:i + chunk_size] for i in range(0, len(X), chunk_size)]
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            proba = np.vstack(list(pool.map(model.predict_proba, chunks)))
+
+    labels = model.classes_.take(np.argmax(proba, axis=1))
+    return proba[:, 1], labels
+
+
+def write_parquet(results, path):
+    results.to_parquet(path, index=False)
+
+
+def write_table(cnx, results, table):
+    """Upserts the predictions into `table` of the given database (created if missing)."""
+    cnx.execute(PREDICTIONS_DDL.format(table=table))
+    verb = 'INSERT OR REPLACE' if is_sqlite(cnx) else 'REPLACE'
+    cnx.executemany(
+        f"{verb} INTO {table} (meeting_id, user_id, probability_of_presence, prediction, predicted_at) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        list(results[['meeting_id', 'user_id', 'probability_of_presence', 'prediction', 'predicted_at']]
+             .itertuples(index=False, name=None)),
+    )
+
+
+def run(cnx, model, meeting_ids=None, day_from=None, day_to=None, include_held=False,
+        n_workers=1, chunk_size=DEFAULT_CHUNK_SIZE, enrollment_index=False):
+    """Predicts every selected meeting; returns (results DataFrame, stats dict)."""
+    start = time.perf_counter()
+    meetings = select_meetings(cnx, meeting_ids, day_from, day_to, include_held)
+    if meetings.empty:
+        return pd.DataFrame(), {'meetings': 0, 'predictions': 0}
+    rows, X = build_batch(cnx, meetings, day_from, day_to, enrollment_index)
+    prepared = time.perf_counter()
+
+    probas, labels = score(model, X, n_workers, chunk_size)
+    scored = time.perf_counter()
+
+    results = pd.DataFrame({
+        'meeting_id': rows['meeting_id'].to_numpy(dtype=np.int64) if len(rows) else np.empty(0, dtype=np.int64),
+        'user_id': rows['user_id'].to_numpy(dtype=np.int64) if len(rows) else np.empty(0, dtype=np.int64),
+        'probability_of_presence': probas,
+        'prediction': labels.astype(np.int64),
+    })
+    results['predicted_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+    score_s = scored - prepared
+    total_s = scored - start
+    stats = {
+        'meetings': int(meetings['meeting_id'].nunique()),
+        'predictions': len(results),
+        'query_seconds': round(prepared - start, 3),
+        'score_seconds': round(score_s, 3),
+        'scoring_predictions_per_sec': round(len(results) / score_s, 1) if score_s > 0 else None,
+        'end_to_end_predictions_per_sec': round(len(results) / total_s, 1) if total_s > 0 else None,
+    }
+    return results, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument('--meetings', type=int, nargs='+', help="Meeting ids to predict.")
+    selection.add_argument('--from', dest='day_from', type=datetime.date.fromisoformat, help="First day (YYYY-MM-DD).")
+    parser.add_argument('--to', dest='day_to', type=datetime.date.fromisoformat, help="Last day (YYYY-MM-DD).")
+    parser.add_argument('--include-held', action='store_true', help="With a date range, also predict meetings that already have participation.")
+    parser.add_argument('--model', help="Model to use (default: the registry's current version, else attendance_model.pkl).")
+    parser.add_argument('--output', help="Parquet file to write the predictions to.")
+    parser.add_argument('--table', help="Table of the source database to upsert the predictions into.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Scoring threads (default: all cores).")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--use-enrollment-index', action='store_true',
+                        help="Join class membership through the enrollment side tables (see enrollment_index.py).")
+    parser.add_argument('--sqlite', help="Use a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    args = parser.parse_args()
+    if args.day_from and not args.day_to:
+        parser.error("--from requires --to")
+
+    database = Database.open(args.sqlite, size=1)
+    try:
+        with database.connection() as cnx:
+            model = load_batch_model(args.model)
+            results, stats = run(cnx, model, args.meetings, args.day_from, args.day_to, args.include_held,
+                                 args.workers, args.chunk_size, args.use_enrollment_index)
+            if args.output:
+                write_parquet(results, args.output)
+                print(f"-> Predictions written to {args.output}")
+            if args.table:
+                write_table(cnx, results, args.table)
+                print(f"-> Predictions written to table {args.table}")
+            print(f"-> {stats}")
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+End-to-end benchmark of the project's hot paths on a synthetic database (synthetic_db.py),
+with JSON results that can be compared run over run.
+
+    generate         build the synthetic SQLite database (skipped with --sqlite)
+    extract          the training extraction (train_model.extract, UNIFIED_QUERY)
+    extract_partitioned
+                     the same rows pulled as one query per class id range on a pool of
+                     --extract-workers connections (extract.extract_partitioned), with its
+                     speedup over extract and whether it returned the same frame
+    features         train_model.engineer_features on the extract
+    fit              train_model.fit on at most --fit-rows training rows
+    predict_meeting  one meeting as predictForMeeting does it: enrollment, history and
+                     schedule queries, the feature matrix and the packed forest
+    user_record      the analytics page's per-user totals (live query)
+    user_meetings    the analytics page's per-user meeting table (live query)
+    at_risk          the at-risk students aggregation of AnalyticsController
+
+Every stage is run --repeat times (the per-meeting and per-user stages once per sampled
+meeting or user) and reported as its median, minimum and maximum. The results, with the
+scale, the git commit and the machine, are written to bench_results/ (or --json); pass an
+earlier file as --compare to print the change per stage and flag regressions beyond
+--tolerance:
+
+    python bench_end_to_end.py --scale 10k
+    python bench_end_to_end.py --scale 10k --compare bench_results/e2e_10k_20250301-101500.json
+    python bench_end_to_end.py --sqlite synthetic_100k.sqlite --stages extract features --repeat 3
+    python bench_end_to_end.py --sqlite synthetic_100k.sqlite --stages extract extract_partitioned --extract-workers 8
+    python bench_end_to_end.py --scale 100k --enrollment-index --fail-on-regression --compare baseline.json
+
+The stores and caches a deployment may have (feature store, meeting statistics store,
+registry) are not used, so the numbers measure the live code paths.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import train_model
+from batch_predict import ENROLLMENTS_QUERY, HISTORY_QUERY, PLANNING_QUERY
+from db import Database, connect
+from enrollment_index import build_side_tables, use_enrollment_index
+from extract import CLASS_RANGE_QUERY, extract_partitioned, peak_rss_mb
+from features import DEFAULT_ATTENDANCE_RATE, build_feature_matrix
+from forest_engine import PackedForest, predict_with_proba
+from synthetic_db import SCALES, connect_sqlite, generate, scale_counts
+from user_analytics import UserAnalytics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(SCRIPT_DIR, 'bench_results')
+
+STAGES = ('extract', 'extract_partitioned', 'features', 'fit', 'predict_meeting', 'user_record', 'user_meetings', 'at_risk')
+
+DEFAULT_FIT_ROWS = 500_000
+DEFAULT_SAMPLES = 20
+DEFAULT_TOLERANCE = 0.10
+DEFAULT_EXTRACT_WORKERS = 4
+
+# AnalyticsController::getAtRiskStudents, with its default threshold and minimum meetings.
+AT_RISK_QUERY = """
+SELECT p.user_id, COUNT(m.id) AS enrolled_meetings, COUNT(pm.id) AS attended_meetings,
+       (COUNT(pm.id) * 1.0 / COUNT(m.id)) AS overall_rate
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes) > 0
+JOIN meetings m ON m.id_classe = c.id
+LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+GROUP BY p.user_id
+HAVING overall_rate < 0.6 AND enrolled_meetings >= 5
+ORDER BY overall_rate ASC
+"""
+
+# A path no store is ever written to, so UserAnalytics runs its live queries.
+NO_STORE = os.path.join(tempfile.gettempdir(), 'bench_end_to_end_no_store.sqlite')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn):
+    """(result, seconds) of fn()."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def summarize(seconds, **details):
+    return {'median_s': statistics.median(seconds), 'min_s': min(seconds), 'max_s': max(seconds),
+            'runs': len(seconds), **details}
+
+
+def quiet(fn):
+    """fn() with its progress prints swallowed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+
+def predict_meeting(cnx, model, meeting_id, class_id, enrollment_index=False):
+    """The single-meeting prediction path: three queries, the feature matrix and the forest."""
+    rewrite = use_enrollment_index if enrollment_index else (lambda query: query)
+    enrolled = pd.read_sql(rewrite(ENROLLMENTS_QUERY).format(class_ids=int(class_id)), cnx)
+    if enrolled.empty:
+        return np.empty(0)
+    user_ids = ','.join(str(int(u)) for u in enrolled['user_id'].unique())
+    history_df = pd.read_sql(rewrite(HISTORY_QUERY).format(user_ids=user_ids), cnx)
+    history = (history_df['user_id'], history_df['attended_meetings'] / history_df['user_total_meetings'],
+               history_df['user_total_meetings'])
+    planning = pd.read_sql(PLANNING_QUERY.format(class_ids=int(class_id), day_filter=''), cnx)
+    schedule = None
+    if not planning.empty:
+        latest = planning.sort_values('scheduled_day').iloc[-1]
+        schedule = (latest['scheduled_day'], latest['scheduled_hour'])
+    X = build_feature_matrix(enrolled, history, schedule=schedule, default_rate=DEFAULT_ATTENDANCE_RATE)
+    return predict_with_proba(model, X)[1]
+
+
+def run_suite(path, stages, repeat=1, samples=DEFAULT_SAMPLES, fit_rows=DEFAULT_FIT_ROWS,
+              enrollment_index=False, seed=0, extract_workers=DEFAULT_EXTRACT_WORKERS):
+    """Runs the requested stages against the SQLite database at `path`; returns {stage: summary}."""
+    results = {}
+    rng = np.random.default_rng(seed)
+    cnx = connect(sqlite=path)
+    extract = lambda: quiet(lambda: train_model.extract(cnx, enrollment_index=enrollment_index))
+
+    df = X = y = model = None
+    if {'extract', 'features', 'fit', 'predict_meeting'} & set(stages):
+        times = []
+        for _ in range(repeat if 'extract' in stages else 1):
+            df, seconds = timed(extract)
+            times.append(seconds)
+        if 'extract' in stages:
+            results['extract'] = summarize(times, rows=len(df))
+            print(f"-> extract: {results['extract']['median_s']:.2f} s, {len(df):,} rows")
+
+    if 'extract_partitioned' in stages:
+        pool = Database.sqlite(path, size=extract_workers)
+        query = use_enrollment_index(CLASS_RANGE_QUERY) if enrollment_index else CLASS_RANGE_QUERY
+        times = []
+        for _ in range(repeat):
+            (partitioned, stats), seconds = timed(lambda: quiet(lambda: extract_partitioned(pool, extract_workers, query=query)))
+            times.append(seconds)
+        pool.close()
+        details = {'rows': len(partitioned), 'workers': extract_workers, 'partitions': stats['partitions']}
+        if 'extract' in results:
+            details['same_rows'] = bool(partitioned.equals(df))
+            details['speedup'] = round(results['extract']['median_s'] / statistics.median(times), 2)
+        results['extract_partitioned'] = summarize(times, **details)
+        print(f"-> extract_partitioned: {results['extract_partitioned']['median_s']:.2f} s on {extract_workers} connections"
+              + (f", {details['speedup']}x, same rows: {details['same_rows']}" if 'speedup' in details else ''))
+        partitioned = None
+
+    if {'features', 'fit', 'predict_meeting'} & set(stages):
+        times = []
+        for _ in range(repeat if 'features' in stages else 1):
+            (X, y), seconds = timed(lambda: quiet(lambda: train_model.engineer_features(df)))
+            times.append(seconds)
+        if 'features' in stages:
+            results['features'] = summarize(times, rows=len(X))
+            print(f"-> features: {results['features']['median_s']:.2f} s")
+
+    if {'fit', 'predict_meeting'} & set(stages):
+        if len(X) > fit_rows:
+            keep = np.sort(rng.choice(len(X), fit_rows, replace=False))
+            X, y = X[keep], y[keep]
+        times = []
+        for _ in range(repeat if 'fit' in stages else 1):
+            model, seconds = timed(lambda: quiet(lambda: train_model.fit(X, y)))
+            times.append(seconds)
+        if 'fit' in stages:
+            results['fit'] = summarize(times, rows=len(X))
+            print(f"-> fit: {results['fit']['median_s']:.2f} s on {len(X):,} rows")
+    df = X = y = None
+
+    if 'predict_meeting' in stages:
+        packed = PackedForest.from_model(model)
+        meetings = pd.read_sql("SELECT id, id_classe FROM meetings", cnx)
+        picked = meetings.iloc[rng.choice(len(meetings), min(samples, len(meetings)), replace=False)]
+        times, users = [], []
+        for _ in range(repeat):
+            for meeting_id, class_id in picked.itertuples(index=False):
+                probas, seconds = timed(lambda: predict_meeting(cnx, packed, meeting_id, class_id, enrollment_index))
+                times.append(seconds)
+                users.append(len(probas))
+        results['predict_meeting'] = summarize(times, meetings=len(picked), mean_users=float(np.mean(users)))
+        print(f"-> predict_meeting: {results['predict_meeting']['median_s'] * 1000:.1f} ms median")
+    cnx.close()
+
+    if {'user_record', 'user_meetings', 'at_risk'} & set(stages):
+        database = Database.sqlite(path, size=1)
+        with database.connection() as pooled:
+            analytics = UserAnalytics(pooled, store_path=NO_STORE, stats_path=NO_STORE)
+            user_ids = analytics.users()['id'].to_numpy()
+            picked = rng.choice(user_ids, min(samples, len(user_ids)), replace=False)
+            for stage, method in (('user_record', analytics.user_record), ('user_meetings', analytics.user_meetings)):
+                if stage not in stages:
+                    continue
+                times = [timed(lambda: method(int(user_id)))[1] for _ in range(repeat) for user_id in picked]
+                results[stage] = summarize(times, users=len(picked))
+                print(f"-> {stage}: {results[stage]['median_s'] * 1000:.1f} ms median")
+            if 'at_risk' in stages:
+                query = use_enrollment_index(AT_RISK_QUERY) if enrollment_index else AT_RISK_QUERY
+                times = []
+                for _ in range(repeat):
+                    rows, seconds = timed(lambda: pooled.query(query))
+                    times.append(seconds)
+                results['at_risk'] = summarize(times, rows=len(rows[0]))
+                print(f"-> at_risk: {results['at_risk']['median_s']:.2f} s")
+        database.close()
+    return results
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Prints the change of every stage's median against a baseline run; returns the regressed stages."""
+    print(f"\n{'stage':<16} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    regressed = []
+    for stage, result in current['results'].items():
+        before = baseline['results'].get(stage)
+        if before is None:
+            print(f"{stage:<16} {'-':>11} {result['median_s']:>11.4f} {'new':>8}")
+            continue
+        change = result['median_s'] / before['median_s'] - 1 if before['median_s'] > 0 else 0.0
+        flag = ''
+        if change > tolerance:
+            regressed.append(stage)
+            flag = '  REGRESSION'
+        print(f"{stage:<16} {before['median_s']:>11.4f} {result['median_s']:>11.4f} {change:>+7.1%}{flag}")
+    if baseline.get('meta', {}).get('database') != current['meta']['database']:
+        print("-> Note: the baseline was run on a different database size; the comparison is only indicative.")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--sqlite', help="Benchmark an existing synthetic database instead of generating one.")
+    source.add_argument('--scale', choices=list(SCALES), default='10k', help="Users of the generated database.")
+    parser.add_argument('--meetings-per-class', type=int, default=12)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per stage (default: %(default)s).")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="Meetings / users timed per run.")
+    parser.add_argument('--fit-rows', type=int, default=DEFAULT_FIT_ROWS, help="Training rows sampled for fit.")
+    parser.add_argument('--extract-workers', type=int, default=DEFAULT_EXTRACT_WORKERS,
+                        help="Connections of the extract_partitioned stage (default: %(default)s).")
+    parser.add_argument('--enrollment-index', action='store_true',
+                        help="Build the enrollment side tables and join through them (see enrollment_index.py).")
+    parser.add_argument('--work-dir', help="Where the generated database goes (default: a temporary directory).")
+    parser.add_argument('--json', help="Results file (default: bench_results/e2e_<scale>_<timestamp>.json).")
+    parser.add_argument('--compare', help="Earlier results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown of a stage's median counted as a regression (default: %(default)s).")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on a regression.")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    results = {}
+    tmp = None
+    path = args.sqlite
+    if path is None:
+        tmp = tempfile.mkdtemp(prefix='bench_e2e_', dir=args.work_dir)
+        path = os.path.join(tmp, f"synthetic_{args.scale}.sqlite")
+        n_users = SCALES[args.scale]
+        n_classes, n_parcours = scale_counts(n_users)
+        print(f"-> Generating {n_users:,} users, {n_classes:,} classes, {n_parcours:,} parcours...")
+        conn = connect_sqlite(path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        _, seconds = timed(lambda: generate(conn, n_users=n_users, n_classes=n_classes, n_parcours=n_parcours,
+                                            meetings_per_class=args.meetings_per_class))
+        conn.close()
+        results['generate'] = summarize([seconds])
+        print(f"-> generate: {seconds:.2f} s")
+
+    try:
+        conn = connect_sqlite(path)
+        database = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ('parcour_group_pivot', 'classes', 'meetings', 'participation_meetings')}
+        if args.enrollment_index:
+            quiet(lambda: build_side_tables(conn))
+        conn.close()
+        results.update(run_suite(path, args.stages, args.repeat, args.samples, args.fit_rows, args.enrollment_index,
+                                 extract_workers=args.extract_workers))
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'scale': None if args.sqlite else args.scale,
+            'database': database,
+            'stages': args.stages,
+            'repeat': args.repeat,
+            'samples': args.samples,
+            'fit_rows': args.fit_rows,
+            'extract_workers': args.extract_workers,
+            'enrollment_index': args.enrollment_index,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'results': results,
+    }
+    out = args.json
+    if out is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        label = args.scale if not args.sqlite else os.path.splitext(os.path.basename(args.sqlite))[0]
+        out = os.path.join(DEFAULT_RESULTS_DIR, f"e2e_{label}_{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"-> Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(report, json.load(f), args.tolerance)
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Query-time benchmark: FIND_IN_SET class joins versus the enrollment side tables,
+on a synthetic dataset loaded into SQLite.
+
+    python bench_enrollment_index.py --users 5000 --classes 200
+
+SQLite evaluates FIND_IN_SET through a Python callback, so absolute numbers overstate the
+gap compared to MySQL; what carries over is that the FIND_IN_SET join visits every
+(parcours, class) pair while the side table is probed through its index.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from enrollment_index import EnrollmentIndex, build_side_tables, use_enrollment_index
+from extract import UNIFIED_QUERY
+from synthetic_db import connect_sqlite, generate
+
+ENROLLED_QUERY = """
+SELECT p.user_id, c.id_cours AS course_id, c.id_professeur, co.id_matiere
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN cours co ON c.id_cours = co.id
+WHERE c.id = {class_id}
+"""
+
+HISTORY_QUERY = """
+SELECT p.user_id, COUNT(m.id) AS user_total_meetings, COUNT(pm.id) AS attended_meetings
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+WHERE p.user_id = {user_id}
+GROUP BY p.user_id
+"""
+
+
+def time_query(conn, query, repeat):
+    """Returns (median seconds, rows) over `repeat` executions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(query).fetchall()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--classes', type=int, default=200)
+    parser.add_argument('--parcours', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = connect_sqlite()
+    start = time.perf_counter()
+    generate(conn, n_users=args.users, n_classes=args.classes, n_parcours=args.parcours)
+    print(f"-> Synthetic dataset generated in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    counts = build_side_tables(conn)
+    print(f"-> Side tables built in {time.perf_counter() - start:.3f}s: {counts}")
+
+    cases = {
+        'enrolled users of a class': (ENROLLED_QUERY.format(class_id=args.classes // 2), args.repeat),
+        'history of one user': (HISTORY_QUERY.format(user_id=args.users // 2), args.repeat),
+        'full training extract': (UNIFIED_QUERY, 1),
+    }
+    print(f"\n{'query':<28} {'FIND_IN_SET ms':>15} {'indexed ms':>12} {'speedup':>8}")
+    for name, (query, repeat) in cases.items():
+        base_s, base_rows = time_query(conn, query, repeat)
+        indexed_s, indexed_rows = time_query(conn, use_enrollment_index(query), repeat)
+        assert sorted(base_rows) == sorted(indexed_rows), f"{name}: results differ"
+        print(f"{name:<28} {base_s * 1000:>15.2f} {indexed_s * 1000:>12.2f} {base_s / indexed_s:>7.1f}x")
+
+    start = time.perf_counter()
+    index = EnrollmentIndex.from_parcours(conn)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for class_id in range(1, args.classes + 1):
+        index.users_for_class(class_id)
+    lookup_us = (time.perf_counter() - start) / args.classes * 1e6
+    print(f"\n-> In-memory CSR index: {len(index.class_ids)} pairs built in {build_s * 1000:.1f}ms, "
+          f"{lookup_us:.1f}us per class lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Inference benchmark: scikit-learn's predict() + predict_proba() (two traversals of the
+forest, as the API and the Streamlit app used to call them) versus a single
+PackedForest.predict_with_proba() pass, for single-request to batch-sized inputs.
+
+    python bench_forest_engine.py --model attendance_model.pkl --sizes 1 100 10000
+
+Both sides run on one thread (the model is scored with n_jobs=1), so the probabilities
+must match exactly; the benchmark fails otherwise.
+"""
+import argparse
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+
+from bench_features import make_rows
+from features import attendance_history, build_feature_matrix
+from forest_engine import PackedForest
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attendance_model.pkl')
+
+
+def median_ms(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10_000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # The benchmark feeds bare arrays; silence the feature-name and pickle-version warnings.
+    warnings.simplefilter('ignore')
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    model.set_params(n_jobs=1)
+
+    start = time.perf_counter()
+    engine = PackedForest.from_model(model)
+    print(f"-> Packed {engine.n_estimators} trees ({len(engine.is_leaf)} nodes) in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    df = make_rows(max(args.sizes))
+    presence = df['presence'].to_numpy()
+    X_all = build_feature_matrix(df, attendance_history(df['user_id'], presence), default_rate=presence.mean())
+
+    def sklearn_both(X):
+        return model.predict(X), model.predict_proba(X)
+
+    print(f"\n{'batch':>7} {'sklearn ms':>11} {'packed ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        X = X_all[:size]
+        labels, proba = engine.predict_with_proba(X)
+        expected_labels, expected_proba = sklearn_both(X)
+        assert np.array_equal(proba, expected_proba), f"batch {size}: probabilities differ"
+        assert np.array_equal(labels, expected_labels), f"batch {size}: labels differ"
+
+        repeat = max(3, args.repeat if size < 1000 else args.repeat // 4)
+        sklearn_ms = median_ms(sklearn_both, X, repeat)
+        packed_ms = median_ms(engine.predict_with_proba, X, repeat)
+        print(f"{size:>7} {sklearn_ms:>11.2f} {packed_ms:>10.2f} {sklearn_ms / packed_ms:>7.1f}x")
+    print("-> identical probabilities and labels")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Cold-start cost of the per-request prediction script and of the Streamlit app.
+
+Every measurement runs in a fresh interpreter:
+
+    predict_from_json   `import predict_from_json`, what the per-request process pays before
+                        it reads stdin
+    predict_request     `python predict_from_json.py < payload`: a whole request for --users
+                        users, including loading the model (--model: a pickle, which
+                        imports scikit-learn, or a model artifact, which needs NumPy only)
+    app                 `import app` from pred_train/, the module-level work that runs
+                        before any page is chosen
+
+For the imports, `python -X importtime` gives the total import time, the number of
+modules and the slowest imports, and shows which heavy packages were pulled
+in; the wall time of the same command without -X importtime is reported next to it.
+Results can be written with --json and compared with an earlier run with --compare:
+
+    python bench_import_time.py
+    python bench_import_time.py --model models/v0003
+    python bench_import_time.py --runs 10 --users 3000 --json import_after.json --compare import_before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_prediction_server import make_payload
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '..', '..', '..', 'pred_train'))
+
+HEAVY_PACKAGES = ('pandas', 'sklearn', 'scipy', 'pyarrow', 'plotly', 'mysql', 'joblib', 'streamlit')
+TOP_IMPORTS = 5
+
+
+def parse_importtime(stderr, target):
+    """
+    {total_ms, modules, heavy, top} from the `import time:` lines of -X importtime; `top`
+    lists the slowest imports at the top two nesting levels other than `target` itself.
+    """
+    modules = {}
+    top_level = []
+    shallow = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:  self_us | cumulative_us | <2 spaces per nesting level>name"
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        modules[name] = int(cumulative_us)
+        if depth == 0:
+            top_level.append((name, int(cumulative_us)))
+        if depth <= 1 and name != target:
+            shallow.append((name, int(cumulative_us)))
+    top = sorted(shallow, key=lambda item: -item[1])[:TOP_IMPORTS]
+    return {
+        'total_ms': sum(us for _, us in top_level) / 1000,
+        'modules': len(modules),
+        'heavy': sorted(p for p in HEAVY_PACKAGES if p in modules),
+        'top': [{'module': name, 'ms': us / 1000} for name, us in top],
+    }
+
+
+def run(command, cwd, stdin=None):
+    """(wall seconds, completed process) of one fresh interpreter."""
+    with open(stdin) if stdin else open(os.devnull) as f:
+        start = time.perf_counter()
+        proc = subprocess.run(command, cwd=cwd, stdin=f, capture_output=True, text=True)
+        return time.perf_counter() - start, proc
+
+
+def measure_import(module, cwd, runs):
+    profiles, walls = [], []
+    for _ in range(runs):
+        _, proc = run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd)
+        if proc.returncode != 0:
+            return {'error': proc.stderr.strip().splitlines()[-1]}
+        profiles.append(parse_importtime(proc.stderr, module))
+        walls.append(run([sys.executable, '-c', f"import {module}"], cwd)[0])
+    profile = min(profiles, key=lambda p: p['total_ms'])
+    profile['total_ms'] = statistics.median(p['total_ms'] for p in profiles)
+    profile['wall_ms'] = statistics.median(walls) * 1000
+    return profile
+
+
+def measure_request(payload_path, runs, model=None):
+    command = [sys.executable, '-W', 'ignore', os.path.join(SCRIPT_DIR, 'predict_from_json.py')]
+    if model:
+        command = [sys.executable, '-W', 'ignore', '-c', f"import predict_from_json; predict_from_json.main({model!r})"]
+    walls = []
+    for _ in range(runs):
+        wall, proc = run(command, SCRIPT_DIR, stdin=payload_path)
+        if proc.returncode != 0 or proc.stdout.startswith('{"error"'):
+            return {'error': (proc.stdout or proc.stderr).strip()[:200]}
+        walls.append(wall)
+    return {'wall_ms': statistics.median(walls) * 1000}
+
+
+def print_result(name, result):
+    if 'error' in result:
+        print(f"{name:<18} not measured: {result['error']}")
+        return
+    if 'total_ms' not in result:
+        print(f"{name:<18} wall {result['wall_ms']:>8.0f} ms")
+        return
+    print(f"{name:<18} wall {result['wall_ms']:>8.0f} ms   imports {result['total_ms']:>7.0f} ms   "
+          f"{result['modules']:>5} modules   heavy: {', '.join(result['heavy']) or '-'}")
+    for item in result['top']:
+        print(f"{'':<22}{item['module']:<40} {item['ms']:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement (median).")
+    parser.add_argument('--users', type=int, default=300, help="Users in the predict_request payload.")
+    parser.add_argument('--model', help="Model for predict_request: a pickle or model artifact directory "
+                                        "(default: the script's own choice, the registry's current version or the pickle).")
+    parser.add_argument('--json', help="Write the results to this file.")
+    parser.add_argument('--compare', help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        f.write(make_payload(args.users))
+        payload_path = f.name
+    try:
+        results = {
+            'predict_from_json': measure_import('predict_from_json', SCRIPT_DIR, args.runs),
+            'predict_request': measure_request(payload_path, args.runs, args.model and os.path.abspath(args.model)),
+            'app': measure_import('app', APP_DIR, args.runs),
+        }
+    finally:
+        os.unlink(payload_path)
+
+    for name, result in results.items():
+        print_result(name, result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'users': args.users, 'results': results}, f, indent=2)
+        print(f"-> Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print(f"\n{'':<18} {'before ms':>10} {'after ms':>10} {'change':>8}")
+        for name, result in results.items():
+            before = baseline.get(name, {})
+            if 'wall_ms' in result and 'wall_ms' in before:
+                print(f"{name:<18} {before['wall_ms']:>10.0f} {result['wall_ms']:>10.0f} "
+                      f"{result['wall_ms'] / before['wall_ms'] - 1:>+7.1%}")
+
+
+if __name__ == "__main__":
+    main()
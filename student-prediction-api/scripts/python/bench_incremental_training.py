@@ -0,0 +1,129 @@
+"""
+Full refit versus incremental (warm-start) retraining, on a synthetic term of weekly meetings.
+
+The weeks before the last two are the history the current model was trained on, the
+second to last week is the newly arrived data, and the last week is the held-out later
+time slice every model is scored on:
+
+    base         the current model, not updated (for reference)
+    full refit   train_model.fit() on the history plus the new week
+    incremental  train_model.fit_incremental(): the base model plus trees fitted on the new week
+
+Each variant runs in its own forked process, which reports the fit time, the memory the
+fit added on top of the loaded data (peak RSS; Linux resets the peak through
+/proc/self/clear_refs) and the accuracy on the last week.
+
+    python bench_incremental_training.py --users 3000 --classes 120 --weeks 16
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+import train_model
+from extract import UNIFIED_QUERY
+from rolling_history import NO_DAY
+from synthetic_db import connect_sqlite, generate
+
+
+def _rss_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return None
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _measure(conn, fit, X_test, y_test):
+    """Child process: fit, then send (seconds, fit peak MB, accuracy, n_trees) to the parent."""
+    reset = _reset_peak_rss()
+    before = _rss_kb('VmRSS') if reset else 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        model = fit()
+        seconds = time.perf_counter() - start
+    peak = _rss_kb('VmHWM')
+    peak_mb = (peak - before) / 1024 if peak is not None else float('nan')
+    model.n_jobs = 1
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    conn.send((seconds, peak_mb, accuracy, len(model.estimators_)))
+    conn.close()
+
+
+def run_variant(fit, X_test, y_test):
+    ctx = multiprocessing.get_context('fork')
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_measure, args=(child, fit, X_test, y_test))
+    proc.start()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--classes', type=int, default=120)
+    parser.add_argument('--weeks', type=int, default=16)
+    parser.add_argument('--new-trees', type=int, default=train_model.DEFAULT_NEW_TREES)
+    parser.add_argument('--max-trees', type=int, default=train_model.DEFAULT_MAX_TREES)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    print(f"-> Generating {args.weeks} weeks of meetings for {args.users} users in {args.classes} classes...")
+    conn = generate(connect_sqlite(), n_users=args.users, n_classes=args.classes,
+                    meetings_per_class=args.weeks, n_parcours=max(args.classes // 5, 1))
+    df = pd.read_sql(UNIFIED_QUERY, conn)
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y, days = train_model.engineer_features(df, with_days=True)
+
+    dated = days != NO_DAY
+    week = np.where(dated, (days - days[dated].min()) // 7, -1)
+    last = week.max()
+    history = dated & (week < last - 1)
+    new = week == last - 1
+    test = week == last
+    X_test, y_test = X[test], y[test]
+    print(f"-> {history.sum():,} history rows, {new.sum():,} new rows, {test.sum():,} held-out rows (last week)")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        base_model = train_model.fit(X[history], y[history])
+    seen = history | new
+
+    variants = {
+        'base': lambda: base_model,
+        'full refit': lambda: train_model.fit(X[seen], y[seen]),
+        'incremental': lambda: train_model.fit_incremental(base_model, X[new], y[new], args.new_trees, args.max_trees),
+    }
+    print(f"\n{'variant':<12} {'trees':>6} {'fit s':>8} {'fit MB':>8} {'accuracy':>9}")
+    results = {}
+    for name, fit in variants.items():
+        seconds, peak_mb, accuracy, n_trees = run_variant(fit, X_test, y_test)
+        results[name] = (seconds, peak_mb, accuracy)
+        if name == 'base':
+            print(f"{name:<12} {n_trees:>6} {'-':>8} {'-':>8} {accuracy:>9.4f}")
+        else:
+            print(f"{name:<12} {n_trees:>6} {seconds:>8.2f} {peak_mb:>8.1f} {accuracy:>9.4f}")
+
+    full, incremental = results['full refit'], results['incremental']
+    print(f"-> incremental: {full[0] / incremental[0]:.1f}x faster fit, "
+          f"accuracy {incremental[2] - full[2]:+.4f} versus the full refit on the later week")
+
+
+if __name__ == "__main__":
+    main()
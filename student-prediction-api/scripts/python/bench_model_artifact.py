@@ -0,0 +1,158 @@
+"""
+Cold-start benchmark of the model formats: pickle, joblib and the memory-mapped artifact
+directory of model_artifact.py (also loaded without mmap, for reference).
+
+For each format, --workers processes are started at the same time, like the workers of a
+prediction server. Each one imports what the format needs, loads the model, scores one
+batch (so the pages it uses are actually touched) and reports:
+
+    import ms   importing the libraries the format needs (scikit-learn for pickle/joblib)
+    load ms     reading the model from disk
+    RSS MB      resident memory of the worker
+    PSS MB      proportional share: pages shared with the other workers (the mmap'd
+                arrays, shared libraries) are split between them (Linux only)
+
+    python bench_model_artifact.py --workers 4
+    python bench_model_artifact.py --synthetic-rows 500000 --workers 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+FORMATS = ('pickle', 'joblib', 'artifact', 'artifact-no-mmap')
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attendance_model.pkl')
+
+
+def memory_mb():
+    """(RSS, PSS) of the current process in MB from /proc; PSS is None where unavailable."""
+    values = {}
+    for filename in ('/proc/self/smaps_rollup', '/proc/self/status'):
+        try:
+            with open(filename) as f:
+                for line in f:
+                    key, _, rest = line.partition(':')
+                    if key in ('Rss', 'Pss', 'VmRSS'):
+                        values.setdefault(key, int(rest.split()[0]) / 1024)
+        except OSError:
+            continue
+    if not values:
+        from extract import peak_rss_mb
+        return peak_rss_mb(), None
+    return values.get('Rss', values.get('VmRSS')), values.get('Pss')
+
+
+def worker(fmt, path, batch):
+    """Runs in a child process: load, score, report, then wait for the parent to measure all workers together."""
+    start = time.perf_counter()
+    import numpy as np
+    if fmt in ('pickle', 'joblib'):
+        import pickle
+        import joblib
+        import sklearn.ensemble  # noqa: F401 - what unpickling the forest imports anyway
+    else:
+        from model_artifact import load_artifact
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if fmt == 'pickle':
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+    elif fmt == 'joblib':
+        model = joblib.load(path)
+    else:
+        model, _ = load_artifact(path, mmap=(fmt == 'artifact'))
+    load_s = time.perf_counter() - start
+
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = 1
+    from features import FEATURES
+    X = np.random.default_rng(0).random((batch, len(FEATURES)), dtype=np.float32) * 50
+    model.predict_proba(X)
+
+    print(json.dumps({'ready': True}), flush=True)
+    sys.stdin.readline()
+    rss, pss = memory_mb()
+    print(json.dumps({'import_s': import_s, 'load_s': load_s, 'rss_mb': rss, 'pss_mb': pss}), flush=True)
+
+
+def run_workers(fmt, path, n_workers, batch):
+    procs = [
+        subprocess.Popen([sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--worker', fmt, path, '--batch', str(batch)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        for _ in range(n_workers)
+    ]
+    for proc in procs:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"A {fmt} worker exited with code {proc.wait()} before loading the model (out of memory?)")
+    for proc in procs:
+        proc.stdin.write('\n')
+        proc.stdin.flush()
+    results = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.wait()
+    return results
+
+
+def build_model(args):
+    import pickle
+    if not args.synthetic_rows:
+        with open(args.model, 'rb') as f:
+            return pickle.load(f)
+    from bench_features import make_rows, numpy_path
+    from train_model import fit
+    df = make_rows(args.synthetic_rows)
+    print(f"-> Fitting a forest on {args.synthetic_rows:,} synthetic rows...")
+    return fit(numpy_path(df), df['presence'].to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--synthetic-rows', type=int, default=0, help="Fit a forest of this many synthetic rows instead of --model.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--worker', nargs=2, metavar=('FORMAT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.batch)
+        return
+
+    import warnings
+    import joblib
+    from features import FEATURES
+    from model_artifact import artifact_size, write_artifact
+
+    warnings.simplefilter('ignore')
+    model = build_model(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'pickle': os.path.join(tmp, 'model.pkl'), 'joblib': os.path.join(tmp, 'model.joblib'),
+                 'artifact': os.path.join(tmp, 'model_artifact')}
+        import pickle
+        with open(paths['pickle'], 'wb') as f:
+            pickle.dump(model, f)
+        joblib.dump(model, paths['joblib'])
+        write_artifact(model, paths['artifact'], FEATURES)
+        paths['artifact-no-mmap'] = paths['artifact']
+        sizes = {'pickle': os.path.getsize(paths['pickle']), 'joblib': os.path.getsize(paths['joblib']),
+                 'artifact': artifact_size(paths['artifact'])}
+        sizes['artifact-no-mmap'] = sizes['artifact']
+
+        print(f"\n{args.workers} workers, batch of {args.batch} rows each (medians)")
+        print(f"{'format':<18} {'size MB':>8} {'import ms':>10} {'load ms':>8} {'RSS MB':>8} {'PSS MB':>8}")
+        for fmt in FORMATS:
+            results = run_workers(fmt, paths[fmt], args.workers, args.batch)
+            median = lambda key: sorted(r[key] for r in results)[len(results) // 2]
+            pss = median('pss_mb') if results[0]['pss_mb'] is not None else float('nan')
+            print(f"{fmt:<18} {sizes[fmt] / 1e6:>8.2f} {median('import_s') * 1000:>10.1f} {median('load_s') * 1000:>8.1f} "
+                  f"{median('rss_mb'):>8.1f} {pss:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
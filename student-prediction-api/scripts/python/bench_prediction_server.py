@@ -0,0 +1,116 @@
+"""
+Latency benchmark: spawn-per-request predict_from_json.py versus the long-lived
+prediction_server.py (HTTP and Unix socket), for classes of 30, 300 and 3000 users.
+
+    python bench_prediction_server.py --requests 20
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from prediction_server import PredictionService, build_server
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PREDICT_SCRIPT = os.path.join(SCRIPT_DIR, 'predict_from_json.py')
+
+
+def make_payload(n_users, seed=0):
+    """Builds a PredictionController-shaped JSON payload for one meeting of n_users."""
+    rng = random.Random(seed)
+    class_id, course_id = rng.randint(1, 500), rng.randint(1, 200)
+    matiere, professeur = rng.randint(1, 50), rng.randint(1, 100)
+    weekday, hour = rng.randint(0, 6), rng.randint(8, 18)
+    return json.dumps([
+        {
+            'user_id': 1000 + i,
+            'class_id': class_id,
+            'course_id': course_id,
+            'id_matiere': matiere,
+            'id_professeur': professeur,
+            'meeting_weekday': weekday,
+            'meeting_hour': hour,
+            'user_attendance_rate': rng.random(),
+            'user_total_meetings': rng.randint(0, 200),
+        }
+        for i in range(n_users)
+    ])
+
+
+def call_spawn(payload):
+    subprocess.run([sys.executable, PREDICT_SCRIPT], input=payload.encode('utf-8'),
+                   capture_output=True, check=True)
+
+
+def call_http(payload, port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/predict', body=payload.encode('utf-8'), headers={'Content-Type': 'application/json'})
+    conn.getresponse().read()
+    conn.close()
+
+
+def call_socket(payload, socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(payload.encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+        while sock.recv(65536):
+            pass
+
+
+def measure(fn, n_requests):
+    """Returns (p50, p99) latency in milliseconds over n_requests calls of fn()."""
+    timings = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20, help="Requests per (mode, class size) cell.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 300, 3000])
+    parser.add_argument('--model', default=os.path.join(SCRIPT_DIR, 'attendance_model.pkl'))
+    args = parser.parse_args()
+
+    service = PredictionService(args.model)
+    http_server = build_server(service, port=0)
+    port = http_server.server_address[1]
+    socket_path = os.path.join(tempfile.mkdtemp(), 'bench.sock')
+    unix_server = build_server(service, socket_path=socket_path)
+    for server in (http_server, unix_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    modes = {
+        'spawn': call_spawn,
+        'http': lambda payload: call_http(payload, port),
+        'unix': lambda payload: call_socket(payload, socket_path),
+    }
+
+    print(f"{'users':>6} {'mode':>6} {'p50 ms':>10} {'p99 ms':>10}")
+    for n_users in args.sizes:
+        payload = make_payload(n_users)
+        for mode, fn in modes.items():
+            fn(payload)  # warm-up (page cache for spawn, first connection for servers)
+            p50, p99 = measure(lambda: fn(payload), args.requests)
+            print(f"{n_users:>6} {mode:>6} {p50:>10.1f} {p99:>10.1f}")
+
+    http_server.shutdown()
+    unix_server.shutdown()
+    unix_server.server_close()
+    os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Payload size and (de)serialization time of the prediction bridge's two wire formats:
+the JSON records PredictionController used to send and the binary columnar payloads of
+wire_format.py, for a class of --users users (10 000 by default).
+
+For each direction it times the Python side of the bridge: parsing the request into the
+feature matrix (json.loads + matrix_from_records versus decode_features, plus the former
+pd.read_json when pandas is installed), writing the response, and reading it back as a
+stand-in for PHP's json_decode / unpack. With --model it also times whole requests through
+predict_payload and checks that both formats give the same predictions.
+
+    python bench_wire_format.py
+    python bench_wire_format.py --users 3000 --model models/v0003 --json wire_format.json
+"""
+import argparse
+import json
+import statistics
+import time
+from io import StringIO
+
+import numpy as np
+
+from bench_prediction_server import make_payload
+from features import matrix_from_records
+from predict_from_json import BINARY, JSON, default_model_path, load_predictor, predict_payload, serialize_predictions
+from wire_format import decode_features, decode_predictions, encode_features
+
+
+def timed(fn, repeat):
+    """Median seconds of `repeat` calls of fn()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def parse_with_pandas(payload):
+    import pandas as pd
+    return pd.read_json(StringIO(payload), orient='records')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000, help="Users in the request.")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per measurement (median).")
+    parser.add_argument('--model', nargs='?', const='', default=None,
+                        help="Also time whole requests with this model (no value: the script's default model).")
+    parser.add_argument('--json', help="Write the results to this file.")
+    args = parser.parse_args()
+
+    # PHP's json_encode writes no spaces.
+    json_request = json.dumps(json.loads(make_payload(args.users)), separators=(',', ':'))
+    records = json.loads(json_request)
+    user_ids, X = matrix_from_records(records)
+    binary_request = encode_features(user_ids, X)
+
+    # Any probabilities will do for the response size and timings.
+    rng = np.random.default_rng(0)
+    probas = rng.random(args.users)
+    predictions = (probas >= 0.5).astype(np.uint8)
+    json_response = serialize_predictions(user_ids, probas, predictions, JSON)
+    binary_response = serialize_predictions(np.asarray(user_ids, dtype='<u8'), probas, predictions, BINARY)
+
+    results = {
+        'users': args.users,
+        'request_bytes': {JSON: len(json_request.encode('utf-8')), BINARY: len(binary_request)},
+        'response_bytes': {JSON: len(json_response.encode('utf-8')), BINARY: len(binary_response)},
+        'ms': {
+            'encode_request': {
+                JSON: timed(lambda: json.dumps(records, separators=(',', ':')), args.repeat),
+                BINARY: timed(lambda: encode_features(user_ids, X), args.repeat),
+            },
+            'parse_request': {
+                JSON: timed(lambda: matrix_from_records(json.loads(json_request)), args.repeat),
+                BINARY: timed(lambda: decode_features(binary_request), args.repeat),
+            },
+            'write_response': {
+                JSON: timed(lambda: serialize_predictions(user_ids, probas, predictions, JSON), args.repeat),
+                BINARY: timed(lambda: serialize_predictions(user_ids, probas, predictions, BINARY), args.repeat),
+            },
+            'read_response': {
+                JSON: timed(lambda: json.loads(json_response), args.repeat),
+                BINARY: timed(lambda: decode_predictions(binary_response), args.repeat),
+            },
+        },
+    }
+    try:
+        results['ms']['parse_request']['json (pd.read_json)'] = timed(lambda: parse_with_pandas(json_request), args.repeat)
+    except ImportError:
+        pass
+
+    if args.model is not None:
+        model = load_predictor(args.model or default_model_path())
+        from_json = json.loads(predict_payload(model, json_request))
+        from_binary = decode_predictions(predict_payload(model, binary_request))
+        if [(r['user_id'], r['prediction']) for r in from_json] != [(r['user_id'], r['prediction']) for r in from_binary]:
+            raise SystemExit("ERROR: JSON and binary requests gave different predictions")
+        results['ms']['whole_request'] = {
+            JSON: timed(lambda: predict_payload(model, json_request), args.repeat),
+            BINARY: timed(lambda: predict_payload(model, binary_request), args.repeat),
+        }
+
+    for stage in results['ms'].values():
+        for name in stage:
+            stage[name] = round(stage[name] * 1000, 3)
+
+    print(f"{args.users} users            {'json':>12} {'binary':>12} {'ratio':>8}")
+    for name in ('request_bytes', 'response_bytes'):
+        sizes = results[name]
+        print(f"{name:<22} {sizes[JSON]:>12,} {sizes[BINARY]:>12,} {sizes[JSON] / sizes[BINARY]:>7.1f}x")
+    for name, times in results['ms'].items():
+        print(f"{name + ' (ms)':<22} {times[JSON]:>12.2f} {times[BINARY]:>12.2f} {times[JSON] / times[BINARY]:>7.1f}x")
+    if 'json (pd.read_json)' in results['ms']['parse_request']:
+        print(f"{'  pd.read_json (ms)':<22} {results['ms']['parse_request']['json (pd.read_json)']:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"-> Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Database access shared by the Streamlit app and the scripts in this directory.
+
+- DB_CONFIG is the one copy of the connection settings.
+- connect() opens a single connection for a script run, retrying while the server is
+  unreachable; connect(sqlite=path) opens a SQLite stand-in (see synthetic_db.py) instead.
+- Database is a bounded pool for long-running processes such as the Streamlit app, and
+  the way the CLIs read the source database (Database.open(args.sqlite, size=1)):
+
+      database = Database.mysql(size=5)              # or Database.sqlite('synthetic.sqlite')
+      with database.connection() as cnx:             # waits while all connections are in use
+          df = cnx.query_df("SELECT ... WHERE c.id = %s", (class_id,))
+      database.stats.summary()                       # calls / total / max time per query
+
+  A connection that has been idle for a while is pinged before it is handed out and
+  replaced if the server dropped it; one that fails mid-query and no longer answers a
+  ping is discarded instead of going back to the pool. Parameterized queries run as
+  server-side prepared statements, kept per connection, so repeating one skips parsing
+  and planning (SQLite's own statement cache does the same there). Queries use the %s
+  placeholders of mysql.connector; they are rewritten to ? for SQLite.
+"""
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIG ---
+DB_CONFIG = { 'host': 'localhost', 'user': 'root', 'password': '', 'database': 'predict_app' }
+
+DEFAULT_POOL_SIZE = 5
+CONNECT_ATTEMPTS = 3
+# Idle time after which a pooled connection is pinged before use.
+PING_AFTER_SECONDS = 30.0
+# Queries slower than this are reported on stderr.
+SLOW_QUERY_SECONDS = 1.0
+
+
+def is_sqlite(cnx):
+    """True for a sqlite3 connection, pooled or not."""
+    return type(getattr(cnx, 'raw', cnx)).__module__.startswith('sqlite3')
+
+
+def _connection_errors():
+    """
+    Exception types that may mean the connection itself is unusable. They are also raised
+    for caller mistakes (sqlite3's ProgrammingError for a wrong number of bindings, say), so
+    the connection is pinged before it is treated as broken (PooledConnection.check_alive).
+    """
+    import sqlite3
+    # sqlite3 raises ProgrammingError on a closed connection (OperationalError is also used for SQL errors).
+    errors = [sqlite3.ProgrammingError]
+    try:
+        import mysql.connector
+        errors += [mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def connect(config=None, sqlite=None, attempts=CONNECT_ATTEMPTS, **options):
+    """
+    Opens one connection: MySQL with `config` (default DB_CONFIG) and extra connector
+    options, or the SQLite database at `sqlite`. Retries with backoff while the server
+    cannot be reached; other errors (e.g. bad credentials) are raised at once.
+    """
+    if sqlite:
+        from synthetic_db import connect_sqlite
+        return connect_sqlite(sqlite)
+
+    import mysql.connector
+    for attempt in range(1, attempts + 1):
+        try:
+            return mysql.connector.connect(**(config or DB_CONFIG), **options)
+        except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError) as err:
+            if attempt == attempts:
+                raise
+            delay = 0.5 * 2 ** (attempt - 1)
+            print(f"-> Database not reachable ({err}); retrying in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
+
+
+def _label(sql):
+    """Short name of a query for the timing table: its first 80 characters, whitespace collapsed."""
+    return re.sub(r'\s+', ' ', sql).strip()[:80]
+
+
+class QueryStats:
+    """Call count, total and maximum time per query, shared by the connections of a pool."""
+
+    def __init__(self, slow_seconds=SLOW_QUERY_SECONDS):
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, label, seconds):
+        with self._lock:
+            entry = self._entries.setdefault(label, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            print(f"-> Slow query ({seconds * 1000:.0f} ms): {label}", file=sys.stderr)
+
+    def summary(self):
+        """One dict per query (label, calls, total_ms, mean_ms, max_ms), slowest in total first."""
+        with self._lock:
+            entries = list(self._entries.items())
+        rows = [{'label': label, 'calls': calls, 'total_ms': round(total * 1000, 2),
+                 'mean_ms': round(total / calls * 1000, 2), 'max_ms': round(longest * 1000, 2)}
+                for label, (calls, total, longest) in entries]
+        return sorted(rows, key=lambda row: -row['total_ms'])
+
+
+class PooledConnection:
+    """A connection of a Database pool: timed queries, prepared statements, health state."""
+
+    def __init__(self, raw, stats):
+        self.raw = raw
+        self.stats = stats
+        self.sqlite = is_sqlite(raw)
+        self.broken = False
+        self.last_used = time.monotonic()
+        self._prepared = {}
+
+    def _cursor(self, sql, params):
+        if self.sqlite or not params:
+            return self.raw.cursor()
+        cursor = self._prepared.get(sql)
+        if cursor is None:
+            # mysql.connector prepares on the first execute and reuses the statement as long
+            # as the same cursor executes the same SQL.
+            cursor = self._prepared[sql] = self.raw.cursor(prepared=True)
+        return cursor
+
+    def _run(self, sql, params, label, fetch):
+        if self.sqlite:
+            sql = sql.replace('%s', '?')
+        cursor = None
+        start = time.perf_counter()
+        try:
+            # Inside the try: opening a cursor is what fails first on a closed connection.
+            cursor = self._cursor(sql, params)
+            cursor.execute(sql, tuple(params) if params else ())
+            rows = cursor.fetchall() if fetch else cursor.rowcount
+            columns = [d[0] for d in cursor.description] if fetch and cursor.description else []
+        except _connection_errors():
+            self.check_alive()
+            raise
+        finally:
+            if cursor is not None and cursor is not self._prepared.get(sql):
+                cursor.close()
+        self.stats.record(label or _label(sql), time.perf_counter() - start)
+        return rows, columns
+
+    def query(self, sql, params=(), label=None):
+        """(rows, column names) of a SELECT."""
+        return self._run(sql, params, label, fetch=True)
+
+    def query_df(self, sql, params=(), label=None):
+        import pandas as pd
+        rows, columns = self.query(sql, params, label)
+        return pd.DataFrame(rows, columns=columns)
+
+    def scalar(self, sql, params=(), label=None):
+        """First column of the first row of a SELECT, None without rows."""
+        rows, _ = self.query(sql, params, label)
+        return rows[0][0] if rows else None
+
+    def execute(self, sql, params=(), label=None):
+        """Runs a statement and commits. Returns the affected row count."""
+        rowcount, _ = self._run(sql, params, label, fetch=False)
+        self.raw.commit()
+        return rowcount
+
+    def executemany(self, sql, rows, label=None):
+        """Runs a statement once per parameter tuple of `rows` and commits."""
+        if self.sqlite:
+            sql = sql.replace('%s', '?')
+        cursor = None
+        start = time.perf_counter()
+        try:
+            cursor = self.raw.cursor()
+            cursor.executemany(sql, rows)
+        except _connection_errors():
+            self.check_alive()
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+        self.raw.commit()
+        self.stats.record(label or _label(sql), time.perf_counter() - start)
+
+    def ping(self):
+        """Raises if the connection is no longer usable."""
+        if self.sqlite:
+            self.raw.execute("SELECT 1").fetchone()
+        else:
+            self.raw.ping(reconnect=False)
+
+    def check_alive(self):
+        """Marks the connection broken, so the pool discards it, unless it still answers a ping."""
+        try:
+            self.ping()
+        except Exception:
+            self.broken = True
+
+    def close(self):
+        for cursor in self._prepared.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._prepared.clear()
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class Database:
+    """Bounded pool of PooledConnections created on demand by `factory`."""
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, timeout=30.0, ping_after=PING_AFTER_SECONDS, stats=None):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.stats = stats or QueryStats()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @classmethod
+    def mysql(cls, config=None, size=DEFAULT_POOL_SIZE, **options):
+        # Autocommit: a pooled connection must not keep a transaction snapshot between users.
+        return cls(lambda: connect(config, autocommit=True, **options), size)
+
+    @classmethod
+    def sqlite(cls, path, size=DEFAULT_POOL_SIZE):
+        return cls(lambda: connect(sqlite=path), size)
+
+    @classmethod
+    def open(cls, sqlite=None, size=DEFAULT_POOL_SIZE, **options):
+        """The SQLite database at `sqlite` when given (a script's --sqlite option), else MySQL."""
+        return cls.sqlite(sqlite, size) if sqlite else cls.mysql(size=size, **options)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection free within {self.timeout:g}s (pool size {self.size})")
+        try:
+            while True:
+                try:
+                    cnx = self._idle.get_nowait()
+                except queue.Empty:
+                    return PooledConnection(self.factory(), self.stats)
+                if time.monotonic() - cnx.last_used < self.ping_after:
+                    return cnx
+                try:
+                    cnx.ping()
+                    return cnx
+                except Exception:
+                    # Dropped by the server (wait_timeout, restart...): replace it.
+                    cnx.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, cnx):
+        try:
+            if cnx.broken:
+                cnx.close()
+            else:
+                cnx.last_used = time.monotonic()
+                self._idle.put(cnx)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """A connection for the duration of the block; it goes back to the pool afterwards."""
+        cnx = self._acquire()
+        try:
+            yield cnx
+        except _connection_errors():
+            cnx.check_alive()
+            raise
+        finally:
+            self._release(cnx)
+
+    def query_df(self, sql, params=(), label=None):
+        """One query on a pooled connection, retried once on a fresh connection if the first one broke."""
+        for attempt in (1, 2):
+            with self.connection() as cnx:
+                try:
+                    return cnx.query_df(sql, params, label)
+                except _connection_errors():
+                    # A bad query on a live connection fails the same way on a fresh one.
+                    if attempt == 2 or not cnx.broken:
+                        raise
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
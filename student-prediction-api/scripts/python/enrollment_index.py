@@ -0,0 +1,189 @@
+"""
+Normalized enrollment index replacing `FIND_IN_SET(c.id, pc.classes)` joins.
+
+Class membership is stored as a comma-separated list in parcours_classes.classes, which
+MySQL cannot index, so every enrollment lookup scans. This module explodes it into two
+side tables with proper keys:
+
+    enrollment_parcours_class (parcours_class_id, class_id)   one row per list entry
+    enrollment_user_class     (user_id, class_id)             distinct user/class pairs
+
+and offers the same mapping as an in-memory CSR structure (EnrollmentIndex). Queries are
+switched over with use_enrollment_index(), which rewrites the FIND_IN_SET join into an
+indexed join on enrollment_parcours_class; that keeps the row multiplicity of the original
+join, so results are identical.
+
+    python enrollment_index.py build     # (re)build the side tables in the source database
+"""
+import argparse
+
+import numpy as np
+
+from db import connect, is_sqlite
+
+FIND_IN_SET_JOIN = "JOIN classes c ON FIND_IN_SET(c.id, pc.classes)"
+INDEXED_JOIN = ("JOIN enrollment_parcours_class epc ON epc.parcours_class_id = pc.id\n"
+                "JOIN classes c ON c.id = epc.class_id")
+
+SIDE_TABLES_DDL = [
+    "DROP TABLE IF EXISTS enrollment_parcours_class",
+    "DROP TABLE IF EXISTS enrollment_user_class",
+    """CREATE TABLE enrollment_parcours_class (
+        parcours_class_id INTEGER NOT NULL,
+        class_id INTEGER NOT NULL,
+        PRIMARY KEY (parcours_class_id, class_id)
+    )""",
+    "CREATE INDEX idx_epc_class ON enrollment_parcours_class (class_id)",
+    """CREATE TABLE enrollment_user_class (
+        user_id INTEGER NOT NULL,
+        class_id INTEGER NOT NULL,
+        PRIMARY KEY (user_id, class_id)
+    )""",
+    "CREATE INDEX idx_euc_class ON enrollment_user_class (class_id)",
+]
+
+
+def use_enrollment_index(query):
+    """Rewrites the FIND_IN_SET class join of one of the project's queries to use the side table."""
+    if FIND_IN_SET_JOIN not in query:
+        raise ValueError("Query has no FIND_IN_SET class join to rewrite.")
+    return query.replace(FIND_IN_SET_JOIN, INDEXED_JOIN)
+
+
+def parse_class_list(classes):
+    """
+    Splits a parcours_classes.classes value into class ids with FIND_IN_SET semantics:
+    entries must match the class id exactly, so ' 12' or '012' never match anything.
+    """
+    if not classes:
+        return []
+    ids = []
+    for entry in str(classes).split(','):
+        if entry.isdigit() and str(int(entry)) == entry:
+            ids.append(int(entry))
+    return ids
+
+
+def _fetch(cnx, query):
+    cursor = cnx.cursor()
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def explode_parcours(cnx):
+    """Returns the distinct (parcours_class_id, class_id) pairs of parcours_classes."""
+    pairs = set()
+    for parcours_id, classes in _fetch(cnx, "SELECT id, classes FROM parcours_classes"):
+        for class_id in parse_class_list(classes):
+            pairs.add((int(parcours_id), class_id))
+    return sorted(pairs)
+
+
+def build_side_tables(cnx):
+    """
+    (Re)builds both side tables from parcours_classes and parcour_group_pivot.
+    parcours_classes is small, so a full rebuild is cheap; run it after enrollment changes.
+    Returns the number of rows written to each table.
+    """
+    parcours_pairs = explode_parcours(cnx)
+    cursor = cnx.cursor()
+    for statement in SIDE_TABLES_DDL:
+        cursor.execute(statement)
+    # sqlite3 uses qmark placeholders, mysql.connector uses the format style.
+    mark = '?' if is_sqlite(cnx) else '%s'
+    cursor.executemany(
+        f"INSERT INTO enrollment_parcours_class (parcours_class_id, class_id) VALUES ({mark}, {mark})",
+        parcours_pairs,
+    )
+    cursor.execute("""
+        INSERT INTO enrollment_user_class (user_id, class_id)
+        SELECT DISTINCT p.user_id, epc.class_id
+        FROM parcour_group_pivot p
+        JOIN enrollment_parcours_class epc ON epc.parcours_class_id = p.id_parcour_classes
+    """)
+    cnx.commit()
+    user_pairs = _fetch(cnx, "SELECT COUNT(*) FROM enrollment_user_class")[0][0]
+    cursor.close()
+    return {'enrollment_parcours_class': len(parcours_pairs), 'enrollment_user_class': int(user_pairs)}
+
+
+class EnrollmentIndex:
+    """
+    In-memory CSR view of user <-> class enrollment.
+
+    users[i] is enrolled in class_ids[user_indptr[i]:user_indptr[i + 1]] and
+    classes[j] has members user_ids[class_indptr[j]:class_indptr[j + 1]].
+    """
+
+    def __init__(self, user_ids, class_ids):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        self.users, self.user_indptr, self.class_ids = self._csr(user_ids, class_ids)
+        self.classes, self.class_indptr, self.user_ids = self._csr(class_ids, user_ids)
+
+    @staticmethod
+    def _csr(keys, values):
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        indptr = np.append(starts, len(keys)).astype(np.int64)
+        return unique_keys, indptr, values
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1])
+
+    @classmethod
+    def from_parcours(cls, cnx):
+        """Builds the index straight from parcours_classes/parcour_group_pivot, no side table needed."""
+        classes_by_parcours = {}
+        for parcours_id, class_id in explode_parcours(cnx):
+            classes_by_parcours.setdefault(parcours_id, []).append(class_id)
+        pairs = {
+            (int(user_id), class_id)
+            for user_id, parcours_id in _fetch(cnx, "SELECT user_id, id_parcour_classes FROM parcour_group_pivot")
+            for class_id in classes_by_parcours.get(int(parcours_id), ())
+        }
+        return cls.from_pairs(sorted(pairs))
+
+    @staticmethod
+    def _lookup(keys, indptr, values, key):
+        i = np.searchsorted(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return values[:0]
+        return values[indptr[i]:indptr[i + 1]]
+
+    def classes_for_user(self, user_id):
+        return self._lookup(self.users, self.user_indptr, self.class_ids, user_id)
+
+    def users_for_class(self, class_id):
+        return self._lookup(self.classes, self.class_indptr, self.user_ids, class_id)
+
+    def pairs(self):
+        """All (user_id, class_id) pairs as an (n, 2) array, sorted by user then class."""
+        counts = np.diff(self.user_indptr)
+        return np.column_stack((np.repeat(self.users, counts), self.class_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sqlite', help="Use a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help="(Re)build the enrollment side tables in the source database.")
+    args = parser.parse_args()
+
+    cnx = connect(sqlite=args.sqlite)
+    try:
+        if args.command == 'build':
+            counts = build_side_tables(cnx)
+            print(f"-> Enrollment index built: {counts['enrollment_parcours_class']} parcours/class rows, "
+                  f"{counts['enrollment_user_class']} user/class rows.")
+    finally:
+        cnx.close()
+
+
+if __name__ == "__main__":
+    main()
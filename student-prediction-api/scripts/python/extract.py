@@ -0,0 +1,255 @@
+"""
+Training data extraction for train_model.py.
+
+UNIFIED_QUERY returns one row per (enrolled user, meeting) of the active classes with the
+meeting's schedule and a 0/1 presence label. It can be pulled three ways:
+
+    pd.read_sql(UNIFIED_QUERY, cnx)                       # one read, the whole result in memory
+    stream_to_parquet(cnx, 'training_extract.parquet')   # fetchmany chunks, one row group each
+    extract_partitioned(Database.mysql(size=4), 4)        # one query per class id range, in parallel
+
+stream_to_parquet reads the result on an unbuffered cursor, so only one chunk (--chunk-size
+rows) is held on the client at a time, and reports rows/s and peak RSS. That bound is for
+the extraction only: train_model.py then loads the whole file (read_extract, sort_extract)
+to build the features, so training needs memory for the whole compact extract. An empty
+result writes no file.
+
+Every chunk is cast to EXTRACT_DTYPES before it is written: the id columns are pandas'
+nullable UInt32 (a NULL foreign key, e.g. a class without a professor, stays <NA> instead of
+turning the column into float64), presence is uint8, scheduled_day is datetime64[s] and
+scheduled_hour timedelta64[s]. The schema is fixed rather than inferred per chunk, so all
+row groups of the file agree; read_extract() returns these dtypes, and
+features.build_feature_matrix() reads a <NA> id as NaN. An id above 2**32 - 1 does not fit:
+compact_chunk() raises TypeError on it.
+
+The query has no ORDER BY; sort_extract() puts any extract in EXTRACT_ORDER, so the way the
+rows were pulled does not change the training matrix.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- SQL QUERY (Simplified for focus and performance) ---
+# {meeting_filter} and {class_filter} restrict the query to a range of class ids (see
+# CLASS_RANGE_QUERY); UNIFIED_QUERY runs it over every active class.
+_UNIFIED_TEMPLATE = """
+WITH MeetingScheduleLink AS (
+    SELECT
+        pm.id_meeting,
+        MAX(pcj.day) AS scheduled_day,
+        MAX(pcj.heure_from) AS scheduled_hour
+    FROM participation_meetings pm
+    JOIN meetings m ON pm.id_meeting = m.id
+    JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
+{meeting_filter}    GROUP BY pm.id_meeting
+)
+SELECT
+    pgp.user_id,
+    c.id AS class_id,
+    c.id_cours AS course_id,
+    c.id_professeur,
+    co.id_matiere,
+    m.id AS meeting_id,
+    msl.scheduled_day,
+    msl.scheduled_hour,
+    IF(pm_check.id IS NOT NULL, 1, 0) AS presence
+FROM parcour_group_pivot pgp
+JOIN parcours_classes pc ON pgp.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+JOIN cours co ON c.id_cours = co.id
+LEFT JOIN participation_meetings pm_check ON pm_check.id_user = pgp.user_id AND pm_check.id_meeting = m.id
+LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
+WHERE c.active = 'Y'{class_filter};
+"""
+
+UNIFIED_QUERY = _UNIFIED_TEMPLATE.format(meeting_filter='', class_filter='')
+
+# The rows of the active classes with ids in [%s, %s] (lowest, highest); the schedule link
+# is only aggregated over those classes' meetings, so partitions do not repeat its work.
+CLASS_RANGE_QUERY = _UNIFIED_TEMPLATE.format(
+    meeting_filter="    WHERE m.id_classe BETWEEN %s AND %s\n",
+    class_filter=" AND c.id BETWEEN %s AND %s",
+)
+
+# Meetings per active class, used to cut the classes into partitions of similar size.
+ACTIVE_CLASS_MEETINGS_QUERY = """
+SELECT c.id, COUNT(m.id) AS meetings
+FROM classes c
+LEFT JOIN meetings m ON m.id_classe = c.id
+WHERE c.active = 'Y'
+GROUP BY c.id
+ORDER BY c.id
+"""
+
+# Compact dtypes for the extract. They are fixed (rather than downcast per chunk) so every
+# chunk has the same schema; the nullable variants keep NULL foreign keys as <NA>.
+EXTRACT_DTYPES = {
+    'user_id': 'UInt32',
+    'class_id': 'UInt32',
+    'course_id': 'UInt32',
+    'id_professeur': 'UInt32',
+    'id_matiere': 'UInt32',
+    'meeting_id': 'UInt32',
+    'presence': 'uint8',
+}
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Partitions per worker in partitioned extraction: more, smaller partitions even out the
+# work when some class ranges are slower than others.
+PARTITIONS_PER_WORKER = 4
+
+# Order of the rows of an extract, whichever way it was pulled (the query has no ORDER BY).
+EXTRACT_ORDER = ['class_id', 'meeting_id', 'user_id']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def compact_chunk(chunk):
+    """Casts one chunk of raw rows to the fixed extract schema."""
+    for col, dtype in EXTRACT_DTYPES.items():
+        if col in chunk.columns:
+            chunk[col] = pd.to_numeric(chunk[col]).astype(dtype)
+    if 'scheduled_day' in chunk.columns:
+        chunk['scheduled_day'] = pd.to_datetime(chunk['scheduled_day'], errors='coerce').astype('datetime64[s]')
+    if 'scheduled_hour' in chunk.columns:
+        # MySQL TIME columns arrive as datetime.timedelta; keep them as a duration column.
+        chunk['scheduled_hour'] = pd.to_timedelta(chunk['scheduled_hour'], errors='coerce').astype('timedelta64[s]')
+    return chunk
+
+
+def iter_chunks(cnx, query, chunk_size=DEFAULT_CHUNK_SIZE, params=None):
+    """
+    Executes the query on an unbuffered cursor and yields compact DataFrames of at most
+    chunk_size rows, so only one chunk is ever materialized on the client.
+    """
+    cursor = cnx.cursor()
+    try:
+        cursor.execute(query, params or ())
+        columns = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield compact_chunk(pd.DataFrame.from_records(rows, columns=columns))
+    finally:
+        cursor.close()
+
+
+def stream_to_parquet(cnx, path, query=UNIFIED_QUERY, chunk_size=DEFAULT_CHUNK_SIZE, params=None, log=print):
+    """
+    Streams the query result into a Parquet file, one row group per chunk.
+    Returns a dict with rows, seconds, rows_per_sec and peak_rss_mb.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Streaming extraction requires pyarrow (pip install pyarrow).")
+
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    try:
+        for chunk in iter_chunks(cnx, query, chunk_size, params):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            log(f"-> {rows} rows extracted ({rows / elapsed:,.0f} rows/s)")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    log(f"-> Extraction finished: {stats['rows']} rows in {stats['seconds']}s "
+        f"({stats['rows_per_sec']} rows/s, peak RSS {stats['peak_rss_mb']} MB)")
+    return stats
+
+
+def read_extract(path, columns=None):
+    """Loads an on-disk extract written by stream_to_parquet, with the dtypes compact_chunk() gave it."""
+    df = pd.read_parquet(path, columns=columns)
+    # Parquet has no second-resolution timestamps, so the day is read back in milliseconds.
+    if 'scheduled_day' in df.columns:
+        df['scheduled_day'] = df['scheduled_day'].astype('datetime64[s]')
+    return df
+
+
+def sort_extract(df):
+    """The extract in EXTRACT_ORDER with a fresh index, so training sees the same rows in the same order."""
+    return df.sort_values(EXTRACT_ORDER, kind='stable').reset_index(drop=True)
+
+
+def class_partitions(cnx, n_partitions):
+    """
+    Cuts the active classes into at most n_partitions contiguous [lowest, highest] class id
+    ranges holding about the same number of meetings each. `cnx` is a pooled connection.
+    """
+    rows, _ = cnx.query(ACTIVE_CLASS_MEETINGS_QUERY, label='training extract partitions')
+    if not rows:
+        return []
+    class_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    weights = np.maximum(np.array([row[1] or 0 for row in rows], dtype=np.int64), 1)
+    cumulative = np.cumsum(weights)
+    targets = np.linspace(0, cumulative[-1], max(1, n_partitions) + 1)[1:-1]
+    cuts = np.unique(np.searchsorted(cumulative, targets, side='right'))
+    return [(int(group[0]), int(group[-1])) for group in np.split(class_ids, cuts) if len(group)]
+
+
+def extract_partitioned(database, workers, partitions=None, query=CLASS_RANGE_QUERY, log=print):
+    """
+    Pulls the training rows as one query per class id range (CLASS_RANGE_QUERY, or the same
+    query rewritten by use_enrollment_index), running `workers` of them at a time on the
+    connections of `database` (a db.Database pool). The partitions are concatenated and
+    sorted by EXTRACT_ORDER, so the result does not depend on which finished first.
+    Returns (df, stats).
+    """
+    start = time.perf_counter()
+    with database.connection() as cnx:
+        ranges = class_partitions(cnx, partitions or workers * PARTITIONS_PER_WORKER)
+
+    def pull(bounds):
+        lowest, highest = bounds
+        with database.connection() as cnx:
+            return cnx.query_df(query, (lowest, highest, lowest, highest), label='training extract partition')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(pull, ranges))
+    df = sort_extract(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': len(df),
+        'partitions': len(ranges),
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(len(df) / seconds, 1) if seconds > 0 else None,
+    }
+    log(f"-> Extracted {stats['rows']} rows from {stats['partitions']} class partitions on {workers} connections "
+        f"in {stats['seconds']}s ({stats['rows_per_sec']} rows/s)")
+    return df, stats
@@ -0,0 +1,237 @@
+"""
+Materialized per-user attendance features.
+
+user_attendance_rate and user_total_meetings used to be recomputed on every prediction
+with a full COUNT(...) GROUP BY user_id over the enrollment x meeting history. This module
+keeps them in a small SQLite table keyed by user_id and brings it up to date incrementally
+using high-water marks on meetings.id and participation_meetings.id:
+
+    python feature_store.py refresh          # apply new meetings / participation rows
+    python feature_store.py refresh --full   # rebuild from scratch (e.g. after enrollment changes)
+    python feature_store.py check            # compare against a full recompute
+    python feature_store.py show 42 43       # print the stored features for some users
+
+Enrollment changes (rows added to or removed from parcour_group_pivot / parcours_classes)
+are not tracked incrementally; run a full refresh after them, which `check` will flag.
+
+Only `refresh` creates or writes the store; `check`, `show` and the readers open it
+read-only, and treat it as missing until a refresh has recorded its high-water marks.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from db import Database
+from enrollment_index import use_enrollment_index
+from sqlite_store import SqliteStore
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store.sqlite')
+
+ENROLLED_MEETINGS = """
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+"""
+
+# Meetings a user is enrolled in; restricted to the id range (lo, hi].
+TOTALS_QUERY = """
+SELECT p.user_id, COUNT(m.id) AS total_meetings
+""" + ENROLLED_MEETINGS + """
+WHERE m.id > {lo} AND m.id <= {hi}
+GROUP BY p.user_id
+"""
+
+# Participation rows of enrolled users; restricted to the id ranges (p_lo, p_hi] and (m_lo, m_hi].
+ATTENDED_QUERY = """
+SELECT p.user_id, COUNT(pm.id) AS attended_meetings
+""" + ENROLLED_MEETINGS + """
+JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+WHERE pm.id > {p_lo} AND pm.id <= {p_hi} AND m.id > {m_lo} AND m.id <= {m_hi}
+GROUP BY p.user_id
+"""
+
+# The per-request history query this store replaces.
+FULL_RECOMPUTE_QUERY = """
+SELECT p.user_id, COUNT(m.id) AS total_meetings, COUNT(pm.id) AS attended_meetings
+""" + ENROLLED_MEETINGS + """
+LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+GROUP BY p.user_id
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_features (
+    user_id INTEGER PRIMARY KEY,
+    total_meetings INTEGER NOT NULL DEFAULT 0,
+    attended_meetings INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS store_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# SQLite's default limit on host parameters is 999 on older builds.
+LOOKUP_BATCH = 900
+
+
+class FeatureStore(SqliteStore):
+    """SQLite-backed table of per-user attendance counts, keyed by user_id."""
+
+    SCHEMA = SCHEMA
+    BUILT_KEY = 'last_meeting_id'
+
+    def __init__(self, path=DEFAULT_STORE_PATH, read_only=False):
+        super().__init__(path, read_only)
+
+    def _add(self, column, rows):
+        self.conn.executemany(
+            f"INSERT INTO user_features (user_id, {column}) VALUES (?, ?) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + excluded.{column}",
+            [(int(user_id), int(count)) for user_id, count in rows],
+        )
+
+    # --- Refresh ---
+    def refresh(self, cnx, full=False, enrollment_index=False):
+        """
+        Applies meetings and participation rows added since the last refresh, read from
+        `cnx` (a db.PooledConnection on the source database). With enrollment_index the
+        queries join through the enrollment side tables.
+        Returns a dict with the number of new meetings/participation ids processed.
+        """
+        rewrite = use_enrollment_index if enrollment_index else (lambda query: query)
+        if full:
+            self.conn.execute("DELETE FROM user_features")
+            self.conn.execute("DELETE FROM store_state")
+
+        last_meeting = self.get_state('last_meeting_id', 0)
+        last_participation = self.get_state('last_participation_id', 0)
+        # Snapshot the upper bounds first so rows inserted while we run are picked up next time.
+        max_meeting = int(cnx.scalar("SELECT MAX(id) FROM meetings") or 0)
+        max_participation = int(cnx.scalar("SELECT MAX(id) FROM participation_meetings") or 0)
+
+        # The store covers participation rows with pm.id <= last_participation on meetings with
+        # m.id <= last_meeting. The two deltas below are disjoint and together extend that to the
+        # new bounds, including participation rows recorded before their meeting was picked up.
+        with self.conn:
+            if max_participation > last_participation:
+                rows, _ = cnx.query(rewrite(ATTENDED_QUERY).format(
+                    p_lo=last_participation, p_hi=max_participation, m_lo=0, m_hi=last_meeting))
+                self._add('attended_meetings', rows)
+            if max_meeting > last_meeting:
+                rows, _ = cnx.query(rewrite(TOTALS_QUERY).format(lo=last_meeting, hi=max_meeting))
+                self._add('total_meetings', rows)
+                rows, _ = cnx.query(rewrite(ATTENDED_QUERY).format(
+                    p_lo=0, p_hi=max_participation, m_lo=last_meeting, m_hi=max_meeting))
+                self._add('attended_meetings', rows)
+            self._set_state('last_meeting_id', max_meeting)
+            self._set_state('last_participation_id', max_participation)
+
+        return {
+            'new_meeting_ids': max(0, max_meeting - last_meeting),
+            'new_participation_ids': max(0, max_participation - last_participation),
+        }
+
+    # --- Reads ---
+    def get_features(self, user_ids):
+        """
+        Returns a DataFrame with user_id, user_attendance_rate and user_total_meetings for the
+        given users. Users without stored history are omitted; callers fill their defaults.
+        """
+        user_ids = [int(u) for u in user_ids]
+        rows = []
+        for i in range(0, len(user_ids), LOOKUP_BATCH):
+            batch = user_ids[i:i + LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows.extend(self.conn.execute(
+                f"SELECT user_id, total_meetings, attended_meetings FROM user_features WHERE user_id IN ({placeholders})",
+                batch,
+            ).fetchall())
+
+        df = pd.DataFrame(rows, columns=['user_id', 'user_total_meetings', 'attended_meetings'])
+        df = df[df['user_total_meetings'] > 0].copy()
+        df['user_attendance_rate'] = df['attended_meetings'] / df['user_total_meetings']
+        return df[['user_id', 'user_attendance_rate', 'user_total_meetings']].reset_index(drop=True)
+
+    def get_counts(self, user_id):
+        """(total_meetings, attended_meetings) of one user, (0, 0) without stored history."""
+        row = self.conn.execute(
+            "SELECT total_meetings, attended_meetings FROM user_features WHERE user_id = ?", (int(user_id),)).fetchone()
+        return (int(row[0]), int(row[1])) if row else (0, 0)
+
+    def all_counts(self):
+        return pd.read_sql("SELECT user_id, total_meetings, attended_meetings FROM user_features", self.conn)
+
+    # --- Consistency ---
+    def check(self, cnx, enrollment_index=False):
+        """
+        Compares the stored counts with a full recompute from the source database.
+        Returns a DataFrame of the users whose counts differ (empty when consistent).
+        """
+        query = use_enrollment_index(FULL_RECOMPUTE_QUERY) if enrollment_index else FULL_RECOMPUTE_QUERY
+        expected = cnx.query_df(query)
+        stored = self.all_counts()
+        merged = pd.merge(expected, stored, on='user_id', how='outer', suffixes=('_expected', '_stored')).fillna(0)
+        mismatch = (
+            (merged['total_meetings_expected'] != merged['total_meetings_stored'])
+            | (merged['attended_meetings_expected'] != merged['attended_meetings_stored'])
+        )
+        return merged[mismatch].astype('int64').reset_index(drop=True)
+
+
+def open_store_if_present(path=DEFAULT_STORE_PATH):
+    """Returns a read-only FeatureStore if one has been built at path, else None."""
+    return FeatureStore.open_if_built(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help="Path of the SQLite feature store.")
+    parser.add_argument('--use-enrollment-index', action='store_true',
+                        help="Join class membership through the enrollment side tables (see enrollment_index.py).")
+    parser.add_argument('--sqlite', help="Use a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = sub.add_parser('refresh', help="Apply new meetings and participation rows.")
+    refresh_parser.add_argument('--full', action='store_true', help="Rebuild the store from scratch.")
+    sub.add_parser('check', help="Compare the store against a full recompute.")
+    show_parser = sub.add_parser('show', help="Print the stored features for some users.")
+    show_parser.add_argument('user_ids', type=int, nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'refresh':
+        store = FeatureStore(args.store)
+    else:
+        store = open_store_if_present(args.store)
+        if store is None:
+            print(f"ERROR: No feature store has been built at {args.store}; run 'refresh' first.")
+            sys.exit(1)
+    try:
+        if args.command == 'show':
+            print(store.get_features(args.user_ids).to_string(index=False))
+            return
+
+        database = Database.open(args.sqlite, size=1)
+        try:
+            with database.connection() as cnx:
+                if args.command == 'refresh':
+                    stats = store.refresh(cnx, full=args.full, enrollment_index=args.use_enrollment_index)
+                    print(f"-> Feature store refreshed: {stats['new_meeting_ids']} new meeting ids, "
+                          f"{stats['new_participation_ids']} new participation ids.")
+                else:
+                    mismatches = store.check(cnx, enrollment_index=args.use_enrollment_index)
+                    if mismatches.empty:
+                        print("-> Feature store is consistent with a full recompute.")
+                    else:
+                        print(f"ERROR: {len(mismatches)} users differ from a full recompute; run 'refresh --full'.")
+                        print(mismatches.head(20).to_string(index=False))
+                        sys.exit(1)
+        finally:
+            database.close()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Feature construction shared by training and serving.
+
+Turns raw enrollment, history and schedule data into the 9-column matrix the model
+expects, using NumPy operations only:
+
+- weekdays follow the pandas/Python convention (Monday=0 ... Sunday=6), which is what
+  the model was trained on;
+- hours are read directly from TIME/timedelta, datetime or 'HH:MM:SS' values, without
+  a pd.to_timedelta(...astype(str)) round trip;
+- the result is a C-contiguous float32 array, the dtype sklearn's trees work in, so it
+  is passed to the model without another conversion.
+- matrix_from_records() reads request records (PredictionController's JSON, parsed by
+  json.loads) straight into that matrix, so the serving path needs no pandas.
+"""
+import itertools
+import operator
+
+import numpy as np
+
+FEATURES = [
+    "user_id", "class_id", "course_id", "id_matiere", "id_professeur",
+    "meeting_weekday", "meeting_hour", "user_attendance_rate", "user_total_meetings"
+]
+
+# Default features for users without any attendance history.
+DEFAULT_ATTENDANCE_RATE = 0.5
+
+# 1970-01-01, day 0 of datetime64[D], was a Thursday.
+_EPOCH_WEEKDAY = 3
+_SECONDS_PER_HOUR = 3600
+
+
+def meeting_weekdays(values):
+    """Monday=0 weekday of each date-like value (datetime64, date, ISO string); missing -> 0."""
+    arr = np.asarray(values)
+    if arr.dtype.kind != 'M':
+        arr = arr.astype('datetime64[D]')
+    days = arr.astype('datetime64[D]')
+    missing = np.isnat(days)
+    weekdays = (days.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+    weekdays[missing] = 0
+    return weekdays
+
+
+def _hours_from_strings(arr):
+    text = arr.astype(str)
+    head = np.char.partition(text, ':')[..., 0]
+    head = np.char.strip(head)
+    valid = np.char.isdigit(head) & (np.char.str_len(head) > 0)
+    hours = np.zeros(text.shape, dtype=np.int64)
+    hours[valid] = head[valid].astype(np.int64)
+    return hours % 24
+
+
+def meeting_hours(values):
+    """
+    Hour of day of each time-like value; missing or unparseable -> 0.
+    Accepts timedelta64 (MySQL TIME via pandas), datetime.timedelta objects, datetime64
+    and 'HH:MM[:SS]' strings. Like Timedelta.components.hours, TIME values past 24h wrap.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'M':
+        seconds = (arr - arr.astype('datetime64[D]')).astype('timedelta64[s]')
+    elif arr.dtype.kind == 'm':
+        seconds = arr.astype('timedelta64[s]')
+    elif arr.dtype.kind in 'iuf':
+        # Already an hour of day (e.g. meeting_hour sent by the API).
+        hours = np.nan_to_num(arr.astype(np.float64)).astype(np.int64)
+        return hours % 24
+    else:
+        try:
+            seconds = arr.astype('timedelta64[s]')
+        except (TypeError, ValueError):
+            return _hours_from_strings(arr)
+
+    missing = np.isnat(seconds)
+    hours = (seconds.astype(np.int64) // _SECONDS_PER_HOUR) % 24
+    hours[missing] = 0
+    return hours
+
+
+def attendance_history(user_ids, presence):
+    """
+    Per-user attendance mean and count over the given rows (the training-time history).
+    Returns (unique_user_ids, rates, counts), sorted by user id.
+    """
+    users, inverse = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(users))
+    attended = np.bincount(inverse, weights=np.asarray(presence, dtype=np.float64), minlength=len(users))
+    return users, attended / counts, counts
+
+
+def lookup(keys, table_keys, table_values, default):
+    """
+    Vectorized left join: table_values for each key, or default where the key is absent.
+    table_keys does not need to be sorted.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    table_keys = np.asarray(table_keys, dtype=np.int64)
+    table_values = np.asarray(table_values, dtype=np.float64)
+    out = np.full(len(keys), default, dtype=np.float64)
+    if len(table_keys) == 0:
+        return out
+    order = np.argsort(table_keys, kind='stable')
+    sorted_keys = table_keys[order]
+    pos = np.searchsorted(sorted_keys, keys)
+    pos_clipped = np.minimum(pos, len(sorted_keys) - 1)
+    found = sorted_keys[pos_clipped] == keys
+    out[found] = table_values[order[pos_clipped[found]]]
+    return out
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def build_feature_matrix(rows, history=None, schedule=None, default_rate=DEFAULT_ATTENDANCE_RATE):
+    """
+    Assembles the (n, 9) float32 feature matrix in FEATURES order.
+
+    rows:     mapping of column -> array (a DataFrame works) with user_id, class_id,
+              course_id, id_matiere, id_professeur and, per row, either meeting_weekday /
+              meeting_hour or scheduled_day / scheduled_hour. It may also carry
+              user_attendance_rate / user_total_meetings directly.
+    history:  optional (user_ids, rates, counts) joined onto rows by user_id; users
+              missing from it get default_rate and 0 meetings.
+    schedule: optional (scheduled_day, scheduled_hour) for a single meeting, broadcast
+              to every row when the rows carry no schedule of their own.
+    """
+    n = len(rows['user_id'])
+    X = np.empty((n, len(FEATURES)), dtype=np.float32, order='F')
+
+    for j, name in enumerate(FEATURES[:5]):
+        X[:, j] = np.asarray(rows[name], dtype=np.float32)
+
+    if 'meeting_weekday' in rows:
+        X[:, 5] = np.asarray(rows['meeting_weekday'], dtype=np.float32)
+        X[:, 6] = np.asarray(rows['meeting_hour'], dtype=np.float32)
+    elif 'scheduled_day' in rows:
+        X[:, 5] = meeting_weekdays(rows['scheduled_day'])
+        X[:, 6] = meeting_hours(rows['scheduled_hour'])
+    else:
+        day, hour = schedule if schedule is not None else (None, None)
+        X[:, 5] = 0 if _is_missing(day) else meeting_weekdays([day])[0]
+        X[:, 6] = 0 if _is_missing(hour) else meeting_hours([hour])[0]
+
+    if history is not None:
+        users, rates, counts = history
+        X[:, 7] = lookup(rows['user_id'], users, rates, default_rate)
+        X[:, 8] = lookup(rows['user_id'], users, counts, 0)
+    else:
+        X[:, 7] = np.asarray(rows['user_attendance_rate'], dtype=np.float32)
+        X[:, 8] = np.asarray(rows['user_total_meetings'], dtype=np.float32)
+
+    return np.ascontiguousarray(X)
+
+
+def matrix_from_records(records):
+    """
+    (user_ids, X) from a list of dicts that each carry every FEATURES key, such as the
+    request records of PredictionController. The values are streamed in FEATURES order
+    into one float64 buffer (numeric strings are parsed, None becomes NaN) and cast to
+    float32, which gives the same matrix as build_feature_matrix on a DataFrame of them.
+    """
+    getter = operator.itemgetter(*FEATURES)
+    try:
+        values = np.fromiter(itertools.chain.from_iterable(map(getter, records)), dtype=np.float64,
+                             count=len(records) * len(FEATURES))
+    except KeyError as e:
+        raise ValueError(f"Missing required feature column in JSON data: {e.args[0]}") from None
+    X = values.reshape(len(records), len(FEATURES)).astype(np.float32)
+    user_ids = [int(record['user_id']) if isinstance(record['user_id'], str) else record['user_id'] for record in records]
+    return user_ids, X
@@ -0,0 +1,200 @@
+"""
+Packed, NumPy-only inference engine for the fitted RandomForestClassifier.
+
+pack_forest() flattens every tree of the forest into the tables the traversal reads
+directly (one slot per node unless stated otherwise):
+
+    children        int64    (2 * n_nodes) [left, right] global child index of each node;
+                             leaves point to themselves
+    is_leaf         bool
+    split_feature   int32    split feature (0 on leaves)
+    split_threshold float32  largest float32 <= the float64 threshold; a sample goes left
+                             when x <= split_threshold, exactly as sklearn's x <= threshold
+    missing_left    uint8    where samples with a NaN feature go (sklearn >= 1.3)
+    class_proba     float64  (n_classes, n_nodes) normalized class distribution of each node
+    roots           int32    global index of each tree's root
+    depths          int32    max depth of each tree
+    classes                  model.classes_
+
+Nothing is derived at load time, so the arrays can be memory-mapped read-only and shared
+between processes (see model_artifact.py).
+
+PackedForest computes the class probabilities once and derives the labels from them,
+instead of one traversal for predict() and another for predict_proba(). Two traversal
+strategies are used depending on the batch size:
+
+- small batches walk all trees at once, keeping only the (sample, tree) pairs that have
+  not reached a leaf yet, so a single request costs a handful of NumPy calls;
+- large batches walk one tree at a time for its max depth, with leaves looping onto
+  themselves, which keeps the working set of every step in cache.
+
+Probabilities are accumulated tree by tree in fitting order, exactly as
+RandomForestClassifier.predict_proba does with n_jobs=1, so the results are identical.
+"""
+import numpy as np
+
+PACKED_ARRAYS = ('children', 'is_leaf', 'split_feature', 'split_threshold', 'missing_left',
+                 'class_proba', 'roots', 'depths', 'classes')
+
+# Batch size from which walking one tree at a time beats walking the whole forest at once.
+PER_TREE_MIN_BATCH = 2048
+
+
+def _sklearn_version():
+    import sklearn
+    return tuple(int(part) for part in sklearn.__version__.split('.')[:2])
+
+
+def _float32_thresholds(threshold):
+    """
+    Largest float32 <= each float64 threshold. For a float32 x, x <= t holds exactly when
+    x <= this value, so splits can be tested without promoting the features to float64.
+    """
+    rounded = threshold.astype(np.float32)
+    over = rounded.astype(np.float64) > threshold
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
+
+
+def pack_forest(model):
+    """Flattens a fitted RandomForestClassifier into a dict of NumPy arrays."""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    # From scikit-learn 1.4 on, tree_.value already holds class fractions and is returned
+    # as-is; older versions store weighted counts and normalize them at predict time.
+    normalize = _sklearn_version() < (1, 4)
+    leaf_proba = []
+    for tree in trees:
+        value = tree.value[:, 0, :].astype(np.float64)
+        if normalize:
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        leaf_proba.append(value)
+
+    missing_left = [
+        getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)).astype(np.uint8)
+        for tree in trees
+    ]
+
+    left = np.concatenate([tree.children_left.astype(np.int64) + o for tree, o in zip(trees, offsets)])
+    right = np.concatenate([tree.children_right.astype(np.int64) + o for tree, o in zip(trees, offsets)])
+    is_leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+    node_ids = np.arange(len(is_leaf), dtype=np.int64)
+    children = np.empty(2 * len(is_leaf), dtype=np.int64)
+    children[0::2] = np.where(is_leaf, node_ids, left)
+    children[1::2] = np.where(is_leaf, node_ids, right)
+    feature = np.concatenate([tree.feature for tree in trees])
+    threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+
+    return {
+        'children': children,
+        'is_leaf': is_leaf,
+        'split_feature': np.where(is_leaf, 0, feature).astype(np.int32),
+        'split_threshold': _float32_thresholds(threshold),
+        'missing_left': np.concatenate(missing_left),
+        'class_proba': np.ascontiguousarray(np.vstack(leaf_proba).T),
+        'roots': offsets.astype(np.int32),
+        'depths': np.array([tree.max_depth for tree in trees], dtype=np.int32),
+        'classes': np.asarray(model.classes_),
+    }
+
+
+def can_pack(model):
+    """True for the fitted tree-ensemble classifiers whose trees pack_forest() understands."""
+    return type(model).__name__ in ('RandomForestClassifier', 'ExtraTreesClassifier') and hasattr(model, 'estimators_')
+
+
+class PackedForest:
+    """Batched inference over packed forest arrays; mirrors the predict/predict_proba API."""
+
+    def __init__(self, arrays):
+        for name in PACKED_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.classes_ = self.classes
+        self.n_estimators = len(self.roots)
+        self.has_missing = bool(np.any(self.missing_left))
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(pack_forest(model))
+
+    def _step(self, node, x):
+        if self.has_missing:
+            goes_right = ~(x <= self.split_threshold[node])
+            goes_right &= ~(np.isnan(x) & (self.missing_left[node] == 1))
+        else:
+            # NaNs were mapped to +inf, which goes right like NaN does.
+            goes_right = x > self.split_threshold[node]
+        return self.children[2 * node + goes_right]
+
+    def _apply_forest(self, X_t, n_samples):
+        offsets = self.split_feature.astype(np.intp) * n_samples
+        nodes = np.repeat(self.roots.astype(np.intp), n_samples)
+        samples = np.tile(np.arange(n_samples, dtype=np.intp), self.n_estimators)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            node = nodes[active]
+            node = self._step(node, X_t[offsets[node] + samples[active]])
+            nodes[active] = node
+            active = active[~self.is_leaf[node]]
+        return nodes.reshape(self.n_estimators, n_samples)
+
+    def _apply_per_tree(self, X_t, n_samples):
+        offsets = self.split_feature.astype(np.intp) * n_samples
+        samples = np.arange(n_samples, dtype=np.intp)
+        leaves = np.empty((self.n_estimators, n_samples), dtype=np.intp)
+        for t, (root, depth) in enumerate(zip(self.roots, self.depths)):
+            node = np.full(n_samples, root, dtype=np.intp)
+            for _ in range(depth):
+                node = self._step(node, X_t[offsets[node] + samples])
+            leaves[t] = node
+        return leaves
+
+    def _leaves(self, X):
+        """Global leaf index reached by every sample in every tree, shape (n_trees, n_samples)."""
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = X.shape[0]
+        # Feature-major copy: feature j of sample i sits at j * n_samples + i.
+        X_t = np.ascontiguousarray(X.T).ravel()
+        if not self.has_missing:
+            X_t[np.isnan(X_t)] = np.inf
+        if n_samples >= PER_TREE_MIN_BATCH:
+            return self._apply_per_tree(X_t, n_samples)
+        return self._apply_forest(X_t, n_samples)
+
+    def apply(self, X):
+        """Like RandomForestClassifier.apply, but with global node indices."""
+        return self._leaves(X).T
+
+    def predict_proba(self, X):
+        leaves = self._leaves(X)
+        proba = np.empty((leaves.shape[1], len(self.classes_)), dtype=np.float64)
+        for k, class_proba in enumerate(self.class_proba):  # one contiguous row per class
+            per_tree = class_proba[leaves]
+            if per_tree.shape[1] > 1:
+                # Reducing over the leading axis adds the trees one after another, in order.
+                proba[:, k] = per_tree.sum(axis=0)
+            else:
+                # A single sample is a contiguous 1-D sum, which NumPy would sum pairwise.
+                proba[:, k] = np.add.accumulate(per_tree, axis=0)[-1]
+        proba /= self.n_estimators
+        return proba
+
+    def predict_with_proba(self, X):
+        """Returns (labels, probabilities) from a single traversal."""
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1)), proba
+
+    def predict(self, X):
+        return self.predict_with_proba(X)[0]
+
+
+def predict_with_proba(model, X):
+    """(labels, probabilities) from one pass, for a PackedForest or any fitted sklearn classifier."""
+    if isinstance(model, PackedForest):
+        return model.predict_with_proba(X)
+    proba = model.predict_proba(X)
+    return model.classes_.take(np.argmax(proba, axis=1)), proba
@@ -0,0 +1,248 @@
+"""
+Span timers, counters and memory samples for the prediction and training hot paths,
+written as JSON lines.
+
+Off unless PREDICT_TRACE is set (or enable() is called). While off, span() hands back one
+shared no-op context manager and count() returns at once, so the calls can stay in the
+hot paths:
+
+    PREDICT_TRACE=stderr                  one JSON object per line on stderr
+    PREDICT_TRACE=/tmp/trace.jsonl        appended to a file (safe for concurrent processes)
+    PREDICT_PROFILE=cprofile              also run each top-level span under cProfile and
+                                          dump its stats to PREDICT_PROFILE_DIR (.prof files)
+    PREDICT_PROFILE=tracemalloc           also trace Python allocations and add each
+                                          top-level span's traced peak and top allocation sites
+
+    from instrumentation import count, span, traced
+
+    with span('predict.load_model', path=model_path):
+        model = load_predictor(model_path)
+    count('predict.rows', len(X))
+
+    @traced('app.predict_meeting')          # every call is a span
+    def predict_meeting(...): ...
+
+Each finished span is one line:
+
+    {"type": "span", "name": "predict.forest", "parent": "predict", "ms": 3.41,
+     "rss_mb": 142.1, "peak_rss_mb": 150.3, "trace": "5f0c...", "pid": 4242, "ts": ..., ...fields}
+
+and counters are summed and written as one {"type": "counters"} line after each
+top-level span (and at exit, for counts made outside any span). All lines of one process
+share a trace id (PREDICT_TRACE_ID if set, so a caller can correlate them with its own logs).
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+TOP_ALLOCATIONS = 10
+
+_PAGE_MB = os.sysconf('SC_PAGE_SIZE') / 2**20 if hasattr(os, 'sysconf') else None
+
+
+class _NoSpan:
+    """The span handed out while instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+# --- STATE (None while off) ---
+_sink = None
+_profile = None
+_profile_dir = None
+_trace_id = None
+_lock = threading.Lock()
+_local = threading.local()
+_counters = {}
+_profiled = 0
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux /proc), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, TypeError):
+        return None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def enabled():
+    return _sink is not None
+
+
+def enable(target='stderr', profile=None, profile_dir=None, trace_id=None):
+    """Starts writing JSON lines to `target` ('stderr' or a file path), optionally with a profile mode."""
+    global _sink, _profile, _profile_dir, _trace_id
+    if profile not in (None, '') + PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {profile!r} (expected one of {', '.join(PROFILE_MODES)})")
+    _sink = sys.stderr if target == 'stderr' else open(target, 'a', buffering=1)
+    _profile = profile or None
+    _profile_dir = profile_dir or tempfile.gettempdir()
+    _trace_id = trace_id or uuid.uuid4().hex[:16]
+    if _profile == 'tracemalloc':
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def enable_from_env():
+    """Enables instrumentation if PREDICT_TRACE is set; called once at import."""
+    target = os.environ.get('PREDICT_TRACE')
+    if target:
+        enable(target, os.environ.get('PREDICT_PROFILE'), os.environ.get('PREDICT_PROFILE_DIR'),
+               os.environ.get('PREDICT_TRACE_ID'))
+
+
+def emit(record_type, **fields):
+    """Writes one JSON line (no-op while off)."""
+    if _sink is None:
+        return
+    line = json.dumps({'type': record_type, 'trace': _trace_id, 'pid': os.getpid(), 'ts': round(time.time(), 3),
+                       **fields}, default=str)
+    with _lock:
+        _sink.write(line + '\n')
+        _sink.flush()
+
+
+def count(name, value=1):
+    """Adds `value` to a counter (shared by the threads of the process)."""
+    if _sink is None:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def flush():
+    """Writes the counters accumulated so far as one line and resets them."""
+    global _counters
+    if _sink is None:
+        return
+    with _lock:
+        counters, _counters = _counters, {}
+    if counters:
+        emit('counters', counters=counters)
+
+
+class _Span:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        """Adds fields (row counts, versions...) to the span's line."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        self.root = not stack
+        stack.append(self)
+        self.profiler = None
+        if self.root and _profile == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another thread's top-level span is being profiled (one profiler at a time on 3.12+).
+                self.profiler = None
+        elif self.root and _profile == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+        record = {'name': self.name, 'parent': self.parent, 'ms': round(seconds * 1000, 3),
+                  'rss_mb': _round(rss_mb()), 'peak_rss_mb': _round(_peak_rss_mb()), **self.fields}
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        if self.profiler is not None:
+            self.profiler.disable()
+            record['profile'] = self._dump_profile()
+        elif self.root and _profile == 'tracemalloc':
+            record.update(_tracemalloc_summary())
+        emit('span', **record)
+        if self.root:
+            flush()
+        return False
+
+    def _dump_profile(self):
+        global _profiled
+        with _lock:
+            _profiled += 1
+            number = _profiled
+        path = os.path.join(_profile_dir, f"{self.name}-{os.getpid()}-{number}.prof")
+        self.profiler.dump_stats(path)
+        return path
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def _tracemalloc_summary():
+    import tracemalloc
+    _, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+    return {
+        'traced_peak_mb': round(peak / 2**20, 2),
+        'top_allocations': [{'where': str(stat.traceback[0]), 'mb': round(stat.size / 2**20, 3), 'blocks': stat.count}
+                            for stat in top],
+    }
+
+
+def span(name, **fields):
+    """Context manager timing a block as `name`; spans opened inside it record it as their parent."""
+    if _sink is None:
+        return NO_SPAN
+    return _Span(name, fields)
+
+
+def traced(name):
+    """Decorator running every call of the function in span(name)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+enable_from_env()
+atexit.register(flush)
@@ -0,0 +1,292 @@
+"""
+Materialized per-meeting attendance statistics for the user analytics page.
+
+The "Performance for Each of User's Meetings" table used to run, for every meeting row,
+a COUNT(DISTINCT id_user) over participation_meetings and a FIND_IN_SET enrollment count,
+on top of a MeetingScheduleLink CTE aggregated over all of participation_meetings. This
+module keeps the result in a small SQLite store:
+
+    meeting_stats   meeting_id -> class_id, titre_fr, scheduled day/hour, attended
+    class_members   (user_id, class_id) enrollment pairs
+    class_stats     class_id -> enrolled
+
+so the table for one user is an indexed lookup (see user_analytics.py). Meetings and
+participation rows are applied incrementally using high-water marks on meetings.id and
+participation_meetings.id: only meetings that are new or got new participation rows are
+recounted, through the index on participation_meetings.id_meeting. The enrollment pairs
+are small and re-read on every refresh.
+
+    python meeting_stats.py refresh          # apply new meetings / participation rows
+    python meeting_stats.py refresh --full   # rebuild from scratch
+    python meeting_stats.py check            # compare against a full recompute
+    python meeting_stats.py show 42          # print the meeting table of a user
+
+Only `refresh` creates or writes the store; `check`, `show` and user_analytics.py open it
+read-only and ignore it until a refresh has recorded its high-water marks.
+"""
+import argparse
+import datetime
+import os
+import sys
+
+import pandas as pd
+
+from db import Database
+from enrollment_index import use_enrollment_index
+from sqlite_store import SqliteStore
+
+DEFAULT_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'meeting_stats.sqlite')
+
+# Meetings with ids in (lo, hi].
+MEETINGS_QUERY = """
+SELECT m.id, m.id_classe, m.titre_fr
+FROM meetings m
+WHERE m.id > {lo} AND m.id <= {hi}
+"""
+
+# Attendance and schedule of the meetings that are new (id in (m_lo, m_hi]) or have
+# participation rows with ids in (p_lo, p_hi], counted over participation ids <= p_hi.
+STATS_QUERY = """
+SELECT
+    pm.id_meeting,
+    COUNT(DISTINCT pm.id_user) AS attended,
+    MAX(pcj.day) AS scheduled_day,
+    MAX(pcj.heure_from) AS scheduled_hour
+FROM participation_meetings pm
+JOIN meetings m ON pm.id_meeting = m.id
+LEFT JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
+WHERE pm.id <= {p_hi} AND pm.id_meeting <= {m_hi}
+  AND (pm.id_meeting > {m_lo}
+       OR pm.id_meeting IN (SELECT id_meeting FROM participation_meetings WHERE id > {p_lo} AND id <= {p_hi}))
+GROUP BY pm.id_meeting
+"""
+
+MEMBERS_QUERY = """
+SELECT DISTINCT p.user_id, c.id AS class_id
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+"""
+
+# The per-selection query of the analytics page, for every meeting at once.
+FULL_RECOMPUTE_QUERY = """
+WITH MeetingScheduleLink AS (
+    SELECT pm.id_meeting, MAX(pcj.day) AS scheduled_day, MAX(pcj.heure_from) AS scheduled_hour
+    FROM participation_meetings pm
+    JOIN meetings m ON pm.id_meeting = m.id
+    JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
+    GROUP BY pm.id_meeting
+)
+SELECT
+    m.id AS meeting_id,
+    msl.scheduled_day,
+    msl.scheduled_hour,
+    (SELECT COUNT(DISTINCT id_user) FROM participation_meetings WHERE id_meeting = m.id) AS attended,
+    (SELECT COUNT(DISTINCT p_inner.user_id) FROM parcour_group_pivot p_inner JOIN parcours_classes pc_inner ON p_inner.id_parcour_classes = pc_inner.id WHERE FIND_IN_SET(m.id_classe, pc_inner.classes)) AS enrolled
+FROM meetings m
+LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meeting_stats (
+    meeting_id INTEGER PRIMARY KEY,
+    class_id INTEGER,
+    titre_fr TEXT,
+    scheduled_day TEXT,
+    scheduled_hour TEXT,
+    attended INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS meeting_stats_class ON meeting_stats (class_id, meeting_id);
+CREATE TABLE IF NOT EXISTS class_members (
+    user_id INTEGER NOT NULL,
+    class_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, class_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS class_stats (
+    class_id INTEGER PRIMARY KEY,
+    enrolled INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS store_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+USER_MEETINGS_QUERY = """
+SELECT ms.meeting_id, ms.titre_fr, ms.scheduled_day, ms.scheduled_hour,
+       ms.attended AS total_attended, COALESCE(cs.enrolled, 0) AS total_enrolled
+FROM class_members cm
+JOIN meeting_stats ms ON ms.class_id = cm.class_id
+LEFT JOIN class_stats cs ON cs.class_id = cm.class_id
+WHERE cm.user_id = ?
+ORDER BY ms.meeting_id DESC
+"""
+
+
+def _day_text(value):
+    """ISO date of a DATE value (date, datetime or string), None when missing."""
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+def _hour_text(value):
+    """'HH:MM:SS' of a TIME value (MySQL returns a timedelta), None when missing."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return str(value)
+
+
+class MeetingStatsStore(SqliteStore):
+    """SQLite-backed per-meeting attendance, schedule and enrollment counts."""
+
+    SCHEMA = SCHEMA
+    BUILT_KEY = 'last_meeting_id'
+
+    def __init__(self, path=DEFAULT_STATS_PATH, read_only=False):
+        super().__init__(path, read_only)
+
+    # --- Refresh ---
+    def refresh(self, cnx, full=False, enrollment_index=False):
+        """
+        Applies meetings and participation rows added since the last refresh and re-reads the
+        enrollment pairs, from `cnx` (a db.PooledConnection on the source database).
+        Returns a dict with the number of new ids and recounted meetings.
+        """
+        if full:
+            for table in ('meeting_stats', 'class_members', 'class_stats', 'store_state'):
+                self.conn.execute(f"DELETE FROM {table}")
+
+        last_meeting = self.get_state('last_meeting_id', 0)
+        last_participation = self.get_state('last_participation_id', 0)
+        # Snapshot the upper bounds first so rows inserted while we run are picked up next time.
+        max_meeting = int(cnx.scalar("SELECT MAX(id) FROM meetings") or 0)
+        max_participation = int(cnx.scalar("SELECT MAX(id) FROM participation_meetings") or 0)
+        members, _ = cnx.query(use_enrollment_index(MEMBERS_QUERY) if enrollment_index else MEMBERS_QUERY)
+
+        recounted = []
+        with self.conn:
+            if max_meeting > last_meeting:
+                meetings, _ = cnx.query(MEETINGS_QUERY.format(lo=last_meeting, hi=max_meeting))
+                self.conn.executemany(
+                    "INSERT INTO meeting_stats (meeting_id, class_id, titre_fr) VALUES (?, ?, ?) "
+                    "ON CONFLICT(meeting_id) DO UPDATE SET class_id = excluded.class_id, titre_fr = excluded.titre_fr",
+                    [(int(m), int(c) if c is not None else None, t)
+                     for m, c, t in meetings],
+                )
+            if max_meeting > last_meeting or max_participation > last_participation:
+                # Participation of a meeting above max_meeting is counted once that meeting is new.
+                recounted, _ = cnx.query(STATS_QUERY.format(m_lo=last_meeting, m_hi=max_meeting,
+                                                            p_lo=last_participation, p_hi=max_participation))
+                self.conn.executemany(
+                    "UPDATE meeting_stats SET attended = ?, scheduled_day = ?, scheduled_hour = ? WHERE meeting_id = ?",
+                    [(int(attended), _day_text(day), _hour_text(hour), int(meeting_id))
+                     for meeting_id, attended, day, hour in recounted],
+                )
+
+            self.conn.execute("DELETE FROM class_members")
+            self.conn.executemany("INSERT INTO class_members (user_id, class_id) VALUES (?, ?)",
+                                  [(int(u), int(c)) for u, c in members])
+            self.conn.execute("DELETE FROM class_stats")
+            self.conn.execute("INSERT INTO class_stats SELECT class_id, COUNT(*) FROM class_members GROUP BY class_id")
+            self._set_state('last_meeting_id', max_meeting)
+            self._set_state('last_participation_id', max_participation)
+
+        return {
+            'new_meeting_ids': max(0, max_meeting - last_meeting),
+            'new_participation_ids': max(0, max_participation - last_participation),
+            'recounted_meetings': len(recounted),
+        }
+
+    # --- Reads ---
+    def user_meetings(self, user_id):
+        """
+        The meetings of the classes a user is enrolled in, newest first, with titre_fr,
+        scheduled_day, scheduled_hour, total_attended and total_enrolled.
+        """
+        return pd.read_sql(USER_MEETINGS_QUERY, self.conn, params=(int(user_id),))
+
+    def all_stats(self):
+        return pd.read_sql(
+            "SELECT ms.meeting_id, ms.scheduled_day, ms.scheduled_hour, ms.attended, COALESCE(cs.enrolled, 0) AS enrolled "
+            "FROM meeting_stats ms LEFT JOIN class_stats cs ON cs.class_id = ms.class_id", self.conn)
+
+    # --- Consistency ---
+    def check(self, cnx):
+        """
+        Compares the stored statistics with a full recompute from the source database.
+        Returns a DataFrame of the meetings that differ (empty when consistent).
+        """
+        columns = ['meeting_id', 'scheduled_day', 'scheduled_hour', 'attended', 'enrolled']
+        rows, _ = cnx.query(FULL_RECOMPUTE_QUERY)
+        expected = pd.DataFrame(
+            [(int(m), _day_text(d), _hour_text(h), int(a or 0), int(e or 0)) for m, d, h, a, e in rows],
+            columns=columns)
+        stored = self.all_stats()
+        merged = pd.merge(expected, stored, on='meeting_id', how='outer', suffixes=('_expected', '_stored'), indicator=True)
+        mismatch = merged['_merge'] != 'both'
+        for column in columns[1:]:
+            a, b = merged[f'{column}_expected'], merged[f'{column}_stored']
+            mismatch |= (a != b) & ~(a.isna() & b.isna())
+        return merged[mismatch].drop(columns='_merge').reset_index(drop=True)
+
+
+def open_stats_if_present(path=DEFAULT_STATS_PATH):
+    """Returns a read-only MeetingStatsStore if one has been built at path, else None."""
+    return MeetingStatsStore.open_if_built(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_STATS_PATH, help="Path of the SQLite meeting statistics.")
+    parser.add_argument('--use-enrollment-index', action='store_true',
+                        help="Read enrollment through the enrollment side tables (see enrollment_index.py).")
+    parser.add_argument('--sqlite', help="Use a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = sub.add_parser('refresh', help="Apply new meetings and participation rows.")
+    refresh_parser.add_argument('--full', action='store_true', help="Rebuild the store from scratch.")
+    sub.add_parser('check', help="Compare the store against a full recompute.")
+    show_parser = sub.add_parser('show', help="Print the meeting table of a user.")
+    show_parser.add_argument('user_id', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'refresh':
+        store = MeetingStatsStore(args.store)
+    else:
+        store = open_stats_if_present(args.store)
+        if store is None:
+            print(f"ERROR: No meeting statistics have been built at {args.store}; run 'refresh' first.")
+            sys.exit(1)
+    try:
+        if args.command == 'show':
+            print(store.user_meetings(args.user_id).to_string(index=False))
+            return
+
+        database = Database.open(args.sqlite, size=1)
+        try:
+            with database.connection() as cnx:
+                if args.command == 'refresh':
+                    stats = store.refresh(cnx, full=args.full, enrollment_index=args.use_enrollment_index)
+                    print(f"-> Meeting statistics refreshed: {stats['new_meeting_ids']} new meeting ids, "
+                          f"{stats['new_participation_ids']} new participation ids, {stats['recounted_meetings']} meetings recounted.")
+                else:
+                    mismatches = store.check(cnx)
+                    if mismatches.empty:
+                        print("-> Meeting statistics are consistent with a full recompute.")
+                    else:
+                        print(f"ERROR: {len(mismatches)} meetings differ from a full recompute; run 'refresh --full'.")
+                        print(mismatches.head(20).to_string(index=False))
+                        sys.exit(1)
+        finally:
+            database.close()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
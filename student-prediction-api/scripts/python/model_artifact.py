@@ -0,0 +1,129 @@
+"""
+Compact, memory-mappable model artifact: a directory of raw .npy arrays plus a JSON manifest.
+
+    attendance_model/
+        manifest.json        format version, feature list, training date, metrics, array specs
+        children.npy         the packed forest tables of forest_engine.pack_forest()
+        split_threshold.npy
+        ...
+
+Loading never unpickles anything (np.load(allow_pickle=False)), so an artifact from an
+untrusted disk cannot execute code, and with mmap=True every array is mapped read-only:
+worker processes loading the same artifact share its pages through the OS page cache
+instead of each holding a private copy of the forest.
+
+    python model_artifact.py export attendance_model.pkl attendance_model
+    python model_artifact.py show attendance_model
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+
+from forest_engine import PACKED_ARRAYS, PackedForest, pack_forest
+
+FORMAT_VERSION = 1
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def write_artifact(model, path, features, metrics=None, trained_at=None):
+    """
+    Packs a fitted forest and writes it as an artifact directory at `path`.
+    The directory is written next to its final location and renamed into place, so a
+    reader never sees a half-written artifact.
+    """
+    arrays = pack_forest(model)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model_type': type(model).__name__,
+        'features': list(features),
+        'trained_at': trained_at or datetime.datetime.now().isoformat(timespec='seconds'),
+        'metrics': metrics or {},
+        'n_estimators': int(len(arrays['roots'])),
+        'n_nodes': int(len(arrays['is_leaf'])),
+        'classes': arrays['classes'].tolist(),
+        'arrays': {name: {'dtype': arrays[name].dtype.str, 'shape': list(arrays[name].shape)}
+                   for name in PACKED_ARRAYS},
+    }
+
+    path = os.path.abspath(path)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in PACKED_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(arrays[name]), allow_pickle=False)
+    with open(os.path.join(tmp_path, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.isdir(path):
+        old_path = path + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.rename(tmp_path, path)
+    return manifest
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILENAME))
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format {manifest.get('format_version')!r} in {path}")
+    return manifest
+
+
+def load_artifact(path, mmap=True):
+    """
+    Returns (PackedForest, manifest). With mmap=True the arrays are read-only memory maps;
+    each one is checked against the dtype and shape recorded in the manifest.
+    """
+    manifest = read_manifest(path)
+    arrays = {}
+    for name in PACKED_ARRAYS:
+        spec = manifest['arrays'][name]
+        array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None, allow_pickle=False)
+        if array.dtype.str != spec['dtype'] or list(array.shape) != spec['shape']:
+            raise ValueError(f"Array {name} of {path} does not match its manifest")
+        arrays[name] = array
+    return PackedForest(arrays), manifest
+
+
+def artifact_size(path):
+    """Total size in bytes of the files of an artifact."""
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Convert a pickled forest into an artifact directory.")
+    export.add_argument('model')
+    export.add_argument('path')
+    show = sub.add_parser('show', help="Print the manifest of an artifact.")
+    show.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        import pickle
+        from features import FEATURES
+        with open(args.model, 'rb') as f:
+            model = pickle.load(f)
+        features = list(getattr(model, 'feature_names_in_', FEATURES))
+        manifest = write_artifact(model, args.path, features)
+        print(f"-> {manifest['n_estimators']} trees, {manifest['n_nodes']} nodes written to {args.path} "
+              f"({artifact_size(args.path) / 1e6:.2f} MB, pickle {os.path.getsize(args.model) / 1e6:.2f} MB)")
+    else:
+        print(json.dumps(read_manifest(args.path), indent=2))
+
+
+if __name__ == "__main__":
+    main()
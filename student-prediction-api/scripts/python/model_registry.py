@@ -0,0 +1,238 @@
+"""
+Versioned model registry with an atomic "current" pointer and hot reloading.
+
+    models/
+        CURRENT              name of the version being served, replaced atomically
+        v0001/               a model artifact (see model_artifact.py) + model.pkl
+        v0002/
+        ...
+
+A version directory is fully written under a temporary name and renamed into place, and
+CURRENT is swapped with os.replace(), so readers only ever see complete versions and
+retraining never overwrites a model that is being read. HotModel watches the mtime of
+CURRENT and swaps the in-memory model between requests, without a restart.
+
+    python model_registry.py list [--json]
+    python model_registry.py show v0002
+    python model_registry.py promote v0001          # roll back
+    python model_registry.py publish attendance_model.pkl
+    python model_registry.py prune --keep 5
+"""
+import argparse
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
+import threading
+import time
+
+from model_artifact import load_artifact, read_manifest, write_artifact
+
+DEFAULT_REGISTRY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+CURRENT_FILENAME = 'CURRENT'
+PICKLE_FILENAME = 'model.pkl'
+
+_VERSION_RE = re.compile(r'^v(\d+)$')
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY):
+        self.root = root
+        self.current_file = os.path.join(root, CURRENT_FILENAME)
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def list_versions(self):
+        """Version names, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        found = [(int(m.group(1)), name) for name in os.listdir(self.root)
+                 if (m := _VERSION_RE.match(name)) and os.path.isdir(self.path(name))]
+        return [name for _, name in sorted(found)]
+
+    def current_version(self):
+        try:
+            with open(self.current_file) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def current_path(self):
+        version = self.current_version()
+        return self.path(version) if version else None
+
+    def set_current(self, version):
+        """Points CURRENT at `version` atomically (write a temporary file, then rename over)."""
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Unknown model version: {version}")
+        tmp_file = f"{self.current_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(version + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.current_file)
+
+    def metadata(self, version):
+        """Manifest of a version (features, training date, metrics...) plus its name and status."""
+        manifest = read_manifest(self.path(version))
+        manifest.pop('arrays', None)
+        return {'version': version, 'current': version == self.current_version(), **manifest}
+
+    def publish(self, model, features, metrics=None, make_current=True):
+        """Stores a fitted forest as a new version and, by default, makes it current. Returns the version."""
+        os.makedirs(self.root, exist_ok=True)
+        while True:
+            versions = self.list_versions()
+            number = int(versions[-1][1:]) + 1 if versions else 1
+            version = f"v{number:04d}"
+            staging = os.path.join(self.root, f".{version}.{os.getpid()}.staging")
+            write_artifact(model, staging, features, metrics)
+            with open(os.path.join(staging, PICKLE_FILENAME), 'wb') as f:
+                pickle.dump(model, f)
+            try:
+                # Fails if another trainer claimed the same number meanwhile; retry with the next one.
+                os.rename(staging, self.path(version))
+                break
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(self.path(version)):
+                    raise
+
+        if make_current:
+            self.set_current(version)
+        return version
+
+    def prune(self, keep=5):
+        """Deletes the oldest versions, keeping the newest `keep` and the current one. Returns the deleted names."""
+        versions = self.list_versions()
+        current = self.current_version()
+        deleted = [v for v in versions[:max(len(versions) - keep, 0)] if v != current]
+        for version in deleted:
+            # Processes that still map this version's files keep reading them until they reload.
+            shutil.rmtree(self.path(version))
+        return deleted
+
+
+def open_registry_if_present(root=DEFAULT_REGISTRY):
+    """The registry at `root` if it has a current version, else None."""
+    registry = ModelRegistry(root)
+    return registry if registry.current_version() else None
+
+
+def load_version(path):
+    model, _ = load_artifact(path)
+    return model
+
+
+class HotModel:
+    """
+    The model of the registry's current version, reloaded when CURRENT changes.
+
+    get() costs one stat() of CURRENT at most every `check_interval` seconds. The new
+    version is fully loaded before it replaces the old one, and a version that fails to
+    load is reported and skipped, so callers always get a complete, working model.
+    """
+
+    def __init__(self, registry, loader=load_version, check_interval=1.0):
+        self.registry = registry
+        self.loader = loader
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._state = (None, None)
+        self._reload()
+        if self.version is None:
+            raise FileNotFoundError(f"No current model version in registry {registry.root}")
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.registry.current_file)
+        except FileNotFoundError:
+            return
+        # os.replace() gives CURRENT a new inode, so a swap is seen even within one mtime tick.
+        mtime = (stat.st_mtime_ns, stat.st_ino)
+        if mtime == self._mtime:
+            return
+        # Recorded before loading: a version that fails to load is tried and reported once,
+        # and tried again only when CURRENT is rewritten (e.g. the version is promoted again).
+        self._mtime = mtime
+        version = self.registry.current_version()
+        if version and version != self.version:
+            try:
+                model = self.loader(self.registry.path(version))
+            except Exception as e:
+                print(f"WARNING: could not load model version {version}: {e}", file=sys.stderr)
+                return
+            # A single assignment: readers see either the old (model, version) or the new one.
+            self._state = (model, version)
+
+    @property
+    def version(self):
+        return self._state[1]
+
+    def get(self):
+        """Returns (model, version)."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._reload()
+                    self._next_check = now + self.check_interval
+        return self._state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY)
+    sub = parser.add_subparsers(dest='command', required=True)
+    list_cmd = sub.add_parser('list', help="All versions with their metrics.")
+    list_cmd.add_argument('--json', action='store_true')
+    sub.add_parser('current', help="Print the current version.")
+    show = sub.add_parser('show', help="Print the metadata of a version.")
+    show.add_argument('version')
+    promote = sub.add_parser('promote', help="Make a version current (e.g. to roll back).")
+    promote.add_argument('version')
+    publish = sub.add_parser('publish', help="Register a pickled forest as a new current version.")
+    publish.add_argument('model')
+    prune = sub.add_parser('prune', help="Delete old versions.")
+    prune.add_argument('--keep', type=int, default=5)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'list':
+        rows = [registry.metadata(version) for version in registry.list_versions()]
+        if args.json:
+            print(json.dumps(rows))
+            return
+        print(f"{'':1} {'version':<8} {'trained_at':<20} {'accuracy':>9} {'train rows':>11} {'train s':>8}")
+        for row in rows:
+            metrics = row.get('metrics', {})
+            accuracy, n_train, seconds = metrics.get('accuracy'), metrics.get('n_train'), metrics.get('training_seconds')
+            print(f"{'*' if row['current'] else '':1} {row['version']:<8} {row['trained_at']:<20} "
+                  f"{accuracy if accuracy is not None else '-':>9} {n_train if n_train is not None else '-':>11} "
+                  f"{seconds if seconds is not None else '-':>8}")
+    elif args.command == 'current':
+        print(registry.current_version() or '')
+    elif args.command == 'show':
+        print(json.dumps(registry.metadata(args.version), indent=2))
+    elif args.command == 'promote':
+        registry.set_current(args.version)
+        print(f"-> {args.version} is now current")
+    elif args.command == 'publish':
+        from features import FEATURES
+        with open(args.model, 'rb') as f:
+            model = pickle.load(f)
+        version = registry.publish(model, list(getattr(model, 'feature_names_in_', FEATURES)))
+        print(f"-> Published {args.model} as {version}")
+    elif args.command == 'prune':
+        deleted = registry.prune(args.keep)
+        print(f"-> Deleted {len(deleted)} version(s): {', '.join(deleted) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Parallel search over forest sizes, leaf sizes and model families, with a leaderboard.
+
+The training and test matrices are written once as .npy files and every worker of the
+process pool maps them read-only (np.load(mmap_mode='r')), so the data is neither pickled
+to each task nor copied per worker. The CPUs are split between the pool and the
+estimators: with C CPUs and W workers each estimator gets C // W threads (n_jobs, or the
+OpenMP pool of HistGradientBoosting).
+
+Each candidate is fitted, scored on the held-out rows and saved the way it would be
+served (forests as a model_artifact directory, other models as a pickle). Inference
+latency is then measured one model at a time, after the pool is done, so it is not
+skewed by fits running next to it:
+
+    accuracy      on the held-out rows
+    fit s         wall time of fit() with the candidate's share of the CPUs
+    1 row ms      median predict_proba latency for one row (one meeting, one user)
+    1k rows ms    median predict_proba latency for 1000 rows (a large meeting)
+    size MB       artifact (or pickle) size on disk
+
+    python model_search.py                                  # MySQL, as train_model.py
+    python model_search.py --sqlite synthetic.sqlite --families random_forest extra_trees
+    python model_search.py --extract training_extract.parquet --holdout-days 14 --sort latency --json leaderboard.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from rolling_history import NO_DAY
+
+# Estimator settings shared by every candidate of a family (as in train_model.fit).
+FAMILIES = {
+    'random_forest': ('sklearn.ensemble', 'RandomForestClassifier', {'random_state': 42, 'class_weight': 'balanced'}),
+    'extra_trees': ('sklearn.ensemble', 'ExtraTreesClassifier', {'random_state': 42, 'class_weight': 'balanced'}),
+    'hist_gb': ('sklearn.ensemble', 'HistGradientBoostingClassifier', {'random_state': 42, 'class_weight': 'balanced'}),
+}
+
+# The values tried for each family; every combination is one candidate.
+GRID = {
+    'random_forest': {'n_estimators': (50, 150, 300), 'min_samples_leaf': (1, 5, 20)},
+    'extra_trees': {'n_estimators': (150, 300), 'min_samples_leaf': (1, 5, 20)},
+    'hist_gb': {'max_iter': (100, 300), 'max_leaf_nodes': (31, 127)},
+}
+
+SORT_KEYS = {
+    'accuracy': lambda row: -row['accuracy'],
+    'latency': lambda row: row['latency_1_ms'],
+    'fit': lambda row: row['fit_seconds'],
+    'size': lambda row: row['size_mb'],
+}
+
+LATENCY_REPEATS = 50
+
+# Set in each pool worker by _init_worker().
+_data = None
+
+
+def candidates(families=None):
+    """(family, params) for every grid combination, most expensive first to balance the pool."""
+    out = []
+    for family in families or GRID:
+        names = list(GRID[family])
+        for values in itertools.product(*(GRID[family][name] for name in names)):
+            out.append((family, dict(zip(names, values))))
+    return sorted(out, key=lambda c: -c[1].get('n_estimators', c[1].get('max_iter', 0)) / c[1].get('min_samples_leaf', 1))
+
+
+def split_cpus(n_tasks, workers=None, cpus=None):
+    """(pool workers, threads per estimator): the pool gets at most one worker per task and per CPU."""
+    if cpus is None:
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_tasks, cpus))
+    return workers, max(1, cpus // workers)
+
+
+def make_estimator(family, params, n_jobs=1):
+    import importlib
+    module, name, fixed = FAMILIES[family]
+    estimator_class = getattr(importlib.import_module(module), name)
+    kwargs = {**fixed, **params}
+    if 'n_jobs' in estimator_class().get_params():
+        kwargs['n_jobs'] = n_jobs
+    return estimator_class(**kwargs)
+
+
+def holdout_split(X, y, days, holdout_days=None):
+    """
+    Index arrays (train, test): a stratified random 75/25 split or, with holdout_days, the
+    dated rows of the last holdout_days days as test and the earlier dated rows as train
+    (the time slice train_model.py scores on).
+    """
+    if not holdout_days:
+        from sklearn.model_selection import train_test_split
+        return train_test_split(np.arange(len(y)), test_size=0.25, random_state=42, stratify=y)
+    dated = days != NO_DAY
+    cutoff = days[dated].max() - holdout_days
+    return np.flatnonzero(dated & (days <= cutoff)), np.flatnonzero(dated & (days > cutoff))
+
+
+def _init_worker(data_dir):
+    global _data
+    _data = {name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode='r')
+             for name in ('X_train', 'y_train', 'X_test', 'y_test')}
+
+
+def _save(model, path):
+    """Stores a fitted candidate as it would be served. Returns (path, size in bytes)."""
+    from forest_engine import can_pack
+    from features import FEATURES
+    from model_artifact import artifact_size, write_artifact
+    if can_pack(model):
+        write_artifact(model, path, FEATURES)
+        return path, artifact_size(path)
+    path += '.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+    return path, os.path.getsize(path)
+
+
+def _evaluate(family, params, n_jobs, out_dir, index):
+    """Pool task: fit one candidate on the mapped data, score it and save it."""
+    from sklearn.metrics import accuracy_score
+    from threadpoolctl import threadpool_limits
+
+    model = make_estimator(family, params, n_jobs)
+    with threadpool_limits(limits=n_jobs):
+        start = time.perf_counter()
+        model.fit(_data['X_train'], _data['y_train'])
+        fit_seconds = time.perf_counter() - start
+        accuracy = accuracy_score(_data['y_test'], model.predict(_data['X_test']))
+    path, size = _save(model, os.path.join(out_dir, f"candidate_{index:03d}"))
+    return {'family': family, 'params': params, 'accuracy': float(accuracy), 'fit_seconds': fit_seconds,
+            'size_mb': size / 1e6, 'path': path}
+
+
+def _median_ms(fn, repeats=LATENCY_REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def measure_latency(path, X):
+    """(1-row, 1000-row) median predict_proba latency in ms of a saved candidate, loaded as it is served."""
+    from model_artifact import is_artifact, load_artifact
+    if is_artifact(path):
+        model, _ = load_artifact(path)
+    else:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+    one, batch = np.ascontiguousarray(X[:1]), np.ascontiguousarray(X[:1000])
+    model.predict_proba(batch)   # warm up (page in mapped arrays, sklearn's lazy imports)
+    return _median_ms(lambda: model.predict_proba(one)), _median_ms(lambda: model.predict_proba(batch), max(LATENCY_REPEATS // 10, 3))
+
+
+def search(X, y, days=None, families=None, workers=None, holdout_days=None, work_dir=None):
+    """Runs the search and returns the leaderboard rows (unsorted)."""
+    train, test = holdout_split(X, y, days, holdout_days)
+    tasks = candidates(families)
+    n_workers, n_jobs = split_cpus(len(tasks), workers)
+    print(f"-> {len(tasks)} candidates, {len(train)} training / {len(test)} test rows, "
+          f"{n_workers} worker(s) x {n_jobs} thread(s)")
+
+    tmp = tempfile.mkdtemp(prefix='model_search_', dir=work_dir)
+    try:
+        for name, values in (('X_train', X[train]), ('y_train', y[train]), ('X_test', X[test]), ('y_test', y[test])):
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(values))
+        X_test = np.load(os.path.join(tmp, 'X_test.npy'), mmap_mode='r')
+
+        rows = []
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(tmp,)) as pool:
+            futures = [pool.submit(_evaluate, family, params, n_jobs, tmp, i) for i, (family, params) in enumerate(tasks)]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                print(f"-> [{len(rows)}/{len(tasks)}] {row['family']} {row['params']}: "
+                      f"accuracy {row['accuracy']:.4f}, fit {row['fit_seconds']:.1f} s")
+
+        print("-> Measuring inference latency...")
+        for row in rows:
+            row['latency_1_ms'], row['latency_1k_ms'] = measure_latency(row.pop('path'), X_test)
+        return rows
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def print_leaderboard(rows):
+    print(f"\n{'#':>3} {'family':<14} {'params':<40} {'accuracy':>9} {'fit s':>7} {'1 row ms':>9} {'1k rows ms':>11} {'size MB':>8}")
+    for rank, row in enumerate(rows, 1):
+        params = ', '.join(f"{k}={v}" for k, v in row['params'].items())
+        print(f"{rank:>3} {row['family']:<14} {params:<40} {row['accuracy']:>9.4f} {row['fit_seconds']:>7.1f} "
+              f"{row['latency_1_ms']:>9.3f} {row['latency_1k_ms']:>11.2f} {row['size_mb']:>8.2f}")
+
+
+def load_training_data(args):
+    """(X, y, days) from a Parquet extract, a SQLite copy of the schema or MySQL."""
+    import pandas as pd
+    import train_model
+    from extract import UNIFIED_QUERY, read_extract, sort_extract
+
+    # Sorted like train_model.extract(), so every source gives the same split.
+    if args.extract:
+        df = sort_extract(read_extract(args.extract))
+    elif args.sqlite:
+        from db import connect
+        cnx = connect(sqlite=args.sqlite)
+        df = sort_extract(pd.read_sql(UNIFIED_QUERY, cnx))
+        cnx.close()
+    else:
+        cnx = train_model.connect()
+        try:
+            df = train_model.extract(cnx, enrollment_index=args.use_enrollment_index)
+        finally:
+            cnx.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return train_model.engineer_features(df, with_days=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--extract', help="Search on a Parquet extract written by train_model.py --stream.")
+    source.add_argument('--sqlite', help="Search on a SQLite copy of the schema (e.g. synthetic_db.py).")
+    parser.add_argument('--use-enrollment-index', action='store_true')
+    parser.add_argument('--families', nargs='+', choices=list(GRID), help="Model families to try (default: all).")
+    parser.add_argument('--workers', type=int, help="Pool size (default: one per CPU, at most one per candidate).")
+    parser.add_argument('--holdout-days', type=int, help="Score on the last N days instead of a random 25%% split.")
+    parser.add_argument('--sort', choices=list(SORT_KEYS), default='accuracy')
+    parser.add_argument('--json', help="Also write the leaderboard to this file.")
+    args = parser.parse_args()
+
+    import warnings
+    from train_model import TrainingError
+    warnings.simplefilter('ignore')
+    try:
+        X, y, days = load_training_data(args)
+    except TrainingError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    rows = search(X, y, days, args.families, args.workers, args.holdout_days)
+    rows.sort(key=SORT_KEYS[args.sort])
+    print_leaderboard(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n-> Leaderboard written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,148 @@
 import sys
 import os
 import json
-import pandas as pd
 import pickle
 
+import numpy as np
+
+# Only NumPy is needed to serve a model artifact: the request is parsed with json (or read
+# from the binary columnar format, see wire_format.py) straight into the feature matrix,
+# and scikit-learn is only imported to unpickle a model.
+from features import FEATURES, matrix_from_records
+from forest_engine import PackedForest, can_pack, predict_with_proba
+from instrumentation import count, span
+from model_artifact import is_artifact, load_artifact
+from model_registry import DEFAULT_REGISTRY, open_registry_if_present
+from wire_format import decode_features, encode_predictions, is_features_payload
+
+# Wire formats of a request or response: the JSON records or the binary columnar payloads.
+JSON = 'json'
+BINARY = 'binary'
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attendance_model.pkl')
+
+def default_model_path(registry_root=DEFAULT_REGISTRY):
+    """The current version of the registry at registry_root when it has one, else the bundled pickle."""
+    registry = open_registry_if_present(registry_root)
+    return registry.current_path() if registry else DEFAULT_MODEL_PATH
+
 def print_json_error(message):
     """Prints a structured JSON error message and exits."""
     print(json.dumps({"error": True, "message": message}))
     sys.exit(1)
 
-def main():
+def load_model(model_path=DEFAULT_MODEL_PATH):
     """
-    Loads the model and predicts attendance based on JSON data read from standard input.
+    Loads the pre-trained model (using pickle), or a memory-mapped packed forest when
+    model_path is a model artifact directory (see model_artifact.py).
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found at {model_path}")
+
+    if is_artifact(model_path):
+        model, manifest = load_artifact(model_path)
+        if manifest['features'] != FEATURES:
+            raise ValueError(f"Model artifact {model_path} was trained on different features: {manifest['features']}")
+        return model
+    with open(model_path, 'rb') as file:
+        return pickle.load(file)
+
+def load_predictor(model_path=DEFAULT_MODEL_PATH):
+    """Loads the model and packs it for inference when it is a forest (see forest_engine.py)."""
+    model = load_model(model_path)
+    return PackedForest.from_model(model) if can_pack(model) else model
+
+def parse_payload(payload):
+    """
+    (user_ids, X, wire format) of a request: a JSON array of per-user feature records
+    (str or UTF-8 bytes) or a binary features payload (see wire_format.py).
+    """
+    if is_features_payload(payload):
+        with span('predict.parse', bytes=len(payload), format=BINARY):
+            user_ids, X = decode_features(payload)
+        return user_ids, X, BINARY
+
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    with span('predict.parse', bytes=len(payload), format=JSON):
+        # An empty request is answered with an empty array.
+        records = (json.loads(payload) if payload.strip() else None) or []
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of per-user feature records")
+
+    # Prepare the data for prediction, in FEATURES order (a missing column raises ValueError).
+    with span('predict.features'):
+        user_ids, X = matrix_from_records(records)
+    return user_ids, X, JSON
+
+def serialize_predictions(user_ids, probas, predictions, wire_format=JSON):
+    """The response body: a JSON string, or the bytes of a binary predictions payload."""
+    with span('predict.serialize', format=wire_format):
+        if wire_format == BINARY:
+            return encode_predictions(user_ids, probas, predictions)
+        if hasattr(user_ids, 'tolist'):
+            user_ids = user_ids.tolist()
+        # Compact, probabilities to 10 decimals, as DataFrame.to_json wrote it.
+        return json.dumps([
+            {"user_id": user_id, "probability_of_presence": round(proba, 10), "prediction": label}
+            for user_id, proba, label in zip(user_ids, probas.tolist(), predictions.tolist())
+        ], separators=(',', ':'))
+
+def predict_payload(model, payload, response_format=None):
+    """
+    Runs the model over a request in either wire format and returns the response, in
+    `response_format` (JSON or BINARY) or by default in the format of the request.
+    """
+    user_ids, X, request_format = parse_payload(payload)
+    count('predict.rows', len(X))
+
+    if len(X) == 0:
+        predictions, probas = np.zeros(0, dtype=np.uint8), np.zeros(0)
+    else:
+        # Make predictions: labels are derived from the probabilities, one pass over the trees.
+        with span('predict.forest', rows=len(X)):
+            predictions, probas = predict_with_proba(model, X)
+        probas = probas[:, 1] # Probability of the '1' class (present)
+    return serialize_predictions(user_ids, probas, predictions, response_format or request_format)
+
+def predict_json(model, feature_data_json):
+    """
+    Runs the model over a JSON array of per-user feature records and returns
+    the JSON array of predictions, exactly as printed by the stdin/stdout mode.
+    """
+    return predict_payload(model, feature_data_json, JSON)
+
+def main(model_path=None, registry_root=DEFAULT_REGISTRY):
+    """
+    Loads the model (model_path, else the current version of the registry at
+    registry_root) and predicts attendance based on the JSON or binary features read
+    from standard input, answering in the same format on standard output.
     """
     try:
-        # Read the complete JSON data from the standard input stream.
-        # This is the most robust way to receive large amounts of data.
-        feature_data_json = sys.stdin.read()
-        
-        # If the input is empty for some reason, exit gracefully.
-        if not feature_data_json:
-            print(json.dumps([]))
-            return
-
-        # Load the input data from the JSON string into a DataFrame.
-        input_df = pd.read_json(feature_data_json, orient='records')
-
-        if input_df.empty:
-            print(json.dumps([])) # Return empty array if no users were passed
-            return
-            
-        # Load the pre-trained model (using pickle).
-        model_path = os.path.join(os.path.dirname(__file__), 'attendance_model.pkl')
-        if not os.path.exists(model_path):
-             raise FileNotFoundError(f"Model file not found at {model_path}")
-
-        with open(model_path, 'rb') as file:
-            model = pickle.load(file)
-
-        # Define the exact feature order the model was trained on. This is critical.
-        features_for_prediction = [
-            "user_id", "class_id", "course_id", "id_matiere", "id_professeur",
-            "meeting_weekday", "meeting_hour", "user_attendance_rate", "user_total_meetings"
-        ]
-        
-        # Ensure all required columns are present in the DataFrame from Laravel.
-        for col in features_for_prediction:
-            if col not in input_df.columns:
-                raise ValueError(f"Missing required feature column in JSON data: {col}")
-
-        # Prepare the data for prediction.
-        X = input_df[features_for_prediction]
-
-        # Make predictions.
-        predictions = model.predict(X)
-        probas = model.predict_proba(X)[:, 1] # Probability of the '1' class (present)
-
-        # Format and print the final JSON output to standard output.
-        results_df = input_df[['user_id']].copy()
-        results_df["probability_of_presence"] = probas
-        results_df["prediction"] = predictions.tolist()
-        print(results_df.to_json(orient="records"))
+        with span('predict'):
+            # Read the complete request from the standard input stream.
+            # This is the most robust way to receive large amounts of data.
+            with span('predict.read_stdin'):
+                payload = sys.stdin.buffer.read()
+
+            # If the input is empty for some reason, exit gracefully.
+            if not payload:
+                print(json.dumps([]))
+                return
+
+            model_path = model_path or default_model_path(registry_root)
+            with span('predict.load_model', path=model_path):
+                model = load_predictor(model_path)
+            body = predict_payload(model, payload)
+            if isinstance(body, bytes):
+                sys.stdout.buffer.write(body)
+                sys.stdout.buffer.flush()
+            else:
+                print(body)
 
     except Exception as e:
         print_json_error(f"Error in Python prediction script: {str(e)}")
 
 if __name__ == "__main__":
     # The script now takes NO command-line arguments and just runs main.
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,154 @@
+"""
+Cache of per-meeting prediction results, for pred_train/app.py.
+
+Predicting a meeting runs the enrollment, history and schedule queries and the forest.
+The result only changes when one of these changes:
+
+    model_version      the registry's current version (HotModel), so a retrain or rollback
+                       is a different key
+    snapshot_version   the participation rows of the meeting's class (count and highest id)
+                       and, when the feature store is used, its high-water marks; new
+                       participation for the class or a store refresh is a different key
+
+so results are cached under (meeting_id, model_version, snapshot_version) and stale entries
+are never served; they are simply no longer asked for and age out. Entries are also
+evicted least recently used once the cache holds `max_entries` results or `max_bytes`
+of them, and expire after `ttl` seconds, which bounds how long a change the key does not
+cover (enrollment changes, or participation in the users' other classes when there is no
+feature store) can go unnoticed.
+
+    cache = PredictionCache(max_entries=256, max_bytes=64 * 2**20, ttl=900)
+    key = (meeting_id, model_version, snapshot_version(cnx, class_id))
+    results_df = cache.get_or_compute(key, lambda: predict_meeting(...))
+    cache.stats()      # hits, misses, hit_rate, saved_seconds, entries, bytes, evictions
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_TTL_SECONDS = 900.0
+
+# Participation rows of a class; COUNT catches deleted rows that MAX(id) alone would miss.
+CLASS_PARTICIPATION_QUERY = """
+SELECT COUNT(pm.id) AS n, MAX(pm.id) AS last_id
+FROM participation_meetings pm
+JOIN meetings m ON pm.id_meeting = m.id
+WHERE m.id_classe = %s
+"""
+
+
+def snapshot_version(cnx, class_id, store_path=None):
+    """
+    Version of the data a prediction for a meeting of `class_id` is computed from, as a
+    tuple: (participation count, highest participation id) of the class, plus the feature
+    store's (last meeting id, last participation id) when the store (default: the
+    feature store's default path) has been built.
+    """
+    # feature_store imports pandas; imported here so the app only pays for it once it predicts.
+    from feature_store import DEFAULT_STORE_PATH, open_store_if_present
+
+    rows, _ = cnx.query(CLASS_PARTICIPATION_QUERY, (int(class_id),))
+    count, last_id = rows[0] if rows else (0, None)
+    version = (int(count or 0), int(last_id or 0))
+    store = open_store_if_present(store_path or DEFAULT_STORE_PATH)
+    if store is not None:
+        try:
+            version += (store.get_state('last_meeting_id'), store.get_state('last_participation_id'))
+        finally:
+            store.close()
+    return version
+
+
+def result_size(value):
+    """Approximate size in bytes of a cached result (DataFrame, array or other object)."""
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with a TTL and entry/byte bounds, counting hits, misses and saved time."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS,
+                 sizeof=result_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        # key -> (value, size in bytes, seconds it took to compute, expiry time)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """The cached value, or None if it is missing or expired. Counts a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0]
+
+    def put(self, key, value, compute_seconds=0.0):
+        """Stores a value, evicting least recently used entries beyond the bounds."""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, compute_seconds, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """The cached value for `key`, or compute(), timed and stored, on a miss."""
+        value = self.get(key)
+        if value is None:
+            start = time.perf_counter()
+            value = compute()
+            if value is not None:
+                self.put(key, value, time.perf_counter() - start)
+        return value
+
+    def invalidate(self, meeting_id=None):
+        """Drops the entries of one meeting, or all entries. Returns the number dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if meeting_id is None or key[0] == meeting_id]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'saved_seconds': round(self.saved_seconds, 3),
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from instrumentation import span
+from model_registry import DEFAULT_REGISTRY, HotModel, open_registry_if_present
+from predict_from_json import BINARY, DEFAULT_MODEL_PATH, JSON, load_predictor, predict_payload
+from wire_format import PREDICTIONS_CONTENT_TYPE
+
+# --- CONFIG ---
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_SOCKET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction.sock')
+
+
+class PredictionService:
+    """
+    Holds the model in memory for the lifetime of the worker so each request only
+    pays for inference, not for importing pandas/scikit-learn and unpickling the forest.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, registry=None):
+        self.model_path = model_path
+        # With a registry, the model follows its "current" pointer and is swapped in place
+        # when a new version is published; otherwise model_path is loaded once.
+        self.hot_model = HotModel(registry, loader=load_predictor) if registry else None
+        self.model = None if registry else load_predictor(model_path)
+        # sklearn estimators are not guaranteed thread-safe for concurrent predict calls
+        # on the same instance, so requests are serialized on the model.
+        self._lock = threading.Lock()
+
+    def handle(self, payload, response_format=None):
+        """
+        Returns the response for a JSON or binary request, using the stdin/stdout contract:
+        in `response_format` if given, else in the request's format. Errors are always JSON.
+        """
+        try:
+            with span('server.predict') as request_span:
+                model, version = self.hot_model.get() if self.hot_model else (self.model, None)
+                request_span.set(model_version=version)
+                with span('server.wait_for_model'):
+                    self._lock.acquire()
+                try:
+                    return predict_payload(model, payload, response_format)
+                finally:
+                    self._lock.release()
+        except Exception as e:
+            return json.dumps({"error": True, "message": f"Error in Python prediction server: {str(e)}"})
+
+    def describe(self):
+        if self.hot_model:
+            return {"registry": self.hot_model.registry.root, "version": self.hot_model.get()[1]}
+        return {"model": self.model_path}
+
+
+# --- Localhost HTTP transport ---
+class PredictionHTTPHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_error(404)
+            return
+        self._respond(200, json.dumps({"status": "ok", **self.service.describe()}))
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length)
+        # Binary requests are recognized by their magic bytes whatever the Content-Type says.
+        body = self.service.handle(payload, self._response_format())
+        if isinstance(body, bytes):
+            self._respond(200, body, PREDICTIONS_CONTENT_TYPE)
+        else:
+            self._respond(500 if body.startswith('{"error"') else 200, body)
+
+    def _response_format(self):
+        """The format named by the Accept header, or None to answer in the request's format."""
+        accept = self.headers.get('Accept', '')
+        if PREDICTIONS_CONTENT_TYPE in accept:
+            return BINARY
+        if 'application/json' in accept:
+            return JSON
+        return None
+
+    def _respond(self, status, body, content_type='application/json'):
+        encoded = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        # Keep stdout quiet; access logs are not useful for a loopback worker.
+        pass
+
+
+# --- Unix socket transport ---
+class PredictionSocketHandler(socketserver.StreamRequestHandler):
+    """
+    One request per connection: the client writes the JSON or binary payload and shuts
+    down its write side, the server answers in the same format and closes the connection.
+    """
+    service = None
+
+    def handle(self):
+        body = self.service.handle(self.rfile.read())
+        self.wfile.write(body if isinstance(body, bytes) else body.encode('utf-8'))
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def build_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """Creates (but does not start) an HTTP server, or a Unix socket server if socket_path is given."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        handler = type('BoundSocketHandler', (PredictionSocketHandler,), {'service': service})
+        return ThreadingUnixServer(socket_path, handler)
+
+    handler = type('BoundHTTPHandler', (PredictionHTTPHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived attendance prediction worker.")
+    parser.add_argument('--model', help="Pickled model or model artifact directory to serve instead of the registry.")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY,
+                        help="Model registry to serve the current version of, with hot reloading (default: %(default)s).")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', nargs='?', const=DEFAULT_SOCKET, default=None,
+                        help="Serve over a Unix socket instead of HTTP (default path: %(const)s).")
+    parser.add_argument('--stdin', action='store_true',
+                        help="Fallback mode: answer a single request on stdin/stdout, like predict_from_json.py.")
+    args = parser.parse_args(argv)
+
+    if args.stdin:
+        from predict_from_json import main as stdin_main
+        stdin_main(args.model, args.registry)
+        return
+
+    registry = None if args.model else open_registry_if_present(args.registry)
+    service = PredictionService(args.model or DEFAULT_MODEL_PATH, registry)
+    server = build_server(service, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"-> Prediction server listening on {where}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Leakage-free rolling attendance history, computed in one sort-and-scan.
+
+features.attendance_history() averages presence over *all* of a user's rows, so every
+training row sees its own label and its future. Here each row only sees the rows of the
+same user that come before it in (user_id, scheduled_day, meeting_id) order:
+
+    user_attendance_rate   expanding rate over all prior rows (default rate without any)
+    user_total_meetings    number of prior rows
+    rate_last_5            rate over the last 5 prior rows
+    rate_last_20           rate over the last 20 prior rows
+    rate_last_30d          rate over prior rows dated at most 30 days before scheduled_day
+
+The rows are sorted once (O(n log n)); every feature is then a difference of
+one cumulative sum of presence between the row and the start of its window, found by
+index arithmetic (last-k windows) or a single searchsorted (day window). Rows without a
+scheduled day sort after the dated rows of their user and only get the count-based
+features (their 30-day rate falls back to the default).
+
+RollingState keeps, per user, the totals and the tail of rows that later windows can still
+see, so the same scan can score newly arrived meetings without rescanning the history:
+
+    state = RollingState()
+    features = state.update(user_ids, days, meeting_ids, presence)   # repeated per batch
+
+New rows must come after the rows already in the state for each user.
+"""
+import numpy as np
+
+from features import DEFAULT_ATTENDANCE_RATE
+
+LAST_K_WINDOWS = (5, 20)
+DAY_WINDOW = 30
+
+HISTORY_COLUMNS = ('user_attendance_rate', 'user_total_meetings',
+                   *(f'rate_last_{k}' for k in LAST_K_WINDOWS), f'rate_last_{DAY_WINDOW}d')
+
+# Sort key for rows without a scheduled day: after every real day.
+NO_DAY = np.iinfo(np.int64).max // 4
+
+
+def to_day_numbers(days):
+    """Days since the epoch as int64 (datetime64/date/ISO strings accepted), NO_DAY when missing."""
+    arr = np.asarray(days)
+    if arr.dtype.kind in 'iu':
+        return arr.astype(np.int64)
+    try:
+        arr = arr.astype('datetime64[D]')
+    except ValueError:
+        # Object columns from the database may hold NaN for a missing day.
+        arr = np.array([None if value != value else value for value in arr], dtype=object).astype('datetime64[D]')
+    numbers = arr.astype(np.int64)
+    numbers[np.isnat(arr)] = NO_DAY
+    return numbers
+
+
+def _rate(attended, count, default_rate):
+    out = np.full(len(count), default_rate, dtype=np.float64)
+    seen = count > 0
+    out[seen] = attended[seen] / count[seen]
+    return out
+
+
+def _span(values):
+    return int(values.max()) - int(values.min()) + 1 if len(values) else 1
+
+
+def _sort_order(user_ids, day_numbers, meeting_ids):
+    """
+    Row order by (user, day, meeting). When the three ranges fit in 63 bits they are packed
+    into one int64 key, whose single argsort is several times faster than np.lexsort.
+    """
+    dated = day_numbers != NO_DAY
+    day_min = day_numbers[dated].min() if dated.any() else 0
+    day_span = _span(day_numbers[dated]) + 1   # one more slot for undated rows
+    meeting_span = _span(meeting_ids)
+    if _span(user_ids) * day_span * meeting_span >= 2 ** 63:
+        return np.lexsort((meeting_ids, day_numbers, user_ids))
+    day_slot = np.where(dated, day_numbers - day_min, day_span - 1)
+    key = (user_ids - user_ids.min()) * day_span + day_slot
+    key *= meeting_span
+    key += meeting_ids - meeting_ids.min()
+    return np.argsort(key, kind='stable')
+
+
+def _scan(user_ids, day_numbers, meeting_ids, presence, base_count=None, base_sum=None,
+          default_rate=DEFAULT_ATTENDANCE_RATE):
+    """
+    Core sort-and-scan. base_count / base_sum are per-row offsets added to the expanding
+    count and sum (history that is no longer present as rows). Returns (order, columns)
+    where columns are in sorted order.
+    """
+    order = _sort_order(user_ids, day_numbers, meeting_ids)
+    users = user_ids[order]
+    days = day_numbers[order]
+    attended = presence[order].astype(np.int64)
+    n = len(order)
+
+    idx = np.arange(n, dtype=np.int64)
+    new_user = np.ones(n, dtype=bool)
+    new_user[1:] = users[1:] != users[:-1]
+    user_start = np.maximum.accumulate(np.where(new_user, idx, 0))
+    cs = np.concatenate(([0], np.cumsum(attended)))
+
+    count = idx - user_start
+    total = cs[idx] - cs[user_start]
+    if base_count is not None:
+        count = count + base_count[order]
+        total = total + base_sum[order]
+
+    columns = {
+        'user_attendance_rate': _rate(total, count, default_rate),
+        'user_total_meetings': count,
+    }
+    for k in LAST_K_WINDOWS:
+        start = np.maximum(user_start, idx - k)
+        columns[f'rate_last_{k}'] = _rate(cs[idx] - cs[start], idx - start, default_rate)
+
+    # Day window: the first row of the same user whose day is >= day - DAY_WINDOW. Rows are
+    # sorted by (user, day), so one searchsorted over a combined (user rank, day) key finds it.
+    user_rank = np.cumsum(new_user) - 1
+    dated = days != NO_DAY
+    day_min, day_max = (days[dated].min(), days[dated].max()) if dated.any() else (0, 0)
+    # Offsets keep day - DAY_WINDOW inside the user's key range; undated rows go last.
+    rel_days = np.where(dated, days - day_min + DAY_WINDOW, day_max - day_min + DAY_WINDOW + 1)
+    key = user_rank * (day_max - day_min + DAY_WINDOW + 2) + rel_days
+    window_start = np.searchsorted(key, key - DAY_WINDOW, side='left')
+    window_start = np.maximum(window_start, user_start)
+    in_window = np.where(dated, idx - window_start, 0)
+    columns[f'rate_last_{DAY_WINDOW}d'] = _rate(cs[idx] - cs[idx - in_window], in_window, default_rate)
+    return order, columns
+
+
+def _unsort(order, columns):
+    out = {}
+    for name, values in columns.items():
+        restored = np.empty_like(values)
+        restored[order] = values
+        out[name] = restored
+    return out
+
+
+def _as_arrays(user_ids, days, meeting_ids, presence):
+    return (np.asarray(user_ids, dtype=np.int64), to_day_numbers(days),
+            np.asarray(meeting_ids, dtype=np.int64), np.asarray(presence, dtype=np.int64))
+
+
+def rolling_history(user_ids, days, meeting_ids, presence, default_rate=DEFAULT_ATTENDANCE_RATE):
+    """Leakage-free history features (HISTORY_COLUMNS) for every row, in input order."""
+    user_ids, day_numbers, meeting_ids, presence = _as_arrays(user_ids, days, meeting_ids, presence)
+    order, columns = _scan(user_ids, day_numbers, meeting_ids, presence, default_rate=default_rate)
+    return _unsort(order, columns)
+
+
+class RollingState:
+    """
+    Running per-user history for incremental updates.
+
+    users / counts / sums hold each user's totals, and the tail_* arrays hold the last rows
+    of each user that a future window can still reach: the last max(LAST_K_WINDOWS) rows
+    plus the rows within DAY_WINDOW days of the user's latest day.
+    """
+
+    def __init__(self, default_rate=DEFAULT_ATTENDANCE_RATE):
+        self.default_rate = default_rate
+        self.users = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.sums = np.empty(0, dtype=np.int64)
+        self.tail_users = np.empty(0, dtype=np.int64)
+        self.tail_days = np.empty(0, dtype=np.int64)
+        self.tail_meetings = np.empty(0, dtype=np.int64)
+        self.tail_presence = np.empty(0, dtype=np.int64)
+
+    def _lookup(self, keys, values):
+        pos = np.searchsorted(self.users, keys)
+        pos = np.minimum(pos, max(len(self.users) - 1, 0))
+        found = (self.users[pos] == keys) if len(self.users) else np.zeros(len(keys), dtype=bool)
+        return np.where(found, values[pos] if len(values) else 0, 0)
+
+    def update(self, user_ids, days, meeting_ids, presence):
+        """Features (HISTORY_COLUMNS, input order) for new rows, then folds them into the state."""
+        user_ids, day_numbers, meeting_ids, presence = _as_arrays(user_ids, days, meeting_ids, presence)
+        n_new = len(user_ids)
+
+        # Context: the stored tails of the users in this batch, scanned together with the new rows.
+        context = np.isin(self.tail_users, user_ids)
+        all_users = np.concatenate((self.tail_users[context], user_ids))
+        all_days = np.concatenate((self.tail_days[context], day_numbers))
+        all_meetings = np.concatenate((self.tail_meetings[context], meeting_ids))
+        all_presence = np.concatenate((self.tail_presence[context], presence))
+        is_new = np.concatenate((np.zeros(context.sum(), dtype=bool), np.ones(n_new, dtype=bool)))
+
+        # History older than the tails is only known through the totals.
+        tail_count = np.bincount(np.searchsorted(self.users, self.tail_users[context]), minlength=len(self.users))
+        tail_sum = np.bincount(np.searchsorted(self.users, self.tail_users[context]),
+                               weights=self.tail_presence[context], minlength=len(self.users)).astype(np.int64)
+        base_count = self._lookup(all_users, self.counts - tail_count)
+        base_sum = self._lookup(all_users, self.sums - tail_sum)
+
+        order, columns = _scan(all_users, all_days, all_meetings, all_presence, base_count, base_sum, self.default_rate)
+        columns = _unsort(order, columns)
+        result = {name: values[is_new] for name, values in columns.items()}
+
+        self._fold(all_users[order], all_days[order], all_meetings[order], all_presence[order],
+                   user_ids, presence, context)
+        return result
+
+    def _fold(self, users, days, meetings, presence, new_users, new_presence, context):
+        if len(new_users) == 0:
+            return
+        # Totals.
+        merged = np.union1d(self.users, new_users)
+        counts = np.zeros(len(merged), dtype=np.int64)
+        sums = np.zeros(len(merged), dtype=np.int64)
+        counts[np.searchsorted(merged, self.users)] += self.counts
+        sums[np.searchsorted(merged, self.users)] += self.sums
+        np.add.at(counts, np.searchsorted(merged, new_users), 1)
+        np.add.at(sums, np.searchsorted(merged, new_users), new_presence)
+        self.users, self.counts, self.sums = merged, counts, sums
+
+        # Tails of the users in this batch, from their sorted rows (old tail + new rows).
+        n = len(users)
+        idx = np.arange(n)
+        new_user = np.ones(n, dtype=bool)
+        new_user[1:] = users[1:] != users[:-1]
+        user_end = np.empty(n, dtype=np.int64)
+        ends = np.flatnonzero(np.append(new_user[1:], True))
+        user_end[:] = np.repeat(ends, np.diff(np.concatenate(([-1], ends))))
+        dated_days = np.where(days != NO_DAY, days, np.iinfo(np.int64).min)
+        last_day = np.maximum.reduceat(dated_days, np.flatnonzero(new_user)) if n else dated_days
+        last_day = np.repeat(last_day, np.diff(np.append(np.flatnonzero(new_user), n)))
+        keep = (user_end - idx < max(LAST_K_WINDOWS)) | ((days != NO_DAY) & (days >= last_day - DAY_WINDOW))
+
+        others = ~context
+        self.tail_users = np.concatenate((self.tail_users[others], users[keep]))
+        self.tail_days = np.concatenate((self.tail_days[others], days[keep]))
+        self.tail_meetings = np.concatenate((self.tail_meetings[others], meetings[keep]))
+        self.tail_presence = np.concatenate((self.tail_presence[others], presence[keep]))
+
+    def save(self, path):
+        np.savez(path, users=self.users, counts=self.counts, sums=self.sums, tail_users=self.tail_users,
+                 tail_days=self.tail_days, tail_meetings=self.tail_meetings, tail_presence=self.tail_presence)
+
+    @classmethod
+    def load(cls, path, default_rate=DEFAULT_ATTENDANCE_RATE):
+        state = cls(default_rate)
+        with np.load(path, allow_pickle=False) as data:
+            for name in ('users', 'counts', 'sums', 'tail_users', 'tail_days', 'tail_meetings', 'tail_presence'):
+                setattr(state, name, data[name])
+        return state
@@ -0,0 +1,63 @@
+"""
+Base of the SQLite side stores next to these scripts (feature_store.py, meeting_stats.py,
+at_risk.py).
+
+Each store is one SQLite file with its own tables and a store_state (key, value) table.
+Only the job that fills a store creates the file and its schema; everything else opens it
+with read_only=True, which raises on a missing file instead of leaving an empty one behind.
+A store counts as built once that job has recorded its BUILT_KEY state, so an empty or
+half-created file is treated like a missing one and readers keep using the live queries:
+
+    store = FeatureStore.open_if_built(path)     # None until a refresh has run
+    if store is None:
+        ...                                      # live query
+"""
+import os
+import pathlib
+import sqlite3
+
+
+class SqliteStore:
+    """A SQLite file holding SCHEMA (which includes store_state); subclasses set SCHEMA and BUILT_KEY."""
+
+    SCHEMA = ''
+    # store_state key recorded by the job that fills the store.
+    BUILT_KEY = None
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            self.conn = sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def open_if_built(cls, path):
+        """The store at path opened read-only if it has been built, else None."""
+        if not os.path.exists(path):
+            return None
+        store = cls(path, read_only=True)
+        if not store.is_built():
+            store.close()
+            return None
+        return store
+
+    def close(self):
+        self.conn.close()
+
+    def is_built(self):
+        try:
+            return self.get_state(self.BUILT_KEY) is not None
+        except sqlite3.OperationalError:  # no schema yet
+            return False
+
+    def get_state(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM store_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key, value):
+        self.conn.execute(
+            "INSERT INTO store_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
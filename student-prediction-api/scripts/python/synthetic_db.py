@@ -0,0 +1,263 @@
+"""
+Synthetic stand-in for the production schema, loaded into SQLite or written as MySQL SQL.
+
+Only the tables and columns the project queries are created: cours, classes,
+parcours_classes (class membership as a comma-separated `classes` list),
+parcour_group_pivot, meetings, participation_meetings and planning_cours_journaliers.
+SQLite is given FIND_IN_SET and IF so the MySQL queries in this directory run unchanged.
+
+Each user follows one parcours, each parcours bundles a few classes, and each class meets
+once a week at a fixed hour. Attendance is drawn per (user, meeting) from a user-specific
+propensity, shifted per class and drifting down slowly over the term. Rows are generated
+with NumPy and written in chunks, so memory stays flat from 1k to 1M users; --scale picks
+the users and derives proportional class and parcours counts (about 20 users per class
+slot, so a class has ~100 students and a user 60 meetings per 12-week term):
+
+    python synthetic_db.py synthetic.sqlite --users 5000 --classes 200
+    python synthetic_db.py synthetic_100k.sqlite --scale 100k
+    python synthetic_db.py synthetic_1m.sql --scale 1m --mysql     # then: mysql scratch_db < synthetic_1m.sql
+
+The MySQL dump only contains CREATE TABLE and INSERT statements (no DROP), so load it
+into an empty scratch database.
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE cours (
+    id INTEGER PRIMARY KEY,
+    id_matiere INTEGER
+);
+CREATE TABLE classes (
+    id INTEGER PRIMARY KEY,
+    id_cours INTEGER,
+    id_professeur INTEGER,
+    active TEXT
+);
+CREATE TABLE parcours_classes (
+    id INTEGER PRIMARY KEY,
+    classes TEXT
+);
+CREATE TABLE parcour_group_pivot (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    id_parcour_classes INTEGER
+);
+CREATE TABLE meetings (
+    id INTEGER PRIMARY KEY,
+    id_classe INTEGER,
+    titre_fr TEXT
+);
+CREATE TABLE participation_meetings (
+    id INTEGER PRIMARY KEY,
+    id_meeting INTEGER,
+    id_user INTEGER,
+    entree TEXT
+);
+CREATE TABLE planning_cours_journaliers (
+    id INTEGER PRIMARY KEY,
+    id_classe INTEGER,
+    day TEXT,
+    heure_from TEXT
+);
+"""
+
+# Created after the rows are loaded, which is several times faster than maintaining them.
+INDEXES = """
+CREATE INDEX idx_pgp_user ON parcour_group_pivot (user_id);
+CREATE INDEX idx_pgp_parcours ON parcour_group_pivot (id_parcour_classes);
+CREATE INDEX idx_meetings_classe ON meetings (id_classe);
+CREATE INDEX idx_pm_meeting_user ON participation_meetings (id_meeting, id_user);
+CREATE INDEX idx_pm_user ON participation_meetings (id_user);
+CREATE INDEX idx_pcj_classe_day ON planning_cours_journaliers (id_classe, day);
+"""
+
+MYSQL_SCHEMA = """
+CREATE TABLE cours (id INT PRIMARY KEY, id_matiere INT);
+CREATE TABLE classes (id INT PRIMARY KEY, id_cours INT, id_professeur INT, active CHAR(1));
+CREATE TABLE parcours_classes (id INT PRIMARY KEY, classes TEXT);
+CREATE TABLE parcour_group_pivot (id INT AUTO_INCREMENT PRIMARY KEY, user_id INT, id_parcour_classes INT,
+    KEY idx_pgp_user (user_id), KEY idx_pgp_parcours (id_parcour_classes));
+CREATE TABLE meetings (id INT PRIMARY KEY, id_classe INT, titre_fr VARCHAR(255), KEY idx_meetings_classe (id_classe));
+CREATE TABLE participation_meetings (id INT AUTO_INCREMENT PRIMARY KEY, id_meeting INT, id_user INT, entree DATETIME,
+    KEY idx_pm_meeting_user (id_meeting, id_user), KEY idx_pm_user (id_user));
+CREATE TABLE planning_cours_journaliers (id INT AUTO_INCREMENT PRIMARY KEY, id_classe INT, day DATE, heure_from TIME,
+    KEY idx_pcj_classe_day (id_classe, day));
+"""
+
+# --scale presets (users); classes and parcours follow USERS_PER_CLASS / USERS_PER_PARCOURS.
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+USERS_PER_CLASS = 20
+USERS_PER_PARCOURS = 50
+
+# Rows per INSERT batch.
+CHUNK_ROWS = 100_000
+MYSQL_ROWS_PER_STATEMENT = 1_000
+
+# Attendance model: per-user propensity ~ N(rate, USER_SD), plus a per-class shift
+# ~ N(0, CLASS_SD), minus WEEKLY_DRIFT per week of the term.
+USER_SD = 0.15
+CLASS_SD = 0.05
+WEEKLY_DRIFT = 0.005
+
+
+def _find_in_set(needle, haystack):
+    """MySQL FIND_IN_SET: 1-based position of needle in a comma-separated list, 0 if absent."""
+    if needle is None or haystack is None:
+        return None
+    try:
+        return str(haystack).split(',').index(str(needle)) + 1
+    except ValueError:
+        return 0
+
+
+def connect_sqlite(path=':memory:'):
+    """Opens a SQLite database with the MySQL functions used by the project's queries."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.create_function('FIND_IN_SET', 2, _find_in_set, deterministic=True)
+    conn.create_function('IF', 3, lambda cond, a, b: a if cond else b, deterministic=True)
+    return conn
+
+
+def scale_counts(n_users):
+    """(classes, parcours) for n_users at the preset proportions."""
+    return max(1, n_users // USERS_PER_CLASS), max(1, n_users // USERS_PER_PARCOURS)
+
+
+def _chunks(columns, chunk_rows=CHUNK_ROWS):
+    """Row tuples from equal-length column arrays, in lists of at most chunk_rows."""
+    n = len(columns[0])
+    for start in range(0, n, chunk_rows):
+        yield list(zip(*(column[start:start + chunk_rows].tolist() for column in columns)))
+
+
+def generate_rows(n_users=1000, n_classes=50, n_parcours=20, classes_per_parcours=5,
+                  meetings_per_class=12, attendance_rate=0.7, start_day=datetime.date(2025, 1, 6), seed=42):
+    """
+    Yields (table, column names, list of row tuples) chunks for the whole database, in
+    insertion order: reference tables first, then participation week by week.
+    """
+    rng = np.random.default_rng(seed)
+
+    n_cours = max(1, n_classes // 2)
+    class_ids = np.arange(1, n_classes + 1)
+    yield from (('cours', ('id', 'id_matiere'), rows)
+                for rows in _chunks([np.arange(1, n_cours + 1), rng.integers(1, 21, n_cours)]))
+    active = np.where(rng.random(n_classes) < 0.95, 'Y', 'N')
+    yield from (('classes', ('id', 'id_cours', 'id_professeur', 'active'), rows)
+                for rows in _chunks([class_ids, rng.integers(1, n_cours + 1, n_classes),
+                                     rng.integers(1, max(1, n_classes // 3) + 1, n_classes), active]))
+
+    per_parcours = min(classes_per_parcours, n_classes)
+    parcours = np.stack([rng.choice(class_ids, per_parcours, replace=False) for _ in range(n_parcours)])
+    yield from (('parcours_classes', ('id', 'classes'), rows)
+                for rows in _chunks([np.arange(1, n_parcours + 1), np.array([','.join(map(str, c)) for c in parcours.tolist()])]))
+
+    user_ids = np.arange(1, n_users + 1)
+    user_parcours = rng.integers(1, n_parcours + 1, n_users)
+    yield from (('parcour_group_pivot', ('user_id', 'id_parcour_classes'), rows)
+                for rows in _chunks([user_ids, user_parcours]))
+
+    # One meeting per class and week; the planning row gives its day and hour.
+    week_offsets = np.arange(meetings_per_class) * 7
+    day_offsets = (week_offsets[:, None] + class_ids[None, :] % 5).ravel()
+    days = np.datetime64(start_day) + day_offsets
+    hours = np.tile(8 + class_ids % 10, meetings_per_class)
+    meeting_ids = np.arange(1, meetings_per_class * n_classes + 1)
+    meeting_classes = np.tile(class_ids, meetings_per_class)
+    titles = np.char.add(np.char.add(np.char.add('Class ', meeting_classes.astype(str)), ' - week '),
+                         np.repeat(np.arange(1, meetings_per_class + 1), n_classes).astype(str))
+    yield from (('meetings', ('id', 'id_classe', 'titre_fr'), rows)
+                for rows in _chunks([meeting_ids, meeting_classes, titles]))
+    hour_strings = np.char.add(np.char.zfill(hours.astype(str), 2), ':00:00')
+    yield from (('planning_cours_journaliers', ('id_classe', 'day', 'heure_from'), rows)
+                for rows in _chunks([meeting_classes, days.astype(str), hour_strings]))
+    entrees = np.char.add(np.char.add(days.astype(str), ' '), np.char.add(np.char.zfill(hours.astype(str), 2), ':05:00'))
+
+    # (user, class) enrollment pairs, ordered by class then user.
+    pair_users = np.repeat(user_ids, per_parcours)
+    pair_classes = parcours[user_parcours - 1].ravel()
+    order = np.lexsort((pair_users, pair_classes))
+    pair_users, pair_classes = pair_users[order], pair_classes[order]
+    propensity = rng.normal(attendance_rate, USER_SD, n_users)
+    class_shift = rng.normal(0.0, CLASS_SD, n_classes)
+    pair_propensity = propensity[pair_users - 1] + class_shift[pair_classes - 1]
+
+    for week in range(meetings_per_class):
+        p = np.clip(pair_propensity - WEEKLY_DRIFT * week, 0.01, 0.99)
+        present = rng.random(len(p)) < p
+        meeting_index = week * n_classes + pair_classes[present] - 1
+        yield from (('participation_meetings', ('id_meeting', 'id_user', 'entree'), rows)
+                    for rows in _chunks([meeting_ids[meeting_index], pair_users[present], entrees[meeting_index]]))
+
+
+def generate(conn, n_users=1000, n_classes=50, n_parcours=20, classes_per_parcours=5,
+             meetings_per_class=12, attendance_rate=0.7, start_day=datetime.date(2025, 1, 6), seed=42):
+    """Fills an empty SQLite database (see generate_rows for the parameters) and returns it."""
+    conn.executescript(SCHEMA)
+    for table, columns, rows in generate_rows(n_users, n_classes, n_parcours, classes_per_parcours,
+                                              meetings_per_class, attendance_rate, start_day, seed):
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+    conn.executescript(INDEXES)
+    conn.commit()
+    return conn
+
+
+def _sql_value(value):
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "''") + "'"
+    return str(value)
+
+
+def write_mysql_dump(f, **params):
+    """Writes the database as MySQL CREATE TABLE and multi-row INSERT statements to the text file f."""
+    f.write("SET autocommit = 0, unique_checks = 0, foreign_key_checks = 0;\n")
+    f.write(MYSQL_SCHEMA.lstrip())
+    for table, columns, rows in generate_rows(**params):
+        prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+        for start in range(0, len(rows), MYSQL_ROWS_PER_STATEMENT):
+            batch = rows[start:start + MYSQL_ROWS_PER_STATEMENT]
+            f.write(prefix + ',\n'.join('(' + ', '.join(map(_sql_value, row)) + ')' for row in batch) + ";\n")
+    f.write("COMMIT;\nSET unique_checks = 1, foreign_key_checks = 1;\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="SQLite file (or, with --mysql, SQL file) to create (must not exist).")
+    parser.add_argument('--scale', choices=list(SCALES), help="Preset user count; classes and parcours scale with it.")
+    parser.add_argument('--users', type=int, help="Number of users (default 1000).")
+    parser.add_argument('--classes', type=int, help=f"Number of classes (default users / {USERS_PER_CLASS}).")
+    parser.add_argument('--parcours', type=int, help=f"Number of parcours (default users / {USERS_PER_PARCOURS}).")
+    parser.add_argument('--meetings-per-class', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mysql', action='store_true', help="Write MySQL-compatible SQL instead of a SQLite database.")
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    n_users = args.users or SCALES.get(args.scale, 1000)
+    n_classes, n_parcours = scale_counts(n_users)
+    params = dict(n_users=n_users, n_classes=args.classes or n_classes, n_parcours=args.parcours or n_parcours,
+                  meetings_per_class=args.meetings_per_class, seed=args.seed)
+    print(f"-> {params['n_users']:,} users, {params['n_classes']:,} classes, {params['n_parcours']:,} parcours, "
+          f"{args.meetings_per_class} meetings per class")
+
+    if args.mysql:
+        with open(args.path, 'w') as f:
+            write_mysql_dump(f, **params)
+    else:
+        conn = connect_sqlite(args.path)
+        # Bulk load: no rollback journal or fsync until the file is complete.
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        generate(conn, **params)
+        conn.close()
+    print(f"-> Synthetic database written to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Shared fixtures of the checks in this directory; run them from scripts/python with
+
+    python -m pytest tests
+
+The database fixtures are small SQLite copies of the schema filled by synthetic_db.py;
+the in-memory data builders are in helpers.py.
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+from synthetic_db import connect_sqlite, generate  # noqa: E402
+
+SYNTHETIC_PARAMS = {'n_users': 200, 'n_classes': 10, 'n_parcours': 5, 'meetings_per_class': 6}
+
+
+@pytest.fixture(scope='session')
+def synthetic_template(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('synthetic') / 'synthetic.sqlite')
+    generate(connect_sqlite(path), **SYNTHETIC_PARAMS).close()
+    return path
+
+
+@pytest.fixture
+def synthetic_path(synthetic_template, tmp_path):
+    """A fresh copy of the synthetic database, free to modify."""
+    path = str(tmp_path / 'source.sqlite')
+    shutil.copyfile(synthetic_template, path)
+    return path
+
+
+@pytest.fixture
+def source(synthetic_path):
+    """A pooled connection on synthetic_path, as the store refreshes take it."""
+    database = Database.sqlite(synthetic_path, size=1)
+    with database.connection() as cnx:
+        yield cnx
+    database.close()
+
+
+@pytest.fixture
+def late_participation_id(source):
+    """A participation id halfway through the rows of meetings 31-40, so part of them arrive late."""
+    rows, _ = source.query("SELECT id FROM participation_meetings WHERE id_meeting BETWEEN 31 AND 40 ORDER BY id")
+    return rows[len(rows) // 2][0]
+
+
+@pytest.fixture
+def hold_back(synthetic_path):
+    """
+    hold_back(last_meeting_id, last_participation_id) removes the meetings and participation
+    rows above those ids from synthetic_path and returns a function that puts them back, as
+    if they had been recorded since.
+    """
+    def hold(last_meeting_id, last_participation_id):
+        conn = connect_sqlite(synthetic_path)
+        meetings = conn.execute("SELECT * FROM meetings WHERE id > ?", (last_meeting_id,)).fetchall()
+        participation = conn.execute("SELECT * FROM participation_meetings WHERE id > ?",
+                                     (last_participation_id,)).fetchall()
+        conn.execute("DELETE FROM meetings WHERE id > ?", (last_meeting_id,))
+        conn.execute("DELETE FROM participation_meetings WHERE id > ?", (last_participation_id,))
+        conn.commit()
+        conn.close()
+
+        def restore():
+            conn = connect_sqlite(synthetic_path)
+            conn.executemany("INSERT INTO meetings VALUES (?, ?, ?)", meetings)
+            conn.executemany("INSERT INTO participation_meetings VALUES (?, ?, ?, ?)", participation)
+            conn.commit()
+            conn.close()
+
+        return restore
+
+    return hold
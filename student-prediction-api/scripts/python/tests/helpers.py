@@ -0,0 +1,93 @@
+"""
+Data builders of the checks in this directory. They are kept here rather than imported from
+the bench_*.py scripts, so that tuning a benchmark never changes what a test asserts.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+from rolling_history import DAY_WINDOW, HISTORY_COLUMNS, LAST_K_WINDOWS
+
+
+def extract_rows(n, seed=0):
+    """Raw extract-shaped rows: ids, a DATE, a TIME (as timedelta64, like pd.read_sql returns) and presence."""
+    rng = np.random.default_rng(seed)
+    days = np.datetime64('2025-01-06') + rng.integers(0, 120, n).astype('timedelta64[D]')
+    hours = (rng.integers(8, 19, n) * 3600 + rng.integers(0, 4, n) * 900).astype('timedelta64[s]')
+    df = pd.DataFrame({
+        'user_id': rng.integers(1, n // 40 + 2, n),
+        'class_id': rng.integers(1, 500, n),
+        'course_id': rng.integers(1, 200, n),
+        'id_professeur': rng.integers(1, 100, n),
+        'id_matiere': rng.integers(1, 50, n),
+        'scheduled_day': days,
+        'scheduled_hour': hours,
+        'presence': (rng.random(n) < 0.7).astype(np.int64),
+    })
+    # Some meetings have no linked schedule.
+    missing = rng.random(n) < 0.05
+    df.loc[missing, 'scheduled_day'] = pd.NaT
+    df.loc[missing, 'scheduled_hour'] = pd.NaT
+    return df
+
+
+def request_records(n_users, seed=0):
+    """PredictionController-shaped request records for one meeting of n_users."""
+    rng = random.Random(seed)
+    class_id, course_id = rng.randint(1, 500), rng.randint(1, 200)
+    matiere, professeur = rng.randint(1, 50), rng.randint(1, 100)
+    weekday, hour = rng.randint(0, 6), rng.randint(8, 18)
+    return [
+        {
+            'user_id': 1000 + i,
+            'class_id': class_id,
+            'course_id': course_id,
+            'id_matiere': matiere,
+            'id_professeur': professeur,
+            'meeting_weekday': weekday,
+            'meeting_hour': hour,
+            'user_attendance_rate': rng.random(),
+            'user_total_meetings': rng.randint(0, 200),
+        }
+        for i in range(n_users)
+    ]
+
+
+def history_rows(n, seed=0, meetings_per_user=200, days=365):
+    """(user_ids, days as datetime64[D], meeting_ids, presence) with a per-user attendance propensity."""
+    rng = np.random.default_rng(seed)
+    n_users = max(n // meetings_per_user, 1)
+    user_ids = rng.integers(1, n_users + 1, n)
+    day = np.datetime64('2024-09-02') + rng.integers(0, days, n).astype('timedelta64[D]')
+    meeting_ids = rng.integers(1, n * 4, n)
+    propensity = rng.beta(5, 2, n_users + 1)
+    presence = (rng.random(n) < propensity[user_ids]).astype(np.int64)
+    return user_ids, day, meeting_ids, presence
+
+
+def pandas_history(user_ids, days, meeting_ids, presence, default_rate):
+    """The rolling_history features with groupby + shift + rolling, in input order."""
+    df = pd.DataFrame({'user_id': user_ids, 'day': days, 'meeting_id': meeting_ids, 'presence': presence})
+    df = df.sort_values(['user_id', 'day', 'meeting_id'], kind='stable')
+    by_user = df.groupby('user_id')['presence']
+    count = by_user.cumcount()
+    prior = by_user.cumsum() - df['presence']
+    out = pd.DataFrame(index=df.index)
+    out['user_attendance_rate'] = (prior / count.where(count > 0)).fillna(default_rate)
+    out['user_total_meetings'] = count
+    # df is sorted by user, so the groupby-rolling results come out in df's row order.
+    shifted = by_user.shift()
+    for k in LAST_K_WINDOWS:
+        rolled = shifted.groupby(df['user_id']).rolling(k, min_periods=1).mean()
+        out[f'rate_last_{k}'] = rolled.fillna(default_rate).to_numpy()
+    # Days in [day - DAY_WINDOW, day): exact when a user has at most one meeting per day.
+    rolled = df.groupby('user_id').rolling(f'{DAY_WINDOW}D', on='day', closed='left')['presence'].mean()
+    out[f'rate_last_{DAY_WINDOW}d'] = rolled.fillna(default_rate).to_numpy()
+    return out.sort_index()
+
+
+def assert_history_equal(expected, actual, label):
+    for name in HISTORY_COLUMNS:
+        np.testing.assert_allclose(np.asarray(actual[name], dtype=np.float64),
+                                   np.asarray(expected[name], dtype=np.float64), rtol=1e-9, err_msg=f"{label}: {name}")
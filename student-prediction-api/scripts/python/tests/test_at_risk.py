@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from at_risk import COLUMNS, combine
+
+# user_id, enrolled, attended, presence probabilities of the upcoming rows,
+# then the expected upcoming_meetings, expected_upcoming, projected_rate and rank.
+TABLE = [
+    (1, 10, 9, [0.9, 0.8], 2, 1.7, 1.0, 7),          # (9 + 1.7) / 10 is capped at 1
+    (2, 10, 5, [0.5], 1, 0.5, 0.55, 5),
+    (3, 4, 1, [], 0, 0.0, 0.25, 3),                  # no upcoming meetings: the historical rate
+    (4, 2, 1, [0.2, 0.2, 0.2], 3, 0.6, 1.6 / 3, 4),  # more upcoming than enrolled (a stale store)
+    (5, 10, 5, [0.5], 1, 0.5, 0.55, 6),              # ties with 2 on both rates: by user_id
+    (6, 20, 4, [], 0, 0.0, 0.2, 2),                  # ties with 7 on risk, higher historical rate
+    (7, 5, 0, [1.0], 1, 1.0, 0.2, 1),
+]
+
+
+def upcoming_rows(seed):
+    """The (user, probability) rows of TABLE in a shuffled order, plus rows of users without history."""
+    rows = [(user_id, proba) for user_id, _, _, probas, *_ in TABLE for proba in probas]
+    rows += [(99, 0.1), (0, 0.3), (99, 0.7)]
+    order = np.random.default_rng(seed).permutation(len(rows))
+    return [rows[i][0] for i in order], [rows[i][1] for i in order]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_combine(seed):
+    user_ids, enrolled, attended = (np.array([row[i] for row in TABLE], dtype=np.int64) for i in range(3))
+    columns = combine(user_ids, enrolled, attended, *upcoming_rows(seed))
+    assert sorted(columns) == sorted(COLUMNS)
+
+    for i, (user_id, n_enrolled, n_attended, _, upcoming, expected, projected, rank) in enumerate(TABLE):
+        assert columns['user_id'][i] == user_id
+        assert columns['upcoming_meetings'][i] == upcoming, user_id
+        assert columns['expected_upcoming'][i] == pytest.approx(expected), user_id
+        assert columns['overall_rate'][i] == n_attended / n_enrolled
+        assert columns['projected_rate'][i] == pytest.approx(projected), user_id
+        assert columns['risk_score'][i] == pytest.approx(1 - projected), user_id
+        assert columns['rank'][i] == rank, user_id
+
+
+def test_combine_without_upcoming_rows():
+    user_ids, enrolled, attended = np.array([3, 8]), np.array([4, 10]), np.array([3, 2])
+    columns = combine(user_ids, enrolled, attended, [], [])
+    assert columns['upcoming_meetings'].tolist() == [0, 0] and columns['expected_upcoming'].tolist() == [0.0, 0.0]
+    assert columns['projected_rate'].tolist() == columns['overall_rate'].tolist() == [0.75, 0.2]
+    assert columns['rank'].tolist() == [2, 1]
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from db import Database, connect
+
+
+@pytest.fixture
+def opened():
+    """The raw connections a pool opened, in order."""
+    return []
+
+
+@pytest.fixture
+def database(synthetic_path, opened):
+    def factory():
+        opened.append(connect(sqlite=synthetic_path))
+        return opened[-1]
+
+    database = Database(factory, size=2, timeout=0.05)
+    yield database
+    database.close()
+
+
+def test_pool_is_bounded_and_reuses_connections(database, opened):
+    with database.connection() as first, database.connection() as second:
+        assert first is not second
+        with pytest.raises(TimeoutError, match='pool size 2'):
+            with database.connection():
+                pass
+    # Released connections are reused, the last one released first; none is opened meanwhile.
+    with database.connection() as cnx:
+        assert cnx is first
+    with database.connection() as cnx, database.connection() as other:
+        assert {cnx, other} == {first, second}
+    assert len(opened) == 2
+
+
+def test_idle_connections_are_pinged_and_replaced_when_dropped(database, opened):
+    with database.connection() as first:
+        pass
+    database.ping_after = 0.0
+    with database.connection() as cnx:
+        assert cnx is first
+    # Closed while idle, as a server drops connections past wait_timeout.
+    first.raw.close()
+    with database.connection() as cnx:
+        assert cnx is not first and cnx.scalar("SELECT 1") == 1
+    assert len(opened) == 2
+
+
+def test_placeholders_are_rewritten_for_sqlite(database):
+    with database.connection() as cnx:
+        rows, columns = cnx.query("SELECT id FROM meetings WHERE id BETWEEN %s AND %s ORDER BY id", (3, 5))
+        assert rows == [(3,), (4,), (5,)] and columns == ['id']
+        cnx.execute("CREATE TABLE scratch (a INTEGER, b TEXT)")
+        cnx.executemany("INSERT INTO scratch VALUES (%s, %s)", [(1, 'x'), (2, 'y')])
+        assert cnx.execute("UPDATE scratch SET b = %s WHERE a = %s", ('z', 2)) == 1
+        assert cnx.query_df("SELECT a, b FROM scratch ORDER BY a").values.tolist() == [[1, 'x'], [2, 'z']]
+        assert cnx.scalar("SELECT b FROM scratch WHERE a = %s", (3,)) is None
+    assert any(row['label'].startswith("SELECT id FROM meetings WHERE id BETWEEN ? AND ?")
+               for row in database.stats.summary())
+
+
+def test_a_bad_query_keeps_the_connection(database, opened):
+    # sqlite3 raises ProgrammingError for a wrong number of bindings as for a closed connection.
+    with pytest.raises(sqlite3.ProgrammingError):
+        with database.connection() as cnx:
+            cnx.query("SELECT %s, %s", (1,))
+    assert not cnx.broken
+    with pytest.raises(sqlite3.ProgrammingError):
+        database.query_df("SELECT %s, %s", (1,))
+    with pytest.raises(sqlite3.ProgrammingError):
+        with database.connection() as same:
+            same.executemany("INSERT INTO meetings VALUES (%s, %s, %s)", [(1, 2)])
+    # Not retried, and the one connection stays in the pool.
+    assert same is cnx and not cnx.broken and len(opened) == 1
+
+
+def test_query_df_retries_once_on_a_fresh_connection(database, opened):
+    with database.connection() as first:
+        pass
+    # Closed while idle and handed out without a ping (it was used less than ping_after ago).
+    first.raw.close()
+    df = database.query_df("SELECT COUNT(*) AS n FROM meetings")
+    assert df['n'][0] > 0 and first.broken and len(opened) == 2
+
+    # A connection that fails again on the retry gives up.
+    def closed():
+        conn = connect(sqlite=':memory:')
+        conn.close()
+        return conn
+
+    database.close()
+    database.factory = closed
+    with pytest.raises(sqlite3.ProgrammingError):
+        database.query_df("SELECT 1")
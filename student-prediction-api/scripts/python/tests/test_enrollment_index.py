@@ -0,0 +1,97 @@
+import pytest
+
+import batch_predict
+import extract
+import feature_store
+import meeting_stats
+from enrollment_index import (FIND_IN_SET_JOIN, INDEXED_JOIN, EnrollmentIndex, build_side_tables, explode_parcours,
+                              parse_class_list, use_enrollment_index)
+from synthetic_db import _find_in_set, connect_sqlite
+
+ALL_IDS = ','.join(str(i) for i in range(1, 10 ** 4))
+
+# Every query that is switched over with use_enrollment_index, formatted to cover all rows.
+QUERIES = {
+    'extract.UNIFIED_QUERY': extract.UNIFIED_QUERY,
+    'meeting_stats.MEMBERS_QUERY': meeting_stats.MEMBERS_QUERY,
+    'batch_predict.ENROLLMENTS_QUERY': batch_predict.ENROLLMENTS_QUERY.replace('{class_ids}', ALL_IDS),
+    'batch_predict.HISTORY_QUERY': batch_predict.HISTORY_QUERY.replace('{user_ids}', ALL_IDS),
+    'feature_store.FULL_RECOMPUTE_QUERY': feature_store.FULL_RECOMPUTE_QUERY,
+    'feature_store.TOTALS_QUERY': feature_store.TOTALS_QUERY.format(lo=0, hi=10 ** 9),
+    'feature_store.ATTENDED_QUERY': feature_store.ATTENDED_QUERY.format(p_lo=0, p_hi=10 ** 9, m_lo=0, m_hi=10 ** 9),
+}
+
+# (classes, ids): FIND_IN_SET compares whole entries as strings, so padded, zero-prefixed
+# or signed entries match no id, and empty entries are skipped.
+CLASS_LISTS = [
+    ('1,2,3', [1, 2, 3]),
+    ('12', [12]),
+    ('', []),
+    (None, []),
+    ('1,,2', [1, 2]),
+    (',5,', [5]),
+    (' 12,13', [13]),
+    ('12 ,13', [13]),
+    ('012,7', [7]),
+    ('+4,4', [4]),
+    ('1.0,2', [2]),
+    ('a,9', [9]),
+    # One id per entry; explode_parcours drops the duplicates.
+    ('3,3,3', [3, 3, 3]),
+]
+
+
+@pytest.mark.parametrize('classes, ids', CLASS_LISTS)
+def test_parse_class_list_has_find_in_set_semantics(classes, ids):
+    assert parse_class_list(classes) == ids
+    assert set(ids) == {class_id for class_id in range(20) if _find_in_set(class_id, classes)}
+
+
+def test_use_enrollment_index_rewrites_the_join():
+    for name, query in QUERIES.items():
+        rewritten = use_enrollment_index(query)
+        assert FIND_IN_SET_JOIN in query and INDEXED_JOIN in rewritten, name
+        assert 'FIND_IN_SET' not in rewritten, name
+    with pytest.raises(ValueError):
+        use_enrollment_index("SELECT * FROM classes c WHERE FIND_IN_SET(c.id, '1,2')")
+
+
+@pytest.fixture
+def odd_lists(source, synthetic_path):
+    """
+    Gives two enrolled parcours class lists with duplicates, empty entries and padded ids,
+    then builds the side tables. Returns the class ids each list really holds.
+    """
+    rows, _ = source.query("SELECT DISTINCT id_parcour_classes FROM parcour_group_pivot ORDER BY id_parcour_classes")
+    first, second = rows[0][0], rows[1][0]
+    source.execute("UPDATE parcours_classes SET classes = %s WHERE id = %s", ('3,3,,1, 4,05,2 ', first))
+    source.execute("UPDATE parcours_classes SET classes = %s WHERE id = %s", (',6,,6,7,', second))
+    conn = connect_sqlite(synthetic_path)
+    build_side_tables(conn)
+    conn.close()
+    return {first: [1, 3], second: [6, 7]}
+
+
+def test_side_tables_follow_the_lists(source, odd_lists):
+    pairs, _ = source.query("SELECT parcours_class_id, class_id FROM enrollment_parcours_class ORDER BY 1, 2")
+    assert pairs == explode_parcours(source.raw)
+    for parcours_id, class_ids in odd_lists.items():
+        assert [class_id for pid, class_id in pairs if pid == parcours_id] == class_ids
+
+
+@pytest.mark.parametrize('name', sorted(QUERIES))
+def test_indexed_join_gives_the_same_rows(source, odd_lists, name):
+    expected = source.query_df(QUERIES[name])
+    indexed = source.query_df(use_enrollment_index(QUERIES[name]))
+    assert len(expected) > 0
+    assert sorted(map(tuple, expected.values.tolist())) == sorted(map(tuple, indexed.values.tolist()))
+
+
+def test_in_memory_index_matches_the_user_class_table(source, odd_lists):
+    rows, _ = source.query("SELECT user_id, class_id FROM enrollment_user_class ORDER BY user_id, class_id")
+    index = EnrollmentIndex.from_parcours(source.raw)
+    assert index.pairs().tolist() == [list(row) for row in rows]
+    user_id, class_id = rows[0]
+    assert class_id in index.classes_for_user(user_id).tolist()
+    assert user_id in index.users_for_class(class_id).tolist()
+    assert len(index.classes_for_user(-1)) == 0
@@ -0,0 +1,98 @@
+import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from db import Database
+from extract import (ACTIVE_CLASS_MEETINGS_QUERY, EXTRACT_DTYPES, EXTRACT_ORDER, UNIFIED_QUERY, class_partitions,
+                     compact_chunk, extract_partitioned, read_extract, sort_extract, stream_to_parquet)
+from synthetic_db import connect_sqlite
+
+
+def raw_chunk(**overrides):
+    """Two rows as a MySQL cursor returns them (a NULL professor, a DATE and a TIME)."""
+    columns = {
+        'user_id': [7, 3], 'class_id': [2, 2], 'course_id': [5, 5], 'id_professeur': [None, 11],
+        'id_matiere': [4, 4], 'meeting_id': [30, 31],
+        'scheduled_day': [datetime.date(2025, 1, 6), None],
+        'scheduled_hour': [datetime.timedelta(hours=9, minutes=30), None],
+        'presence': [1, 0],
+    }
+    columns.update(overrides)
+    return pd.DataFrame(columns)
+
+
+def test_compact_chunk_casts_to_the_extract_schema():
+    chunk = compact_chunk(raw_chunk())
+    for column, dtype in EXTRACT_DTYPES.items():
+        assert chunk[column].dtype == dtype, column
+    assert chunk['scheduled_day'].dtype == 'datetime64[s]'
+    assert chunk['scheduled_hour'].dtype == 'timedelta64[s]'
+    # A NULL foreign key stays missing instead of turning the column into float64.
+    assert chunk['id_professeur'].isna().tolist() == [True, False]
+    assert chunk['scheduled_day'].tolist()[0] == pd.Timestamp('2025-01-06') and pd.isna(chunk['scheduled_day'][1])
+    assert chunk['scheduled_hour'][0] == pd.Timedelta(hours=9, minutes=30) and pd.isna(chunk['scheduled_hour'][1])
+
+
+def test_compact_chunk_rejects_ids_beyond_uint32():
+    with pytest.raises(TypeError):
+        compact_chunk(raw_chunk(meeting_id=[30, 2 ** 32]))
+
+
+def test_sort_extract_orders_rows_and_resets_the_index():
+    df = pd.DataFrame({'class_id': [2, 1, 2, 1], 'meeting_id': [5, 9, 5, 3], 'user_id': [8, 1, 2, 4]}, index=[10, 11, 12, 13])
+    out = sort_extract(df)
+    assert out[EXTRACT_ORDER].values.tolist() == [[1, 3, 4], [1, 9, 1], [2, 5, 2], [2, 5, 8]]
+    assert out.index.tolist() == [0, 1, 2, 3]
+
+
+def test_stream_to_parquet_matches_read_sql(synthetic_path, tmp_path):
+    path = str(tmp_path / 'extract.parquet')
+    conn = connect_sqlite(synthetic_path)
+    stats = stream_to_parquet(conn, path, chunk_size=1000, log=lambda message: None)
+    expected = sort_extract(compact_chunk(pd.read_sql(UNIFIED_QUERY, conn)))
+    conn.close()
+
+    assert stats['rows'] == len(expected) > 1000
+    # One row group per chunk, all with the same schema.
+    assert pq.ParquetFile(path).num_row_groups == -(-stats['rows'] // 1000)
+    streamed = sort_extract(read_extract(path))
+    assert streamed.dtypes.equals(expected.dtypes)
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_stream_to_parquet_of_an_empty_result_writes_no_file(synthetic_path, tmp_path):
+    path = tmp_path / 'extract.parquet'
+    conn = connect_sqlite(synthetic_path)
+    stats = stream_to_parquet(conn, str(path), UNIFIED_QUERY.replace("c.active = 'Y'", "c.active = 'never'"),
+                              log=lambda message: None)
+    conn.close()
+    assert stats['rows'] == 0
+    assert not path.exists()
+
+
+@pytest.mark.parametrize('n_partitions', [1, 4, 1000])
+def test_class_partitions_cover_the_active_classes(source, n_partitions):
+    rows, _ = source.query(ACTIVE_CLASS_MEETINGS_QUERY)
+    active = [row[0] for row in rows]
+    ranges = class_partitions(source, n_partitions)
+    assert 1 <= len(ranges) <= n_partitions
+    # Contiguous, ordered ranges that split the active classes without overlap.
+    assert all(lowest <= highest < next_lowest for (lowest, highest), (next_lowest, _) in zip(ranges, ranges[1:]))
+    assert [class_id for class_id in active if any(lo <= class_id <= hi for lo, hi in ranges)] == active
+    assert ranges[0][0] == active[0] and ranges[-1][1] == active[-1]
+    if n_partitions >= len(active):
+        assert len(ranges) == len(active)
+
+
+@pytest.mark.parametrize('workers, partitions', [(1, 1), (3, 5), (2, 1000)])
+def test_extract_partitioned_matches_the_single_query(synthetic_path, workers, partitions):
+    conn = connect_sqlite(synthetic_path)
+    expected = sort_extract(pd.read_sql(UNIFIED_QUERY, conn))
+    conn.close()
+    database = Database.sqlite(synthetic_path, size=workers)
+    df, stats = extract_partitioned(database, workers, partitions, log=lambda message: None)
+    database.close()
+    assert 1 <= stats['partitions'] <= partitions and stats['rows'] == len(expected)
+    pd.testing.assert_frame_equal(df, expected)
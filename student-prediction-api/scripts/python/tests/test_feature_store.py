@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from enrollment_index import build_side_tables
+from feature_store import FeatureStore, main, open_store_if_present
+from synthetic_db import connect_sqlite
+
+
+def test_refresh_matches_full_recompute(source, tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'))
+    stats = store.refresh(source)
+    assert stats['new_meeting_ids'] == 60
+    assert store.check(source).empty
+    store.close()
+
+
+def test_refresh_through_enrollment_index(source, synthetic_path, tmp_path):
+    conn = connect_sqlite(synthetic_path)
+    build_side_tables(conn)
+    conn.close()
+    store = FeatureStore(str(tmp_path / 'features.sqlite'))
+    store.refresh(source, enrollment_index=True)
+    assert store.check(source).empty
+    assert store.check(source, enrollment_index=True).empty
+    store.close()
+
+
+def test_incremental_refresh_matches_full_recompute(source, hold_back, late_participation_id, tmp_path):
+    restore = hold_back(40, late_participation_id)
+    store = FeatureStore(str(tmp_path / 'features.sqlite'))
+    store.refresh(source)
+    assert store.check(source).empty
+
+    restore()
+    stats = store.refresh(source)
+    assert stats['new_meeting_ids'] == 20
+    assert stats['new_participation_ids'] > 0
+    assert store.check(source).empty
+
+    rebuilt = FeatureStore(str(tmp_path / 'rebuilt.sqlite'))
+    rebuilt.refresh(source, full=True)
+    assert store.all_counts().sort_values('user_id').reset_index(drop=True).equals(
+        rebuilt.all_counts().sort_values('user_id').reset_index(drop=True))
+    store.close()
+    rebuilt.close()
+
+
+def test_check_flags_a_stale_store(source, tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'))
+    store.refresh(source)
+    with store.conn:
+        store.conn.execute("UPDATE user_features SET attended_meetings = attended_meetings + 1 WHERE user_id = 7")
+    mismatches = store.check(source)
+    assert mismatches['user_id'].tolist() == [7]
+    store.close()
+
+
+@pytest.mark.parametrize('command', [['show', '1'], ['check']])
+def test_reads_never_create_the_store(command, synthetic_path, tmp_path):
+    path = str(tmp_path / 'features.sqlite')
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--store', path, '--sqlite', synthetic_path] + command)
+    assert exit_info.value.code == 1
+    assert not os.path.exists(path)
+
+
+def test_store_is_present_once_refreshed(source, tmp_path):
+    path = str(tmp_path / 'features.sqlite')
+    assert open_store_if_present(path) is None
+    # A store with its schema but no refresh (e.g. left by an interrupted first refresh) is not used.
+    FeatureStore(path).close()
+    assert open_store_if_present(path) is None
+
+    store = FeatureStore(path)
+    store.refresh(source)
+    store.close()
+    store = open_store_if_present(path)
+    assert store is not None
+    assert store.get_counts(1)[0] > 0
+    store.close()
@@ -0,0 +1,76 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FEATURES, build_feature_matrix, matrix_from_records, meeting_hours, meeting_weekdays
+from helpers import request_records
+
+# (date, Monday=0 weekday): PredictionController sends DateTime::format('N') - 1.
+KNOWN_WEEKDAYS = [
+    ('2025-01-06', 0),   # Monday
+    ('2025-01-11', 5),   # Saturday
+    ('2025-01-12', 6),   # Sunday
+    ('2024-02-29', 3),   # Thursday, leap day
+    ('1970-01-01', 3),   # Thursday, day 0 of datetime64[D]
+    ('1969-12-29', 0),   # Monday, a negative day number
+]
+
+
+@pytest.mark.parametrize('day, weekday', KNOWN_WEEKDAYS)
+def test_meeting_weekdays_of_known_dates(day, weekday):
+    date = datetime.date.fromisoformat(day)
+    assert date.isoweekday() - 1 == weekday
+    for value in (day, date, np.datetime64(day), pd.Timestamp(day + ' 18:45')):
+        assert meeting_weekdays([value]).tolist() == [weekday], value
+
+
+def test_meeting_weekdays_match_iso_weekday_minus_one():
+    days = pd.date_range('2023-12-25', periods=400, freq='D')
+    assert meeting_weekdays(days.values).tolist() == [day.isoweekday() - 1 for day in days]
+    assert meeting_weekdays(pd.Series([days[0], pd.NaT]).values).tolist() == [0, 0]
+    assert meeting_weekdays(['2025-01-12', None]).tolist() == [6, 0]
+
+
+def test_meeting_hours_of_each_input_type():
+    assert meeting_hours(np.array([9 * 3600 + 1800, 23 * 3600 + 3599], dtype='timedelta64[s]')).tolist() == [9, 23]
+    assert meeting_hours([datetime.timedelta(hours=14, minutes=5), None]).tolist() == [14, 0]
+    assert meeting_hours(np.array(['2025-01-06T07:59', 'NaT'], dtype='datetime64[m]')).tolist() == [7, 0]
+    assert meeting_hours(['08:00:00', '17:30', ' 6:15:00', 'soon']).tolist() == [8, 17, 6, 0]
+    # TIME values past 24h wrap, like Timedelta.components.hours.
+    assert meeting_hours(['25:00:00']).tolist() == [1]
+    assert meeting_hours(np.array([10, 13.0, np.nan])).tolist() == [10, 13, 0]
+
+
+def test_matrix_from_records_matches_build_feature_matrix():
+    records = request_records(50, seed=4)
+    # As PHP may send them: numeric strings and a missing professor.
+    records[0]['user_id'] = str(records[0]['user_id'])
+    records[1]['class_id'] = str(records[1]['class_id'])
+    records[2]['id_professeur'] = None
+    records[3]['user_attendance_rate'] = '0.25'
+
+    user_ids, X = matrix_from_records(records)
+    expected = build_feature_matrix(pd.DataFrame(records))
+    assert X.dtype == expected.dtype == np.float32 and X.shape == (50, len(FEATURES))
+    np.testing.assert_array_equal(X, expected)
+    assert np.isnan(X[2, FEATURES.index('id_professeur')])
+    # A numeric string user id comes back as an int.
+    assert user_ids == [1000 + i for i in range(50)] and isinstance(user_ids[0], int)
+
+    with pytest.raises(ValueError, match='meeting_hour'):
+        matrix_from_records([{key: value for key, value in records[0].items() if key != 'meeting_hour'}])
+
+
+def test_schedule_columns_give_the_records_weekday_and_hour():
+    records = request_records(5, seed=1)
+    rows = pd.DataFrame(records).drop(columns=['meeting_weekday', 'meeting_hour'])
+    rows['scheduled_day'] = pd.Timestamp('2025-01-12')
+    rows['scheduled_hour'] = pd.Timedelta(hours=16, minutes=30)
+    for record in records:
+        record.update(meeting_weekday=6, meeting_hour=16)
+    np.testing.assert_array_equal(build_feature_matrix(rows), matrix_from_records(records)[1])
+    np.testing.assert_array_equal(build_feature_matrix(rows.drop(columns=['scheduled_day', 'scheduled_hour']),
+                                                       schedule=('2025-01-12', '16:30:00')),
+                                  matrix_from_records(records)[1])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from features import FEATURES, attendance_history, build_feature_matrix
+from forest_engine import PER_TREE_MIN_BATCH, PackedForest, can_pack
+from helpers import extract_rows
+
+
+@pytest.fixture(scope='module')
+def training_matrix():
+    df = extract_rows(PER_TREE_MIN_BATCH + 1000)
+    presence = df['presence'].to_numpy()
+    X = build_feature_matrix(df, attendance_history(df['user_id'], presence), default_rate=presence.mean())
+    # id_matiere / id_professeur are NULL for some classes; NaN exercises the missing-value routing.
+    rng = np.random.default_rng(0)
+    X[rng.random(len(X)) < 0.05, FEATURES.index('id_matiere')] = np.nan
+    X[rng.random(len(X)) < 0.05, FEATURES.index('id_professeur')] = np.nan
+    return X, presence
+
+
+@pytest.mark.parametrize('family', [RandomForestClassifier, ExtraTreesClassifier])
+def test_packed_forest_matches_sklearn_exactly(family, training_matrix):
+    X, y = training_matrix
+    model = family(n_estimators=25, min_samples_leaf=5, random_state=0, n_jobs=1).fit(X, y)
+    assert can_pack(model)
+    engine = PackedForest.from_model(model)
+
+    # One request, a class-sized batch (forest-wide walk) and a batch walked tree by tree.
+    for size in (1, 100, len(X)):
+        labels, proba = engine.predict_with_proba(X[:size])
+        assert np.array_equal(proba, model.predict_proba(X[:size])), f"batch {size}: probabilities differ"
+        assert np.array_equal(labels, model.predict(X[:size])), f"batch {size}: labels differ"
+
+
+def test_packed_forest_handles_unseen_missing_values(training_matrix):
+    X, y = training_matrix
+    complete = ~np.isnan(X).any(axis=1)
+    # Fitted without NaN: sklearn still routes a NaN at predict time, and the packed trees must agree.
+    model = RandomForestClassifier(n_estimators=10, random_state=0, n_jobs=1).fit(X[complete], y[complete])
+    engine = PackedForest.from_model(model)
+    assert np.array_equal(engine.predict_proba(X[:500]), model.predict_proba(X[:500]))
+
+
+def test_thresholds_between_adjacent_float32_values():
+    # Two neighbouring float32 values whose float64 midpoint (the split threshold) rounds up
+    # to the larger one when cast to float32. sklearn does not split values closer than 1e-7,
+    # so they are taken where the float32 spacing is wider than that.
+    low = next(v for v in np.arange(1000, 1100, dtype=np.float32) / np.float32(7)
+               if np.float32((np.float64(v) + np.float64(np.nextafter(v, np.float32(np.inf)))) / 2)
+               == np.nextafter(v, np.float32(np.inf)))
+    high = np.nextafter(low, np.float32(np.inf))
+    X = np.array([[low], [high]] * 10, dtype=np.float32)
+    y = np.array([0, 1] * 10)
+    model = RandomForestClassifier(n_estimators=1, bootstrap=False, random_state=0).fit(X, y)
+    assert np.array_equal(model.predict(X[:2]), [0, 1])
+    engine = PackedForest.from_model(model)
+    assert np.array_equal(engine.predict(X[:2]), [0, 1])
+    assert np.array_equal(engine.predict_proba(X), model.predict_proba(X))
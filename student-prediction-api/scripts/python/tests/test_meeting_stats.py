@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from meeting_stats import MeetingStatsStore, main, open_stats_if_present
+from user_analytics import UserAnalytics
+
+
+def test_refresh_matches_full_recompute(source, tmp_path):
+    store = MeetingStatsStore(str(tmp_path / 'stats.sqlite'))
+    stats = store.refresh(source)
+    assert stats['new_meeting_ids'] == 60
+    assert store.check(source).empty
+    store.close()
+
+
+def test_incremental_refresh_matches_full_recompute(source, hold_back, late_participation_id, tmp_path):
+    restore = hold_back(40, late_participation_id)
+    store = MeetingStatsStore(str(tmp_path / 'stats.sqlite'))
+    store.refresh(source)
+    assert store.check(source).empty
+
+    restore()
+    stats = store.refresh(source)
+    # The 20 new meetings, plus the held meetings that got their late participation rows.
+    assert stats['new_meeting_ids'] == 20
+    assert stats['recounted_meetings'] > 20
+    assert store.check(source).empty
+    store.close()
+
+
+def test_check_flags_a_stale_meeting(source, tmp_path):
+    store = MeetingStatsStore(str(tmp_path / 'stats.sqlite'))
+    store.refresh(source)
+    with store.conn:
+        store.conn.execute("UPDATE meeting_stats SET attended = attended + 1 WHERE meeting_id = 12")
+    assert store.check(source)['meeting_id'].tolist() == [12]
+    store.close()
+
+
+@pytest.mark.parametrize('command', [['show', '1'], ['check']])
+def test_reads_never_create_the_store(command, synthetic_path, tmp_path):
+    path = str(tmp_path / 'stats.sqlite')
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--store', path, '--sqlite', synthetic_path] + command)
+    assert exit_info.value.code == 1
+    assert not os.path.exists(path)
+
+
+def test_user_analytics_reads_the_store_once_built(source, tmp_path):
+    stats_path = str(tmp_path / 'stats.sqlite')
+    no_store = str(tmp_path / 'missing.sqlite')
+    live = UserAnalytics(source, store_path=no_store, stats_path=no_store).user_meetings(3)
+
+    # An unrefreshed store is ignored: the page keeps running the live queries.
+    MeetingStatsStore(stats_path).close()
+    assert open_stats_if_present(stats_path) is None
+    assert UserAnalytics(source, store_path=no_store, stats_path=stats_path).user_meetings(3).equals(live)
+
+    store = MeetingStatsStore(stats_path)
+    store.refresh(source)
+    store.close()
+    stored = UserAnalytics(source, store_path=no_store, stats_path=stats_path).user_meetings(3)
+    assert len(stored) == len(live) > 0
+    assert stored.reset_index(drop=True).equals(live.reset_index(drop=True))
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import model_registry
+from model_registry import HotModel, ModelRegistry, load_version, open_registry_if_present
+
+FEATURES = ['a', 'b']
+
+
+def fitted_forest(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.random((200, len(FEATURES)))
+    return RandomForestClassifier(n_estimators=3, random_state=seed).fit(X, X[:, 0] > 0.5)
+
+
+class Clock:
+    """Stands in for time.monotonic() so the check interval can be stepped over."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_registry.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    assert open_registry_if_present(registry.root) is None
+    assert registry.publish(fitted_forest(0), FEATURES, {'accuracy': 0.7}) == 'v0001'
+    assert registry.publish(fitted_forest(1), FEATURES, {'accuracy': 0.8}, make_current=False) == 'v0002'
+    return registry
+
+
+def test_publish_and_promote(registry):
+    assert registry.list_versions() == ['v0001', 'v0002']
+    assert registry.current_version() == 'v0001'
+    assert open_registry_if_present(registry.root) is not None
+    metadata = registry.metadata('v0002')
+    assert not metadata['current'] and metadata['features'] == FEATURES and metadata['metrics'] == {'accuracy': 0.8}
+
+    registry.set_current('v0002')
+    assert registry.current_version() == 'v0002'
+    with pytest.raises(ValueError, match='v0009'):
+        registry.set_current('v0009')
+    assert registry.current_version() == 'v0002'
+
+
+def test_prune_keeps_the_current_version(registry):
+    registry.publish(fitted_forest(2), FEATURES, make_current=False)
+    assert registry.prune(keep=1) == ['v0002']
+    assert registry.list_versions() == ['v0001', 'v0003']
+
+
+def test_hot_model_follows_promote_after_the_check_interval(registry, clock):
+    hot = HotModel(registry, check_interval=5.0)
+    model, version = hot.get()
+    assert version == 'v0001'
+    X = np.random.default_rng(3).random((50, len(FEATURES)))
+    assert np.array_equal(model.predict_proba(X), fitted_forest(0).predict_proba(X))
+
+    registry.set_current('v0002')
+    clock.now += 1.0
+    assert hot.get()[1] == 'v0001'   # within the check interval
+    clock.now += 5.0
+    model, version = hot.get()
+    assert version == 'v0002'
+    assert np.array_equal(model.predict_proba(X), fitted_forest(1).predict_proba(X))
+
+    # A rollback is a swap like any other.
+    registry.set_current('v0001')
+    clock.now += 5.0
+    assert hot.get()[1] == 'v0001'
+
+
+def test_failed_load_keeps_the_old_model_and_is_reported_once(registry, clock, capsys):
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        if path.endswith('v0002'):
+            raise ValueError("corrupt artifact")
+        return load_version(path)
+
+    hot = HotModel(registry, loader=loader, check_interval=5.0)
+    old_model, _ = hot.get()
+    registry.set_current('v0002')
+    for _ in range(3):
+        clock.now += 5.0
+        assert hot.get() == (old_model, 'v0001')
+    assert loads == [registry.path('v0001'), registry.path('v0002')]
+    assert capsys.readouterr().err.count("WARNING: could not load model version v0002") == 1
+
+    # Promoting it again rewrites CURRENT, which is worth another try.
+    registry.set_current('v0002')
+    clock.now += 5.0
+    hot.get()
+    assert loads[-1] == registry.path('v0002') and len(loads) == 3
+
+
+def test_hot_model_needs_a_current_version(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        HotModel(ModelRegistry(str(tmp_path / 'empty')))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from model_search import holdout_split, split_cpus
+from rolling_history import NO_DAY
+from train_model import time_holdout
+
+
+@pytest.mark.parametrize('n_tasks, workers, cpus, expected', [
+    (10, None, 8, (8, 1)),    # one worker per CPU, single-threaded estimators
+    (3, None, 8, (3, 2)),     # fewer tasks: the spare CPUs go to the estimators' threads
+    (1, None, 8, (1, 8)),
+    (10, 2, 8, (2, 4)),
+    (10, 16, 8, (8, 1)),      # never more workers than CPUs
+    (2, 4, 8, (2, 4)),        # nor than tasks
+    (5, None, 1, (1, 1)),
+    (0, None, 4, (1, 4)),
+    (3, None, 7, (3, 2)),     # threads round down
+])
+def test_split_cpus(n_tasks, workers, cpus, expected):
+    assert split_cpus(n_tasks, workers, cpus) == expected
+
+
+def test_split_cpus_defaults_to_the_usable_cpus():
+    pool_workers, threads = split_cpus(1000)
+    assert pool_workers >= 1 and threads == 1
+
+
+def test_time_holdout_split_scores_on_the_last_days():
+    days = np.array([100, 110, 111, NO_DAY, 112, 105, 112, 109])
+    y = np.array([0, 1, 0, 1, 1, 0, 1, 0])
+    train, test = holdout_split(None, y, days, holdout_days=2)
+    assert test.tolist() == [2, 4, 6] and train.tolist() == [0, 1, 5, 7]
+    # The slice train_model.py scores on; undated rows are in neither part.
+    assert test.tolist() == np.flatnonzero(time_holdout(days, 2)).tolist()
+    assert days[train].max() < days[test].min()
+
+
+def test_random_split_is_stratified_and_repeatable():
+    y = np.array([0] * 60 + [1] * 20)
+    days = np.full(len(y), NO_DAY)
+    train, test = holdout_split(None, y, days)
+    assert len(test) == 20 and sorted(np.concatenate([train, test]).tolist()) == list(range(80))
+    assert y[test].sum() == 5
+    again = holdout_split(None, y, days)
+    assert train.tolist() == again[0].tolist() and test.tolist() == again[1].tolist()
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import prediction_cache
+from feature_store import FeatureStore
+from prediction_cache import PredictionCache, snapshot_version
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stands in for time.monotonic(); advance it with clock[0] += seconds."""
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_hits_misses_and_saved_time(clock):
+    cache = PredictionCache()
+    computed = []
+    compute = lambda: computed.append(1) or 'result'
+    assert cache.get_or_compute((1, 'v1', (3, 7)), compute) == 'result'
+    assert cache.get_or_compute((1, 'v1', (3, 7)), compute) == 'result'
+    # A new model version or snapshot is a different key.
+    cache.get_or_compute((1, 'v2', (3, 7)), compute)
+    cache.get_or_compute((1, 'v2', (4, 8)), compute)
+    assert len(computed) == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['hit_rate']) == (1, 3, 3, 0.25)
+    assert stats['saved_seconds'] >= 0
+    # None means "could not predict" and is not cached.
+    assert cache.get_or_compute((2, 'v1', (0, 0)), lambda: None) is None
+    assert cache.stats()['entries'] == 3
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache(ttl=60)
+    cache.put('a', 'value')
+    clock[0] += 59.9
+    assert cache.get('a') == 'value'
+    clock[0] += 0.1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['hits'], stats['misses']) == (0, 0, 1, 1)
+    # A recomputed value gets a fresh TTL.
+    cache.put('a', 'new value')
+    clock[0] += 59
+    assert cache.get('a') == 'new value'
+
+
+def test_least_recently_used_entries_go_first(clock):
+    cache = PredictionCache(max_entries=3, sizeof=lambda value: 1)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'      # a is now the most recently used
+    cache.put('d', 'D')
+    assert cache.get('b') is None and cache.stats()['evictions'] == 1
+    cache.put('e', 'E')
+    assert [key for key in 'acde' if cache.get(key) is not None] == ['a', 'd', 'e']
+    assert cache.stats()['entries'] == 3
+
+
+def test_byte_bound(clock):
+    cache = PredictionCache(max_bytes=1000)
+    cache.put('a', np.zeros(50))         # 400 bytes
+    cache.put('b', np.zeros(50))
+    assert cache.stats()['bytes'] == 800
+    cache.put('c', np.zeros(50))
+    assert cache.get('a') is None and cache.stats()['bytes'] == 800
+    # Replacing an entry frees its old size first: 800 + 400 bytes, so c, now the older one, goes.
+    cache.put('b', np.zeros(100))
+    assert cache.get('c') is None and cache.stats()['bytes'] == 800
+    # A value larger than the cache is not stored and evicts nothing.
+    cache.put('huge', np.zeros(200))
+    assert cache.get('huge') is None and cache.get('b') is not None and cache.stats()['entries'] == 1
+
+
+def test_invalidate(clock):
+    cache = PredictionCache()
+    for meeting_id, version in [(1, 'v1'), (1, 'v2'), (2, 'v1')]:
+        cache.put((meeting_id, version, (0, 0)), 'result')
+    assert cache.invalidate(1) == 2
+    assert cache.get((2, 'v1', (0, 0))) == 'result'
+    assert cache.invalidate() == 1 and cache.stats()['bytes'] == 0
+
+
+def class_with_participation(cnx):
+    rows, _ = cnx.query("SELECT m.id_classe, MAX(pm.id) FROM participation_meetings pm "
+                        "JOIN meetings m ON pm.id_meeting = m.id GROUP BY m.id_classe ORDER BY m.id_classe")
+    return rows[0]
+
+
+def test_snapshot_follows_the_class_participation(source, tmp_path):
+    no_store = str(tmp_path / 'features.sqlite')
+    class_id, last_id = class_with_participation(source)
+    count = source.scalar("SELECT COUNT(*) FROM participation_meetings pm JOIN meetings m ON pm.id_meeting = m.id "
+                          "WHERE m.id_classe = %s", (class_id,))
+    assert snapshot_version(source, class_id, no_store) == (count, last_id)
+    assert snapshot_version(source, -1, no_store) == (0, 0)
+
+    meeting_id = source.scalar("SELECT MIN(id) FROM meetings WHERE id_classe = %s", (class_id,))
+    new_id = source.scalar("SELECT MAX(id) FROM participation_meetings") + 1
+    source.execute("INSERT INTO participation_meetings VALUES (%s, %s, 1, '2025-01-06 09:00:00')", (new_id, meeting_id))
+    assert snapshot_version(source, class_id, no_store) == (count + 1, new_id)
+
+    # A deleted row below the highest id changes the count only.
+    first_id = source.scalar("SELECT MIN(pm.id) FROM participation_meetings pm JOIN meetings m ON pm.id_meeting = m.id "
+                             "WHERE m.id_classe = %s", (class_id,))
+    source.execute("DELETE FROM participation_meetings WHERE id = %s", (first_id,))
+    assert snapshot_version(source, class_id, no_store) == (count, new_id)
+
+
+def test_snapshot_follows_the_feature_store_marks(source, hold_back, late_participation_id, tmp_path):
+    path = str(tmp_path / 'features.sqlite')
+    restore = hold_back(40, late_participation_id)
+    store = FeatureStore(path)
+    store.refresh(source)
+    class_id, _ = class_with_participation(source)
+    before = snapshot_version(source, class_id, path)
+    assert before[2:] == (40, late_participation_id)
+
+    restore()
+    store.refresh(source)
+    store.close()
+    after = snapshot_version(source, class_id, path)
+    assert after[2:] == (source.scalar("SELECT MAX(id) FROM meetings"),
+                         source.scalar("SELECT MAX(id) FROM participation_meetings"))
+    assert after[2:] != before[2:]
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from features import FEATURES, matrix_from_records
+from helpers import request_records
+from model_registry import ModelRegistry
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prediction_server.py')
+
+
+def test_stdin_mode_serves_the_given_registry(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.random((300, len(FEATURES))) * 10
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 7] > 5)
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    registry.publish(model, FEATURES)
+
+    records = request_records(20)
+    result = subprocess.run([sys.executable, SERVER, '--stdin', '--registry', registry.root],
+                            input=json.dumps(records).encode(), capture_output=True, check=True)
+    predictions = json.loads(result.stdout)
+    _, X_request = matrix_from_records(records)
+    expected = model.predict_proba(X_request)[:, 1]
+    assert [p['user_id'] for p in predictions] == [record['user_id'] for record in records]
+    assert np.allclose([p['probability_of_presence'] for p in predictions], expected)
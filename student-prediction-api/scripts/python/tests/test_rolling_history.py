@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from helpers import assert_history_equal, history_rows, pandas_history
+from rolling_history import HISTORY_COLUMNS, RollingState, rolling_history
+
+DEFAULT_RATE = 0.5
+
+
+def one_meeting_per_day(user_ids, days, meeting_ids, presence):
+    """The rows restricted to one meeting per user and day, where the pandas day window is exact."""
+    _, first = np.unique(np.stack([user_ids, days.astype(np.int64)]), axis=1, return_index=True)
+    first.sort()
+    return user_ids[first], days[first], meeting_ids[first], presence[first]
+
+
+@pytest.fixture(scope='module')
+def rows():
+    # About 35 meetings per user in 30 days, so the day window reaches past the last-20 tail.
+    return history_rows(20_000, meetings_per_user=400)
+
+
+def test_matches_the_pandas_reference(rows):
+    rows = one_meeting_per_day(*rows)
+    assert_history_equal(pandas_history(*rows, DEFAULT_RATE), rolling_history(*rows, default_rate=DEFAULT_RATE),
+                         "pandas baseline")
+
+
+def test_rows_only_see_their_past():
+    user_ids = [1, 1, 1, 2, 1]
+    days = ['2024-09-02', '2024-09-03', '2024-10-20', '2024-09-02', None]
+    features = rolling_history(user_ids, days, [10, 11, 12, 10, 13], [1, 0, 1, 0, 1], default_rate=DEFAULT_RATE)
+    assert features['user_total_meetings'].tolist() == [0, 1, 2, 0, 3]
+    assert features['user_attendance_rate'].tolist() == [DEFAULT_RATE, 1.0, 0.5, DEFAULT_RATE, 2 / 3]
+    assert features['rate_last_5'].tolist() == [DEFAULT_RATE, 1.0, 0.5, DEFAULT_RATE, 2 / 3]
+    # The October meeting is more than 30 days after the others; an undated row has no day window.
+    assert features['rate_last_30d'].tolist() == [DEFAULT_RATE, 1.0, DEFAULT_RATE, DEFAULT_RATE, DEFAULT_RATE]
+
+
+@pytest.mark.parametrize('batches', [1, 7])
+def test_incremental_updates_match_the_full_scan(rows, batches, tmp_path):
+    user_ids, days, meeting_ids, presence = rows
+    full = rolling_history(user_ids, days, meeting_ids, presence, default_rate=DEFAULT_RATE)
+
+    # The rows arrive in day order, a whole day per batch; the state is saved and reloaded halfway.
+    day_numbers = days.astype(np.int64)
+    edges = np.quantile(day_numbers, np.linspace(0, 1, batches + 1))[1:-1]
+    batch_of = np.searchsorted(edges, day_numbers, side='right')
+    state = RollingState(DEFAULT_RATE)
+    incremental = {name: np.empty(len(user_ids)) for name in HISTORY_COLUMNS}
+    for b in range(batches):
+        if b == batches // 2:
+            state.save(tmp_path / 'state.npz')
+            state = RollingState.load(tmp_path / 'state.npz', DEFAULT_RATE)
+        selected = np.flatnonzero(batch_of == b)
+        features = state.update(user_ids[selected], days[selected], meeting_ids[selected], presence[selected])
+        for name in HISTORY_COLUMNS:
+            incremental[name][selected] = features[name]
+    assert_history_equal(full, incremental, f"{batches} batches")
+    assert state.counts.sum() == len(user_ids)
@@ -0,0 +1,62 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import train_model
+from db import Database
+from model_registry import ModelRegistry
+from rolling_history import NO_DAY
+from train_model import data_through, fit_incremental, time_holdout
+
+
+def labelled_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, 4)).astype(np.float32)
+    return X, (X[:, 0] + 0.2 * rng.random(n) > 0.6).astype(np.int64)
+
+
+def test_fit_incremental_keeps_max_trees_and_drops_the_oldest():
+    X, y = labelled_rows(300, 0)
+    model = RandomForestClassifier(n_estimators=10, class_weight='balanced', random_state=0).fit(X, y)
+    old_trees = list(model.estimators_)
+
+    X_new, y_new = labelled_rows(100, 1)
+    fit_incremental(model, X_new, y_new, new_trees=4, max_trees=12)
+    assert len(model.estimators_) == 12
+    # The two oldest trees are dropped; the other old ones are kept as they were, then the new ones.
+    assert model.estimators_[:8] == old_trees[2:]
+    assert not any(tree in old_trees for tree in model.estimators_[8:])
+    assert model.get_params()['n_estimators'] == 12 and not model.get_params()['warm_start']
+    assert model.predict_proba(X_new).shape == (100, 2)
+
+    # Under max_trees nothing is dropped.
+    fit_incremental(model, X_new, y_new, new_trees=3, max_trees=20)
+    assert len(model.estimators_) == model.get_params()['n_estimators'] == 15
+
+    # warm_start is off again, so a plain fit() refits the whole forest at its current size.
+    kept = list(model.estimators_)
+    model.fit(X, y)
+    assert len(model.estimators_) == 15 and not any(tree in kept for tree in model.estimators_)
+
+
+def test_time_holdout_is_the_last_days():
+    days = np.array([100, 110, 111, 112, NO_DAY, 105, 112])
+    assert time_holdout(days, 2).tolist() == [False, False, True, True, False, False, True]
+    # The model's data_through is the last day it was trained on, before the held-out slice.
+    assert data_through(days[~time_holdout(days, 2)]) == str(np.datetime64(110, 'D'))
+    assert not time_holdout(np.array([NO_DAY, NO_DAY]), 2).any()
+
+
+def test_partitioned_training_opens_no_single_connection(synthetic_path, tmp_path, monkeypatch):
+    def no_connect():
+        raise AssertionError("train() opened a connection that --workers does not use")
+
+    def sqlite_pool(cls, size, **options):
+        return Database.sqlite(synthetic_path, size)
+
+    save = train_model.save
+    monkeypatch.setattr(train_model, 'connect', no_connect)
+    monkeypatch.setattr(train_model.Database, 'mysql', classmethod(sqlite_pool))
+    monkeypatch.setattr(train_model, 'save', lambda model, metrics: save(model, str(tmp_path / 'model.pkl'), metrics,
+                                                                         str(tmp_path / 'models')))
+    train_model.main(['--workers', '2'])
+    assert ModelRegistry(str(tmp_path / 'models')).metadata('v0001')['metrics']['n_train'] > 0
@@ -0,0 +1,132 @@
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import train_model
+from model_registry import ModelRegistry
+from training_jobs import STAGE_FUNCTIONS, STAGES, JobStore, cancel_job, run_job
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def job_options(synthetic_path, tmp_path):
+    return {'sqlite': synthetic_path, 'model_path': str(tmp_path / 'model.pkl'),
+            'registry': str(tmp_path / 'models'), 'chunk_size': 2000}
+
+
+@pytest.fixture(autouse=True)
+def restore_sigterm():
+    # run_job installs its own SIGTERM handler in the test process.
+    handler = signal.getsignal(signal.SIGTERM)
+    yield
+    signal.signal(signal.SIGTERM, handler)
+
+
+def stage_statuses(store, job_id):
+    return {stage['stage']: stage['status'] for stage in store.get(job_id)['stages']}
+
+
+def test_job_runs_every_stage_and_publishes(store, job_options, tmp_path):
+    job_id = store.submit(job_options)
+    assert store.get(job_id)['status'] == 'queued'
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'succeeded'
+
+    job = store.get(job_id)
+    assert job['status'] == 'succeeded' and job['model_version'] == 'v0001' and job['current_stage'] is None
+    assert stage_statuses(store, job_id) == {stage: 'succeeded' for stage in STAGES}
+    metrics = ModelRegistry(job_options['registry']).metadata('v0001')['metrics']
+    assert metrics['n_test'] > 0 and metrics['holdout_days'] == train_model.DEFAULT_HOLDOUT_DAYS
+    assert metrics['data_through'] < metrics['holdout_from']
+    assert os.path.exists(job_options['model_path'])
+    # The intermediate outputs are only needed to resume.
+    assert not os.listdir(tmp_path / 'work' / str(job_id))
+
+
+def test_resume_skips_the_stages_that_succeeded(store, job_options, tmp_path, monkeypatch):
+    def failing_fit(X, y):
+        raise train_model.TrainingError("no trees today")
+
+    monkeypatch.setattr(train_model, 'fit', failing_fit)
+    job_id = store.submit(job_options)
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'failed'
+    job = store.get(job_id)
+    assert job['message'] == "fit: TrainingError: no trees today"
+    assert stage_statuses(store, job_id) == {'extract': 'succeeded', 'features': 'succeeded', 'fit': 'failed',
+                                             'evaluate': 'pending', 'save': 'pending'}
+
+    monkeypatch.undo()
+    ran = []
+    for stage, function in STAGE_FUNCTIONS.items():
+        monkeypatch.setitem(STAGE_FUNCTIONS, stage,
+                            lambda *args, stage=stage, function=function: ran.append(stage) or function(*args))
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'succeeded'
+    assert ran == ['fit', 'evaluate', 'save']
+    assert store.get(job_id)['model_version'] == 'v0001'
+
+
+def test_training_errors_are_recorded_as_the_job_message(store, job_options, synthetic_path, tmp_path):
+    conn = sqlite3.connect(synthetic_path)
+    conn.execute("DELETE FROM participation_meetings")
+    conn.execute("DELETE FROM meetings")
+    conn.commit()
+    conn.close()
+    job_id = store.submit(job_options)
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'failed'
+    assert store.get(job_id)['message'] == "extract: TrainingError: Query returned 0 rows. Cannot train model."
+
+
+def test_sigterm_cancels_the_running_stage(store, job_options, tmp_path, monkeypatch):
+    def terminated_fit(job_dir, options, context):
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    monkeypatch.setitem(STAGE_FUNCTIONS, 'fit', terminated_fit)
+    job_id = store.submit(job_options)
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'cancelled'
+    job = store.get(job_id)
+    assert job['message'] == "Cancelled during fit" and job['finished_at']
+    assert stage_statuses(store, job_id)['fit'] == 'cancelled'
+
+
+def test_cancel_job(store, job_options, tmp_path):
+    # No runner yet: cancelled at once, and a later run stops before its first stage.
+    job_id = store.submit(job_options)
+    assert cancel_job(store, job_id) == 'cancelled'
+    assert store.get(job_id)['cancel_requested']
+    store.update(job_id, status='queued')
+    assert run_job(store, job_id, str(tmp_path / 'work')) == 'cancelled'
+    assert stage_statuses(store, job_id) == {stage: 'pending' for stage in STAGES}
+    assert cancel_job(store, job_id) == 'cancelled'
+
+    # A live runner gets SIGTERM.
+    runner = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    job_id = store.submit(job_options)
+    store.update(job_id, status='running', pid=runner.pid)
+    assert cancel_job(store, job_id) == 'cancelling'
+    assert runner.wait(timeout=10) == -signal.SIGTERM
+
+
+def test_status_changes_are_seen_by_other_connections(store):
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    reader = JobStore(store.path)
+    job_id = store.submit({'chunk_size': 10})
+    store.stage_started(job_id, 'extract')
+    job = reader.get(job_id)
+    assert job['status'] == 'queued' and job['current_stage'] == 'extract'
+    assert job['stages'][0] == {'stage': 'extract', 'status': 'running', 'started_at': job['stages'][0]['started_at'],
+                                'seconds': None, 'peak_rss_mb': None, 'detail': None}
+    store.stage_finished(job_id, 'extract', 'succeeded', 1.23456, 12.34, {'rows': 5})
+    assert reader.get(job_id)['stages'][0]['detail'] == {'rows': 5}
+    assert reader.stage_status(job_id, 'extract') == 'succeeded'
+    with pytest.raises(KeyError):
+        reader.get(job_id + 1)
+    reader.close()
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+
+from features import FEATURES, matrix_from_records
+from helpers import request_records
+from wire_format import (FEATURE_TYPES, FEATURES_MAGIC, decode_features, decode_predictions, encode,
+                         encode_features, encode_predictions, is_features_payload, is_predictions_payload)
+
+
+@pytest.fixture
+def records():
+    records = request_records(50)
+    # NULL subject / teacher ids travel as NaN in their float columns.
+    records[3]['id_matiere'] = None
+    records[7]['id_professeur'] = None
+    return records
+
+
+def test_features_round_trip_matches_the_json_matrix(records):
+    user_ids, X = matrix_from_records(records)
+    payload = encode_features(user_ids, X)
+    assert is_features_payload(payload) and not is_predictions_payload(payload)
+
+    decoded_ids, decoded = decode_features(payload)
+    assert decoded_ids.tolist() == user_ids
+    assert decoded.dtype == np.float32 and decoded.flags.c_contiguous
+    assert np.array_equal(decoded, X, equal_nan=True)
+    assert np.isnan(decoded[3, FEATURES.index('id_matiere')])
+    assert np.isnan(decoded[7, FEATURES.index('id_professeur')])
+
+
+def test_features_are_read_in_features_order_whatever_the_header_order(records):
+    user_ids, X = matrix_from_records(records)
+    # As PredictionController may send them: reversed, each under its own wire type.
+    columns = [(name, FEATURE_TYPES[name], X[:, i]) for i, name in enumerate(FEATURES)][::-1]
+    _, decoded = decode_features(encode(FEATURES_MAGIC, columns))
+    assert np.array_equal(decoded, X, equal_nan=True)
+
+
+def test_predictions_round_trip():
+    user_ids, X = decode_features(encode_features([1001, 1002, 2 ** 40], np.zeros((3, len(FEATURES)))))
+    probas = np.array([0.125, 0.9, 1 / 3])
+    predictions = np.array([0, 1, 0], dtype=np.uint8)
+    payload = encode_predictions(user_ids, probas, predictions)
+    assert is_predictions_payload(payload) and not is_features_payload(payload)
+    assert decode_predictions(payload) == [
+        {'user_id': 1001, 'probability_of_presence': 0.125, 'prediction': 0},
+        {'user_id': 1002, 'probability_of_presence': 0.9, 'prediction': 1},
+        {'user_id': 2 ** 40, 'probability_of_presence': 1 / 3, 'prediction': 0},
+    ]
+
+
+def test_empty_payloads():
+    user_ids, X = decode_features(encode_features([], np.zeros((0, len(FEATURES)))))
+    assert len(user_ids) == 0 and X.shape == (0, len(FEATURES))
+    assert decode_predictions(encode_predictions(user_ids, np.zeros(0), np.zeros(0, dtype=np.uint8))) == []
+
+
+def test_missing_column_is_rejected(records):
+    user_ids, X = matrix_from_records(records)
+    columns = [(name, FEATURE_TYPES[name], X[:, i]) for i, name in enumerate(FEATURES) if name != 'meeting_hour']
+    with pytest.raises(ValueError, match='meeting_hour'):
+        decode_features(encode(FEATURES_MAGIC, columns))
+
+
+def test_malformed_payloads_are_rejected(records):
+    payload = encode_features(*matrix_from_records(records))
+    with pytest.raises(ValueError, match='Truncated'):
+        decode_features(payload[:-1])
+    with pytest.raises(ValueError, match='after its last column'):
+        decode_features(payload + b'\0')
+    with pytest.raises(ValueError, match='Not a ATF1 payload'):
+        decode_features(encode_predictions([1], np.array([0.5]), np.array([1])))
+    with pytest.raises(ValueError, match='Unsupported wire type'):
+        encode(FEATURES_MAGIC, [('user_id', '<i8', [1])])
+    assert not is_features_payload(json.dumps(records))
@@ -1,139 +1,342 @@
+import argparse
+import os
+import sys
+import time
+import warnings
 import pandas as pd
 import numpy as np
 import mysql.connector
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import pickle
 
-# --- CONFIG ---
-db_config = { 'host': 'localhost', 'user': 'root', 'password': '', 'database': 'predict_app' }
-
-print("Connecting to the database...")
-try:
-    # Set a longer timeout to handle potentially large data transfers
-    cnx = mysql.connector.connect(**db_config, connect_timeout=300)
-    print("-> Connection successful.")
-except mysql.connector.Error as err:
-    print(f"ERROR: Database Connection Error: {err}"); 
-    exit()
-
-print("Pulling data for training...")
-
-# --- SQL QUERY (Simplified for focus and performance) ---
-unified_query = """
-WITH MeetingScheduleLink AS (
-    SELECT 
-        pm.id_meeting, 
-        MAX(pcj.day) AS scheduled_day, 
-        MAX(pcj.heure_from) AS scheduled_hour
-    FROM participation_meetings pm
-    JOIN meetings m ON pm.id_meeting = m.id
-    JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
-    GROUP BY pm.id_meeting
-)
-SELECT
-    pgp.user_id,
-    c.id AS class_id, 
-    c.id_cours AS course_id, 
-    c.id_professeur,
-    co.id_matiere,
-    m.id AS meeting_id,
-    msl.scheduled_day, 
-    msl.scheduled_hour,
-    IF(pm_check.id IS NOT NULL, 1, 0) AS presence
-FROM parcour_group_pivot pgp
-JOIN parcours_classes pc ON pgp.id_parcour_classes = pc.id
-JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
-JOIN meetings m ON m.id_classe = c.id
-JOIN cours co ON c.id_cours = co.id
-LEFT JOIN participation_meetings pm_check ON pm_check.id_user = pgp.user_id AND pm_check.id_meeting = m.id
-LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
-WHERE c.active = 'Y';
-"""
-
-try:
-    df = pd.read_sql(unified_query, cnx)
-except Exception as e:
-    print(f"ERROR: Failed to execute SQL query: {e}")
-    cnx.close()
-    exit()
-
-if df.empty:
-    print("ERROR: Query returned 0 rows. Cannot train model."); 
-    cnx.close(); 
-    exit()
-
-print(f"-> Successfully pulled {len(df)} records.")
-
-# --- Feature Engineering ---
-print("Performing feature engineering...")
-df['meeting_weekday'] = pd.to_datetime(df['scheduled_day']).dt.weekday
-df['meeting_hour'] = pd.to_timedelta(df['scheduled_hour'].astype(str), errors='coerce').dt.components['hours']
-
-# Fill missing schedule data with 0 (e.g., Sunday) and 0 (e.g., midnight), a neutral value
-df.fillna({'meeting_weekday': 0, 'meeting_hour': 0}, inplace=True)
-df['meeting_weekday'] = df['meeting_weekday'].astype(int)
-df['meeting_hour'] = df['meeting_hour'].astype(int)
-
-# Calculate historical attendance rate for each user
-user_history = df.groupby('user_id')['presence'].agg(['mean', 'count']).rename(columns={'mean': 'user_attendance_rate', 'count': 'user_total_meetings'})
-df = pd.merge(df, user_history, on='user_id', how='left')
-
-# For users with no history, fill their rate with the global average
-global_attendance_rate = df['presence'].mean()
-df['user_attendance_rate'].fillna(global_attendance_rate, inplace=True)
-df['user_total_meetings'].fillna(0, inplace=True)
-print("-> Feature engineering complete.")
-
-# --- Finalize Features for Training ---
-features = [
-    "user_id", "class_id", "course_id", "id_matiere", "id_professeur",
-    "meeting_weekday", "meeting_hour", "user_attendance_rate", "user_total_meetings"
-]
+from extract import (UNIFIED_QUERY, CLASS_RANGE_QUERY, DEFAULT_CHUNK_SIZE, extract_partitioned, peak_rss_mb,
+                     read_extract, sort_extract, stream_to_parquet)
+from db import Database, connect as db_connect
+from enrollment_index import use_enrollment_index
+from features import FEATURES, build_feature_matrix
+import instrumentation
+from instrumentation import span
+from model_registry import DEFAULT_REGISTRY, PICKLE_FILENAME, ModelRegistry
+from rolling_history import NO_DAY, rolling_history, to_day_numbers
+
+features = FEATURES
 target = "presence"
 
-# Drop any rows that might still have nulls in crucial feature columns
-df.dropna(subset=features, inplace=True)
-print(f"-> Training with {len(df)} records after cleaning.")
-print(f"-> Features for model: {features}")
-
-X = df[features]
-y = df[target]
-
-if len(df) < 10:
-    print("ERROR: Not enough data to train the model after cleaning.")
-    cnx.close()
-    exit()
-
-# --- Model Training ---
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
-print("Training RandomForestClassifier...")
-model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', n_jobs=-1, min_samples_leaf=5)
-model.fit(X_train, y_train)
-print("-> Model training complete.")
-
-# --- Model Evaluation (printed to logs) ---
-print("\n--- Model Evaluation ---")
-y_pred = model.predict(X_test)
-print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
-
-print("\n--- Feature Importances ---")
-feature_imp = pd.Series(model.feature_importances_, index=features).sort_values(ascending=False)
-print(feature_imp)
-
-# --- Save Model using Pickle ---
 model_filename = "attendance_model.pkl"
-try:
-    with open(model_filename, 'wb') as file:
+extract_filename = "training_extract.parquet"
+
+# Incremental mode: trees added per retrain, and the most trees the forest keeps.
+DEFAULT_NEW_TREES = 30
+DEFAULT_MAX_TREES = 150
+
+# Every retrain, full or incremental, is scored on the meetings of the last this many days.
+DEFAULT_HOLDOUT_DAYS = 14
+
+
+class TrainingError(Exception):
+    """A training run cannot go on; main() prints it as an ERROR line and exits with status 1."""
+
+
+def connect():
+    print("Connecting to the database...")
+    try:
+        # Set a longer timeout to handle potentially large data transfers
+        cnx = db_connect(connect_timeout=300)
+        print("-> Connection successful.")
+        return cnx
+    except mysql.connector.Error as err:
+        raise TrainingError(f"Database Connection Error: {err}") from err
+
+
+def extract(cnx, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, extract_path=extract_filename, enrollment_index=False,
+            workers=1, partitions=None, database=None):
+    """
+    Pulls the training rows. In streaming mode the rows are spilled chunk by chunk to a
+    Parquet file with compact dtypes, so the extraction holds one chunk of raw rows at a
+    time instead of the whole driver result set. The file is then loaded and sorted in
+    full: feature engineering and the fit still need the whole (compact) extract in memory.
+    With enrollment_index the class membership join goes through the
+    enrollment_parcours_class side table.
+
+    With workers > 1 the rows are pulled as one query per class id range, `workers` at a
+    time on a pool of as many connections (`database`, else a new MySQL pool), and `cnx` is
+    not used (train() passes None). Either way the rows come back in the same order
+    (extract.EXTRACT_ORDER).
+    """
+    print("Pulling data for training...")
+    rewrite = use_enrollment_index if enrollment_index else (lambda query: query)
+    try:
+        if workers > 1:
+            pool = database or Database.mysql(size=workers, connect_timeout=300)
+            try:
+                df, _ = extract_partitioned(pool, workers, partitions, rewrite(CLASS_RANGE_QUERY))
+            finally:
+                if database is None:
+                    pool.close()
+        elif stream:
+            stats = stream_to_parquet(cnx, extract_path, rewrite(UNIFIED_QUERY), chunk_size)
+            # An empty result writes no file.
+            df = sort_extract(read_extract(extract_path)) if stats['rows'] else pd.DataFrame()
+        else:
+            df = sort_extract(pd.read_sql(rewrite(UNIFIED_QUERY), cnx))
+    except Exception as e:
+        raise TrainingError(f"Failed to execute SQL query: {e}") from e
+
+    if df.empty:
+        raise TrainingError("Query returned 0 rows. Cannot train model.")
+
+    print(f"-> Successfully pulled {len(df)} records.")
+    return df
+
+
+def engineer_features(df, with_days=False):
+    """
+    Returns the float32 feature matrix and the presence labels for the training rows and,
+    with_days=True, the scheduled day of each row as days since the epoch (NO_DAY when missing).
+    """
+    print("Performing feature engineering...")
+    # Drop any rows that have nulls in the id feature columns
+    df = df.dropna(subset=features[:5])
+    presence = df[target].to_numpy(dtype=np.int64)
+
+    # Attendance rate and meeting count of each user over the meetings *before* the row's
+    # (by scheduled_day, then meeting_id), so no row sees its own label or later ones.
+    # Rows without earlier meetings get the global average.
+    # Missing schedule data becomes weekday 0 and hour 0, a neutral value.
+    history = rolling_history(df['user_id'], df['scheduled_day'], df['meeting_id'], presence,
+                              default_rate=presence.mean())
+    rows = {name: df[name] for name in ('user_id', 'class_id', 'course_id', 'id_matiere', 'id_professeur',
+                                        'scheduled_day', 'scheduled_hour')}
+    rows['user_attendance_rate'] = history['user_attendance_rate']
+    rows['user_total_meetings'] = history['user_total_meetings']
+    X = build_feature_matrix(rows)
+    print("-> Feature engineering complete.")
+    print(f"-> Training with {len(X)} records after cleaning.")
+    print(f"-> Features for model: {features}")
+    if with_days:
+        return X, presence, to_day_numbers(df['scheduled_day'])
+    return X, presence
+
+
+def fit(X_train, y_train):
+    print("Training RandomForestClassifier...")
+    model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', n_jobs=-1, min_samples_leaf=5)
+    model.fit(X_train, y_train)
+    print("-> Model training complete.")
+    return model
+
+
+def data_through(days):
+    """Latest scheduled day (ISO date) among day numbers from engineer_features, None if none is known."""
+    dated = days[days != NO_DAY]
+    return str(np.datetime64(int(dated.max()), 'D')) if len(dated) else None
+
+
+def time_holdout(days, holdout_days=DEFAULT_HOLDOUT_DAYS):
+    """
+    Mask of the held-out rows: those scheduled in the last `holdout_days` days of the
+    extract (rows without a scheduled day are never held out). A full refit and an
+    incremental retrain of the same extract are scored on the same later time slice, so
+    their accuracies can be compared.
+    """
+    dated = days != NO_DAY
+    if not dated.any():
+        return np.zeros(len(days), dtype=bool)
+    return dated & (days > days[dated].max() - holdout_days)
+
+
+def fit_incremental(model, X_new, y_new, new_trees=DEFAULT_NEW_TREES, max_trees=DEFAULT_MAX_TREES):
+    """
+    Adds `new_trees` trees fitted on the new rows only to an already fitted forest
+    (warm_start), then drops the oldest trees beyond `max_trees`, so the forest follows the
+    recent history while its size, and the cost of a prediction, stays bounded.
+    """
+    print(f"Adding {new_trees} trees fitted on {len(X_new)} new records...")
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees)
+    with warnings.catch_warnings():
+        # The 'balanced' class weights of the new trees come from the new rows only, which is intended.
+        warnings.filterwarnings('ignore', message='class_weight presets')
+        model.fit(X_new, y_new)
+    dropped = max(len(model.estimators_) - max_trees, 0)
+    if dropped:
+        model.estimators_ = model.estimators_[dropped:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    print(f"-> Forest now has {len(model.estimators_)} trees ({dropped} oldest dropped).")
+    return model
+
+
+def load_base_model(registry_root=DEFAULT_REGISTRY):
+    """
+    (model, metadata) of the registry's current version, the starting point of an
+    incremental retrain, or (None, None) if there is none.
+    """
+    registry = ModelRegistry(registry_root)
+    version = registry.current_version()
+    if version is None:
+        return None, None
+    with open(os.path.join(registry.path(version), PICKLE_FILENAME), 'rb') as file:
+        model = pickle.load(file)
+    return model, registry.metadata(version)
+
+
+def evaluate(model, X_test, y_test):
+    # --- Model Evaluation (printed to logs) ---
+    print("\n--- Model Evaluation ---")
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"Accuracy: {accuracy:.4f}")
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+
+    print("\n--- Feature Importances ---")
+    feature_imp = pd.Series(model.feature_importances_, index=features).sort_values(ascending=False)
+    print(feature_imp)
+    return accuracy
+
+
+def save(model, path=model_filename, metrics=None, registry_root=DEFAULT_REGISTRY):
+    # --- Save Model using Pickle ---
+    # Written next to the target and renamed over it, so a prediction reading the old
+    # file never sees a half-written one.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
         pickle.dump(model, file)
-    print(f"\n-> SUCCESS: Model saved to {model_filename}")
-except Exception as e:
-    print(f"\nERROR: Could not save the model file. Reason: {e}")
-    cnx.close()
-    exit()
-
-cnx.close()
-print("-> Connection closed.")
\ No newline at end of file
+    os.replace(tmp_path, path)
+    print(f"\n-> SUCCESS: Model saved to {path}")
+
+    # --- New registry version (memory-mappable artifact), made current atomically ---
+    version = ModelRegistry(registry_root).publish(model, features, metrics)
+    print(f"-> Registered as model version {version} in {registry_root}")
+    return version
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the attendance prediction model.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Extract in bounded chunks to an on-disk Parquet file instead of one read_sql call.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows per chunk in streaming mode (default: %(default)s).")
+    parser.add_argument('--extract-path', default=extract_filename,
+                        help="Parquet file written in streaming mode (default: %(default)s).")
+    parser.add_argument('--use-enrollment-index', action='store_true',
+                        help="Join class membership through the enrollment side tables (see enrollment_index.py).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Extract with one query per class id range, this many at a time on as many connections "
+                             "(default: %(default)s, the single query).")
+    parser.add_argument('--partitions', type=int,
+                        help="Class id ranges for --workers (default: 4 per worker).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Grow the current model with trees fitted on the meetings scheduled after its training data, "
+                             "instead of refitting on the whole history.")
+    parser.add_argument('--new-trees', type=int, default=DEFAULT_NEW_TREES,
+                        help="Trees added by an incremental retrain (default: %(default)s).")
+    parser.add_argument('--max-trees', type=int, default=DEFAULT_MAX_TREES,
+                        help="Oldest trees beyond this many are dropped by an incremental retrain (default: %(default)s).")
+    parser.add_argument('--holdout-days', type=int, default=DEFAULT_HOLDOUT_DAYS,
+                        help="Score the model on the meetings of the last this many days, which it is not trained on "
+                             "(default: %(default)s).")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write per-stage timing and memory as JSON lines to PATH or 'stderr' (see instrumentation.py).")
+    parser.add_argument('--profile', choices=instrumentation.PROFILE_MODES,
+                        help="With --trace, also profile the run with cProfile or tracemalloc.")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.stream:
+        parser.error("--workers and --stream cannot be combined")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        instrumentation.enable(args.trace, args.profile)
+    try:
+        with span('train') as run_span:
+            train(args, run_span)
+    except TrainingError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+
+def train(args, run_span):
+    started = time.perf_counter()
+    # With --workers > 1 extract() pulls the rows on a pool of its own; no other connection is used.
+    cnx = None
+    if args.workers == 1:
+        with span('train.connect'):
+            cnx = connect()
+    try:
+        _train(cnx, args, run_span, started)
+    finally:
+        if cnx is not None:
+            cnx.close()
+            print("-> Connection closed.")
+
+
+def _train(cnx, args, run_span, started):
+    with span('train.extract', stream=args.stream, workers=args.workers) as stage:
+        df = extract(cnx, args.stream, args.chunk_size, args.extract_path, args.use_enrollment_index,
+                     args.workers, args.partitions)
+        stage.set(rows=len(df))
+    with span('train.features') as stage:
+        X, y, days = engineer_features(df, with_days=True)
+        stage.set(rows=len(X))
+    held_out = time_holdout(days, args.holdout_days)
+    train_rows = ~held_out
+
+    with span('train.load_base_model'):
+        base_model, base = load_base_model() if args.incremental else (None, None)
+    mode = 'full'
+    if args.incremental:
+        cutoff = (base or {}).get('metrics', {}).get('data_through')
+        if base_model is None or cutoff is None:
+            print("-> No current model with a recorded training cutoff; doing a full refit.")
+        else:
+            mode = 'incremental'
+            train_rows &= (days != NO_DAY) & (days > to_day_numbers([cutoff])[0])
+            print(f"-> Incremental retrain of {base['version']}: {train_rows.sum()} records scheduled after {cutoff}.")
+    run_span.set(mode=mode)
+
+    X_train, y_train, X_test, y_test = X[train_rows], y[train_rows], X[held_out], y[held_out]
+    if len(X_train) < 10 or len(np.unique(y_train)) < 2 or len(X_test) == 0:
+        raise TrainingError("Not enough data to train the model after cleaning.")
+
+    # --- Model Training ---
+    print(f"-> Holding out the {len(X_test)} records of the last {args.holdout_days} days for evaluation.")
+    fit_started = time.perf_counter()
+    with span('train.fit', rows=len(X_train), mode=mode):
+        if mode == 'incremental':
+            model = fit_incremental(base_model, X_train, y_train, args.new_trees, args.max_trees)
+        else:
+            model = fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+    with span('train.evaluate', rows=len(X_test)):
+        accuracy = evaluate(model, X_test, y_test)
+    metrics = {
+        'accuracy': round(float(accuracy), 6),
+        'n_train': int(len(X_train)),
+        'n_test': int(len(X_test)),
+        'holdout_days': args.holdout_days,
+        'holdout_from': str(np.datetime64(int(days[held_out].min()), 'D')),
+        'fit_seconds': round(fit_seconds, 2),
+        'training_seconds': round(time.perf_counter() - started, 2),
+        'mode': mode,
+        'n_estimators': len(model.estimators_),
+        # The next incremental retrain starts after the last day this model was fitted on.
+        'data_through': data_through(days[train_rows]),
+    }
+    if mode == 'incremental':
+        metrics['base_version'] = base['version']
+    peak = peak_rss_mb()
+    if peak is not None:
+        metrics['peak_rss_mb'] = round(peak, 1)
+
+    try:
+        with span('train.save'):
+            save(model, metrics=metrics)
+    except Exception as e:
+        raise TrainingError(f"Could not save the model file. Reason: {e}") from e
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+Asynchronous, resumable training jobs.
+
+Training runs as a detached process instead of inside the HTTP request. Each stage of
+train_model.py (extract, features, fit, evaluate, save) records its status, wall time and
+peak memory in a SQLite job table, and leaves its output in the job's work directory so a
+failed or cancelled job can be resumed from the first unfinished stage:
+
+    python training_jobs.py submit [--use-enrollment-index] [--chunk-size N]   # prints {"job_id": ...}
+    python training_jobs.py status 7 [--json]
+    python training_jobs.py list
+    python training_jobs.py cancel 7
+    python training_jobs.py resume 7
+
+Peak memory is sampled from the process RSS while each stage runs (Linux), and falls back
+to the process-wide peak from getrusage elsewhere.
+"""
+import argparse
+import datetime
+import json
+import os
+import pickle
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from extract import DEFAULT_CHUNK_SIZE, peak_rss_mb
+from model_registry import DEFAULT_REGISTRY
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JOBS_PATH = os.path.join(SCRIPT_DIR, 'training_jobs.sqlite')
+DEFAULT_WORK_DIR = os.path.join(SCRIPT_DIR, 'training_jobs')
+
+STAGES = ('extract', 'features', 'fit', 'evaluate', 'save')
+FINISHED = ('succeeded', 'failed', 'cancelled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    pid INTEGER,
+    current_stage TEXT,
+    message TEXT,
+    model_version TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    seconds REAL,
+    peak_rss_mb REAL,
+    detail TEXT,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def current_rss_mb():
+    """Current resident set size in MB (Linux), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemorySampler:
+    """Samples the process RSS on a background thread; `peak_mb` is the maximum seen."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None:
+                self.peak_mb = max(self.peak_mb or 0.0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.peak_mb is None:
+            self.peak_mb = peak_rss_mb()
+
+
+class JobStore:
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.path = path
+        # The runner and the CLI/web process write concurrently; WAL keeps readers unblocked.
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def submit(self, options):
+        cur = self.conn.execute("INSERT INTO jobs (status, options, created_at) VALUES ('queued', ?, ?)",
+                                (json.dumps(options), _now()))
+        return cur.lastrowid
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown training job: {job_id}")
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['stages'] = []
+        for stage in STAGES:
+            srow = self.conn.execute("SELECT * FROM job_stages WHERE job_id = ? AND stage = ?", (job_id, stage)).fetchone()
+            entry = dict(srow) if srow else {'stage': stage, 'status': 'pending'}
+            entry.pop('job_id', None)
+            if entry.get('detail'):
+                entry['detail'] = json.loads(entry['detail'])
+            job['stages'].append(entry)
+        return job
+
+    def list(self, limit=20):
+        rows = self.conn.execute("SELECT id FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row['id']) for row in rows]
+
+    def update(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def stage_started(self, job_id, stage):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO job_stages (job_id, stage, status, started_at) VALUES (?, ?, 'running', ?)",
+            (job_id, stage, _now()))
+        self.update(job_id, current_stage=stage)
+
+    def stage_finished(self, job_id, stage, status, seconds, peak_mb, detail=None):
+        self.conn.execute(
+            "UPDATE job_stages SET status = ?, seconds = ?, peak_rss_mb = ?, detail = ? WHERE job_id = ? AND stage = ?",
+            (status, round(seconds, 3), round(peak_mb, 1) if peak_mb is not None else None,
+             json.dumps(detail) if detail is not None else None, job_id, stage))
+
+    def stage_status(self, job_id, stage):
+        row = self.conn.execute("SELECT status FROM job_stages WHERE job_id = ? AND stage = ?", (job_id, stage)).fetchone()
+        return row['status'] if row else None
+
+    def cancel_requested(self, job_id):
+        row = self.conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+
+# --- STAGES ---
+# Each stage reads the previous stage's output from the job directory and writes its own,
+# which is what makes a job resumable.
+
+def _connect(options):
+    if options.get('sqlite'):
+        from db import connect
+        return connect(sqlite=options['sqlite'])
+    import train_model
+    return train_model.connect()
+
+
+def _split(job_dir, options):
+    """(X_train, X_test, y_train, y_test), held out on the last days as train_model.py does."""
+    import numpy as np
+    import train_model
+    X, y, days = (np.load(os.path.join(job_dir, f"{name}.npy")) for name in ('X', 'y', 'days'))
+    held_out = train_model.time_holdout(days, options.get('holdout_days', train_model.DEFAULT_HOLDOUT_DAYS))
+    return X[~held_out], X[held_out], y[~held_out], y[held_out]
+
+
+def stage_extract(job_dir, options, context):
+    import train_model
+    cnx = _connect(options)
+    try:
+        df = train_model.extract(cnx, stream=True, chunk_size=options.get('chunk_size', DEFAULT_CHUNK_SIZE),
+                                 extract_path=os.path.join(job_dir, 'extract.parquet'),
+                                 enrollment_index=options.get('use_enrollment_index', False))
+    finally:
+        cnx.close()
+    return {'rows': len(df)}
+
+
+def stage_features(job_dir, options, context):
+    import numpy as np
+    import train_model
+    from extract import read_extract, sort_extract
+    df = sort_extract(read_extract(os.path.join(job_dir, 'extract.parquet')))
+    X, y, days = train_model.engineer_features(df, with_days=True)
+    held_out = train_model.time_holdout(days, options.get('holdout_days', train_model.DEFAULT_HOLDOUT_DAYS))
+    if (~held_out).sum() < 10 or not held_out.any():
+        raise RuntimeError("Not enough data to train the model after cleaning.")
+    np.save(os.path.join(job_dir, 'X.npy'), X)
+    np.save(os.path.join(job_dir, 'y.npy'), y)
+    np.save(os.path.join(job_dir, 'days.npy'), days)
+    return {'rows': len(X), 'data_through': train_model.data_through(days[~held_out]),
+            'holdout_from': str(np.datetime64(int(days[held_out].min()), 'D'))}
+
+
+def stage_fit(job_dir, options, context):
+    import train_model
+    X_train, _, y_train, _ = _split(job_dir, options)
+    model = train_model.fit(X_train, y_train)
+    with open(os.path.join(job_dir, 'model.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+    return {'n_train': len(X_train), 'n_estimators': len(model.estimators_)}
+
+
+def _load_job_model(job_dir):
+    with open(os.path.join(job_dir, 'model.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+def stage_evaluate(job_dir, options, context):
+    import train_model
+    X_train, X_test, _, y_test = _split(job_dir, options)
+    accuracy = train_model.evaluate(_load_job_model(job_dir), X_test, y_test)
+    return {'accuracy': round(float(accuracy), 6), 'n_train': len(X_train), 'n_test': len(X_test),
+            'holdout_days': options.get('holdout_days', train_model.DEFAULT_HOLDOUT_DAYS),
+            'holdout_from': context['features'].get('holdout_from')}
+
+
+def stage_save(job_dir, options, context):
+    import train_model
+    metrics = dict(context['evaluate'])
+    metrics['fit_seconds'] = round(context['seconds']['fit'], 2)
+    metrics['training_seconds'] = round(sum(context['seconds'].values()), 2)
+    # Lets a later `train_model.py --incremental` start from this version.
+    metrics['data_through'] = context['features'].get('data_through')
+    version = train_model.save(_load_job_model(job_dir),
+                               options.get('model_path') or os.path.join(SCRIPT_DIR, train_model.model_filename),
+                               metrics, options.get('registry') or DEFAULT_REGISTRY)
+    return {'model_version': version}
+
+
+STAGE_FUNCTIONS = {
+    'extract': stage_extract,
+    'features': stage_features,
+    'fit': stage_fit,
+    'evaluate': stage_evaluate,
+    'save': stage_save,
+}
+
+
+def _raise_cancelled(signum, frame):
+    raise JobCancelled()
+
+
+def run_job(store, job_id, work_dir=DEFAULT_WORK_DIR):
+    """Runs the job's unfinished stages in this process. Returns the final status."""
+    job = store.get(job_id)
+    options = job['options']
+    job_dir = os.path.join(work_dir, str(job_id))
+    os.makedirs(job_dir, exist_ok=True)
+    signal.signal(signal.SIGTERM, _raise_cancelled)
+    store.update(job_id, status='running', pid=os.getpid(), started_at=job['started_at'] or _now(),
+                 finished_at=None, message=None)
+
+    # Results and timings of stages finished by a previous attempt.
+    context = {'seconds': {}}
+    for entry in job['stages']:
+        if entry['status'] == 'succeeded':
+            context[entry['stage']] = entry.get('detail') or {}
+            context['seconds'][entry['stage']] = entry['seconds']
+
+    status, message = 'succeeded', None
+    for stage in STAGES:
+        if stage in context:
+            print(f"-> Stage {stage}: already done, skipped")
+            continue
+        started = time.perf_counter()
+        sampler = MemorySampler()
+        try:
+            if store.cancel_requested(job_id):
+                raise JobCancelled()
+            store.stage_started(job_id, stage)
+            print(f"-> Stage {stage}...", flush=True)
+            with sampler:
+                detail = STAGE_FUNCTIONS[stage](job_dir, options, context)
+        except (JobCancelled, KeyboardInterrupt):
+            status, message = 'cancelled', f"Cancelled during {stage}"
+        except BaseException as e:  # e.g. train_model.TrainingError, recorded as the job's message
+            status, message = 'failed', f"{stage}: {type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+        if status != 'succeeded':
+            if store.stage_status(job_id, stage) == 'running':
+                store.stage_finished(job_id, stage, status, seconds, sampler.peak_mb)
+            break
+        store.stage_finished(job_id, stage, 'succeeded', seconds, sampler.peak_mb, detail)
+        context[stage] = detail
+        context['seconds'][stage] = seconds
+        print(f"-> Stage {stage} done in {seconds:.2f}s (peak RSS {sampler.peak_mb or 0:.0f} MB)", flush=True)
+
+    fields = {'status': status, 'message': message, 'finished_at': _now(), 'current_stage': None}
+    if status == 'succeeded':
+        fields['model_version'] = context['save']['model_version']
+        # Intermediate outputs are only needed to resume.
+        for name in ('extract.parquet', 'X.npy', 'y.npy', 'days.npy', 'model.pkl'):
+            path = os.path.join(job_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+    store.update(job_id, **fields)
+    return status
+
+
+def spawn_runner(job_id, jobs_path=DEFAULT_JOBS_PATH, work_dir=DEFAULT_WORK_DIR):
+    """Starts `run` for the job in a detached process, logging to <work_dir>/<job_id>/job.log."""
+    job_dir = os.path.join(work_dir, str(job_id))
+    os.makedirs(job_dir, exist_ok=True)
+    log = open(os.path.join(job_dir, 'job.log'), 'ab')
+    kwargs = {}
+    if os.name == 'posix':
+        kwargs['start_new_session'] = True
+    else:
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    try:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--jobs', jobs_path, '--work-dir', work_dir, 'run', str(job_id)],
+            cwd=SCRIPT_DIR, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+    finally:
+        log.close()
+    return process.pid
+
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cancel_job(store, job_id):
+    """Asks the runner to stop (SIGTERM); a job whose runner is gone is marked cancelled directly."""
+    job = store.get(job_id)
+    if job['status'] in FINISHED:
+        return job['status']
+    store.update(job_id, cancel_requested=1)
+    if _process_alive(job['pid']):
+        os.kill(job['pid'], signal.SIGTERM)
+        return 'cancelling'
+    store.update(job_id, status='cancelled', message='Cancelled before it started', finished_at=_now())
+    return 'cancelled'
+
+
+def print_job(job):
+    print(f"Job {job['id']}: {job['status']}"
+          + (f" ({job['current_stage']})" if job['current_stage'] else '')
+          + (f" -> model {job['model_version']}" if job['model_version'] else '')
+          + (f" - {job['message']}" if job['message'] else ''))
+    print(f"  {'stage':<10} {'status':<10} {'seconds':>9} {'peak MB':>9}  detail")
+    for stage in job['stages']:
+        seconds = f"{stage['seconds']:.2f}" if stage.get('seconds') is not None else '-'
+        peak = f"{stage['peak_rss_mb']:.0f}" if stage.get('peak_rss_mb') is not None else '-'
+        detail = json.dumps(stage['detail']) if stage.get('detail') else ''
+        print(f"  {stage['stage']:<10} {stage['status']:<10} {seconds:>9} {peak:>9}  {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', default=DEFAULT_JOBS_PATH, help="Job table (SQLite file).")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="Per-job working directories.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    submit = sub.add_parser('submit', help="Queue a training job and start it in the background.")
+    submit.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    submit.add_argument('--use-enrollment-index', action='store_true')
+    submit.add_argument('--holdout-days', type=int, help="Days held out for evaluation (default: as train_model.py).")
+    submit.add_argument('--sqlite', help="Train from a SQLite copy of the schema (e.g. synthetic_db.py) instead of MySQL.")
+    submit.add_argument('--model-path', help="Where to write the pickle (default: attendance_model.pkl next to this script).")
+    submit.add_argument('--registry', help="Model registry to publish to (default: %s)." % DEFAULT_REGISTRY)
+    submit.add_argument('--foreground', action='store_true', help="Run in this process instead of detaching.")
+    for name, help_text in (('status', "Show a job's stages."), ('cancel', "Cancel a job."),
+                            ('resume', "Restart a failed or cancelled job from its first unfinished stage."),
+                            ('run', "Run a job in this process (used by submit).")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('job_id', type=int)
+        if name == 'status':
+            cmd.add_argument('--json', action='store_true')
+    list_cmd = sub.add_parser('list', help="Recent jobs.")
+    list_cmd.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    store = JobStore(args.jobs)
+    try:
+        if args.command == 'submit':
+            options = {'chunk_size': args.chunk_size, 'use_enrollment_index': args.use_enrollment_index}
+            if args.holdout_days:
+                options['holdout_days'] = args.holdout_days
+            for name in ('sqlite', 'model_path', 'registry'):
+                if getattr(args, name):
+                    options[name] = os.path.abspath(getattr(args, name))
+            job_id = store.submit(options)
+            if args.foreground:
+                run_job(store, job_id, args.work_dir)
+                print_job(store.get(job_id))
+            else:
+                pid = spawn_runner(job_id, args.jobs, args.work_dir)
+                store.update(job_id, pid=pid)
+                print(json.dumps({'job_id': job_id, 'pid': pid}))
+        elif args.command == 'run':
+            sys.exit(0 if run_job(store, args.job_id, args.work_dir) == 'succeeded' else 1)
+        elif args.command == 'status':
+            job = store.get(args.job_id)
+            if job['status'] == 'running' and not _process_alive(job['pid']):
+                store.update(args.job_id, status='failed', message='Runner process exited unexpectedly', finished_at=_now())
+                job = store.get(args.job_id)
+            if args.json:
+                print(json.dumps(job))
+            else:
+                print_job(job)
+        elif args.command == 'list':
+            jobs = store.list()
+            if args.json:
+                print(json.dumps(jobs))
+                return
+            for job in jobs:
+                print(f"{job['id']:>5}  {job['status']:<10} {job['created_at']}  {job['current_stage'] or '':<9} "
+                      f"{job['model_version'] or ''}")
+        elif args.command == 'cancel':
+            print(json.dumps({'job_id': args.job_id, 'status': cancel_job(store, args.job_id)}))
+        elif args.command == 'resume':
+            job = store.get(args.job_id)
+            if job['status'] not in ('failed', 'cancelled'):
+                print(f"ERROR: job {args.job_id} is {job['status']}; only failed or cancelled jobs can be resumed.")
+                sys.exit(1)
+            store.update(args.job_id, status='queued', cancel_requested=0)
+            pid = spawn_runner(args.job_id, args.jobs, args.work_dir)
+            store.update(args.job_id, pid=pid)
+            print(json.dumps({'job_id': args.job_id, 'pid': pid}))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Data access for the user analytics page of pred_train/app.py.
+
+cnx is a db.PooledConnection. Each read uses the materialized stores when they have been
+built, and otherwise the live queries the page used to run itself:
+
+    user_record()     feature_store.py   (total and attended meetings of the user)
+    user_meetings()   meeting_stats.py   (per-meeting attendance, enrollment and schedule)
+
+The stores are opened per call (SQLite connections cannot be shared between the threads
+Streamlit runs the page in), which costs well under a millisecond.
+"""
+from feature_store import DEFAULT_STORE_PATH, open_store_if_present
+from meeting_stats import DEFAULT_STATS_PATH, open_stats_if_present
+
+USERS_QUERY = "SELECT DISTINCT user_id as id, CAST(user_id AS CHAR) as display_name FROM parcour_group_pivot ORDER BY user_id"
+
+PERSONAL_QUERY = """
+SELECT COUNT(m.id) AS total, COUNT(pm.id) AS attended
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+LEFT JOIN participation_meetings pm ON m.id = pm.id_meeting AND p.user_id = pm.id_user
+WHERE p.user_id = %s;
+"""
+
+USER_MEETINGS_QUERY = """
+WITH MeetingScheduleLink AS (
+    SELECT
+        pm.id_meeting,
+        MAX(pcj.day) AS scheduled_day,
+        MAX(pcj.heure_from) AS scheduled_hour
+    FROM participation_meetings pm
+    JOIN meetings m ON pm.id_meeting = m.id
+    JOIN planning_cours_journaliers pcj ON m.id_classe = pcj.id_classe AND DATE(pm.entree) = pcj.day
+    GROUP BY pm.id_meeting
+)
+SELECT
+    m.titre_fr,
+    msl.scheduled_day,
+    msl.scheduled_hour,
+    (SELECT COUNT(DISTINCT id_user) FROM participation_meetings WHERE id_meeting = m.id) AS total_attended,
+    (SELECT COUNT(DISTINCT p_inner.user_id) FROM parcour_group_pivot p_inner JOIN parcours_classes pc_inner ON p_inner.id_parcour_classes = pc_inner.id WHERE FIND_IN_SET(c.id, pc_inner.classes)) AS total_enrolled
+FROM parcour_group_pivot p
+JOIN parcours_classes pc ON p.id_parcour_classes = pc.id
+JOIN classes c ON FIND_IN_SET(c.id, pc.classes)
+JOIN meetings m ON m.id_classe = c.id
+LEFT JOIN MeetingScheduleLink msl ON m.id = msl.id_meeting
+WHERE p.user_id = %s
+ORDER BY m.id DESC;
+"""
+
+MEETING_COLUMNS = ['titre_fr', 'scheduled_day', 'scheduled_hour', 'total_attended', 'total_enrolled']
+
+
+class UserAnalytics:
+    def __init__(self, cnx, store_path=DEFAULT_STORE_PATH, stats_path=DEFAULT_STATS_PATH):
+        self.cnx = cnx
+        self.store_path = store_path
+        self.stats_path = stats_path
+
+    def users(self):
+        """DataFrame of the enrolled users (id, display_name)."""
+        return self.cnx.query_df(USERS_QUERY)
+
+    def user_record(self, user_id):
+        """(total enrolled meetings, attended meetings) of a user."""
+        store = open_store_if_present(self.store_path)
+        if store is not None:
+            try:
+                return store.get_counts(user_id)
+            finally:
+                store.close()
+        df = self.cnx.query_df(PERSONAL_QUERY, (int(user_id),))
+        return int(df['total'].iloc[0]), int(df['attended'].iloc[0])
+
+    def user_meetings(self, user_id):
+        """The user's meetings, newest first, with MEETING_COLUMNS."""
+        stats = open_stats_if_present(self.stats_path)
+        if stats is not None:
+            try:
+                return stats.user_meetings(user_id)[MEETING_COLUMNS]
+            finally:
+                stats.close()
+        return self.cnx.query_df(USER_MEETINGS_QUERY, (int(user_id),))
@@ -0,0 +1,147 @@
+"""
+Binary columnar wire format for the PHP <-> Python prediction bridge.
+
+The JSON request repeats the nine feature names for every user and has to be parsed
+number by number; the binary form sends each feature as one packed little-endian array:
+
+    magic        4 bytes     b'ATF1' (features) or b'ATP1' (predictions)
+    header size  uint32 LE
+    header       UTF-8 JSON  {"rows": n, "columns": [["user_id", "<u8"], ["class_id", "<u4"], ...]}
+    body         one array of n values per column, in header order, back to back
+
+Column types are NumPy dtype strings limited to what PHP's pack()/unpack() write in a
+fixed byte order: '|u1' (C), '<u4' (V), '<u8' (P), '<f4' (g) and '<f8' (e); missing
+values are sent as NaN in a float column. The header names the columns, so the sender
+may order them as it likes, and decode_features() returns the matrix in FEATURES order.
+
+A prediction request (features) is answered with a predictions payload: user_id in the
+type it was sent with, probability_of_presence as '<f8' and prediction as '|u1'.
+
+    payload = encode_features(user_ids, X)            # X in FEATURES order
+    user_ids, X = decode_features(payload)            # float32, as matrix_from_records() builds it
+    body = encode_predictions(user_ids, probas, predictions)
+    records = decode_predictions(body)                # the JSON contract's list of dicts
+"""
+import json
+import struct
+
+import numpy as np
+
+from features import FEATURES
+
+FEATURES_MAGIC = b'ATF1'
+PREDICTIONS_MAGIC = b'ATP1'
+
+# Content types of the two payloads over HTTP (prediction_server.py negotiates on them).
+FEATURES_CONTENT_TYPE = 'application/vnd.attendance.features'
+PREDICTIONS_CONTENT_TYPE = 'application/vnd.attendance.predictions'
+
+WIRE_TYPES = ('|u1', '<u4', '<u8', '<f4', '<f8')
+
+# The column types PredictionController sends (PredictionController::FEATURE_WIRE_TYPES);
+# the columns that may be NULL in the database are floats.
+FEATURE_TYPES = {
+    'user_id': '<u8',
+    'class_id': '<u4',
+    'course_id': '<u4',
+    'id_matiere': '<f4',
+    'id_professeur': '<f4',
+    'meeting_weekday': '|u1',
+    'meeting_hour': '|u1',
+    'user_attendance_rate': '<f4',
+    'user_total_meetings': '<u4',
+}
+
+_HEADER_SIZE = struct.Struct('<I')
+
+
+def is_features_payload(payload):
+    return isinstance(payload, (bytes, bytearray, memoryview)) and bytes(payload[:4]) == FEATURES_MAGIC
+
+
+def is_predictions_payload(payload):
+    return isinstance(payload, (bytes, bytearray, memoryview)) and bytes(payload[:4]) == PREDICTIONS_MAGIC
+
+
+def encode(magic, columns):
+    """Payload for [(name, wire type, values), ...], all columns of the same length."""
+    rows = len(columns[0][2]) if columns else 0
+    header = json.dumps({'rows': rows, 'columns': [[name, wire_type] for name, wire_type, _ in columns]},
+                        separators=(',', ':')).encode('utf-8')
+    parts = [magic, _HEADER_SIZE.pack(len(header)), header]
+    for name, wire_type, values in columns:
+        if wire_type not in WIRE_TYPES:
+            raise ValueError(f"Unsupported wire type {wire_type!r} for column {name}")
+        values = np.asarray(values)
+        if len(values) != rows:
+            raise ValueError(f"Column {name} has {len(values)} values, expected {rows}")
+        parts.append(values.astype(wire_type, copy=False).tobytes())
+    return b''.join(parts)
+
+
+def decode(magic, payload):
+    """{name: array} of a payload, in header order; the arrays are read-only views of the payload."""
+    payload = memoryview(payload)
+    if bytes(payload[:4]) != magic:
+        raise ValueError(f"Not a {magic.decode()} payload")
+    (header_size,) = _HEADER_SIZE.unpack_from(payload, 4)
+    offset = 4 + _HEADER_SIZE.size + header_size
+    header = json.loads(bytes(payload[4 + _HEADER_SIZE.size:offset]))
+    rows = header['rows']
+    columns = {}
+    for name, wire_type in header['columns']:
+        if wire_type not in WIRE_TYPES:
+            raise ValueError(f"Unsupported wire type {wire_type!r} for column {name}")
+        size = rows * np.dtype(wire_type).itemsize
+        if offset + size > len(payload):
+            raise ValueError(f"Truncated payload: column {name} needs {size} bytes at offset {offset}")
+        columns[name] = np.frombuffer(payload, dtype=wire_type, count=rows, offset=offset)
+        offset += size
+    if offset != len(payload):
+        raise ValueError(f"Payload has {len(payload) - offset} bytes after its last column")
+    return columns
+
+
+def encode_features(user_ids, X, types=FEATURE_TYPES):
+    """Features payload of a FEATURES-ordered matrix; user_ids are sent in the user_id column."""
+    X = np.asarray(X)
+    columns = [('user_id', types['user_id'], np.asarray(user_ids))]
+    columns += [(name, types[name], X[:, i]) for i, name in enumerate(FEATURES) if name != 'user_id']
+    return encode(FEATURES_MAGIC, columns)
+
+
+def decode_features(payload):
+    """
+    (user_ids, X) of a features payload: user_ids as sent, X a C-contiguous float32
+    matrix in FEATURES order. A missing column raises ValueError.
+    """
+    columns = decode(FEATURES_MAGIC, payload)
+    missing = [name for name in FEATURES if name not in columns]
+    if missing:
+        raise ValueError(f"Missing required feature column in binary data: {', '.join(missing)}")
+    user_ids = columns['user_id']
+    X = np.empty((len(user_ids), len(FEATURES)), dtype=np.float32)
+    for i, name in enumerate(FEATURES):
+        X[:, i] = columns[name]
+    return user_ids, X
+
+
+def encode_predictions(user_ids, probas, predictions):
+    """Predictions payload; user_ids keep their wire type when they came from decode_features()."""
+    user_ids = np.asarray(user_ids)
+    id_type = user_ids.dtype.str if user_ids.dtype.str in WIRE_TYPES else '<u8'
+    return encode(PREDICTIONS_MAGIC, [
+        ('user_id', id_type, user_ids),
+        ('probability_of_presence', '<f8', probas),
+        ('prediction', '|u1', predictions),
+    ])
+
+
+def decode_predictions(payload):
+    """The list of {user_id, probability_of_presence, prediction} dicts of a predictions payload."""
+    columns = decode(PREDICTIONS_MAGIC, payload)
+    return [
+        {'user_id': user_id, 'probability_of_presence': proba, 'prediction': label}
+        for user_id, proba, label in zip(columns['user_id'].tolist(), columns['probability_of_presence'].tolist(),
+                                         columns['prediction'].tolist())
+    ]
@@ -3,6 +3,11 @@ import { Button, Modal, Spinner, Alert } from 'react-bootstrap';
 import { BsCpuFill } from 'react-icons/bs';
 import * as api from '../services/apiService';
 
+// Training runs as a background job; its status is polled at this interval.
+const POLL_INTERVAL_MS = 3000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const RetrainModelButton = () => {
     const [showModal, setShowModal] = useState(false);
     const [isTraining, setIsTraining] = useState(false);
@@ -20,7 +25,24 @@ const RetrainModelButton = () => {
 
         try {
             const response = await api.retrainModel();
-            setFeedback({ type: 'success', message: response.message || 'Training initiated successfully.' });
+            setFeedback({ type: 'info', message: response.message || 'Training initiated successfully.' });
+
+            let job = await api.getTrainingJob(response.job_id);
+            while (job.status === 'queued' || job.status === 'running') {
+                setFeedback({ type: 'info', message: `Training in progress${job.current_stage ? `: ${job.current_stage}` : ''}...` });
+                await sleep(POLL_INTERVAL_MS);
+                job = await api.getTrainingJob(response.job_id);
+            }
+
+            if (job.status === 'succeeded') {
+                const accuracy = job.stages.find((stage) => stage.stage === 'evaluate')?.detail?.accuracy;
+                setFeedback({
+                    type: 'success',
+                    message: `Model ${job.model_version} trained${accuracy !== undefined ? ` (accuracy ${(accuracy * 100).toFixed(1)}%)` : ''}.`,
+                });
+            } else {
+                setFeedback({ type: 'danger', message: job.message || `Training ${job.status}.` });
+            }
         } catch (error) {
             setFeedback({ type: 'danger', message: error.message || 'An unknown error occurred.' });
         } finally {
@@ -46,7 +68,7 @@ const RetrainModelButton = () => {
                         Are you sure you want to start the model retraining process?
                     </p>
                     <p className="text-muted">
-                        This will use the latest data from the database to create a new `attendance_model.pkl` file. This process may take several minutes and should not be interrupted.
+                        This will use the latest data from the database to train a new model version, which is served as soon as it is ready. Training runs in the background and may take several minutes.
                     </p>
                     {feedback.message && (
                         <Alert variant={feedback.type} className="mt-3">
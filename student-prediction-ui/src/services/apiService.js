@@ -68,4 +68,9 @@ export const retrainModel = async () => {
         }
     });
     return handleResponse(response);
+};
+
+export const getTrainingJob = async (jobId) => {
+    const response = await fetch(`${API_BASE_URL}/model/jobs/${jobId}`);
+    return handleResponse(response);
 };
\ No newline at end of file